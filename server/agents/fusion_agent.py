@@ -1,5 +1,15 @@
-import requests
+import asyncio
+from contextlib import asynccontextmanager
+from utils import aio
 from utils.logger import AgentLogger
+from utils.pipeline import StageGraph
+from utils.catalog import get_catalog
+from utils.pokeapi_client import get_pokeapi_client
+from utils.metrics import CACHE_REQUESTS
+from utils.config import FUSE_BATCH_CONCURRENCY, FUSE_BATCH_RATE
+from utils.fusion_cache import FUSION_STAGES, get_fusion_cache, normalize_id, pair_key, pipeline_version, stages_to_regenerate
+from utils.pokedex_store import get_pokedex_store
+from utils.tracing import traced
 from tools.fusion_tools import ImageFusionTool, CryFusionTool, FusionStatsMovesTool, NameFusionTool
 
 class FusionAgent:
@@ -11,59 +21,87 @@ class FusionAgent:
         self.cry_tool = CryFusionTool()
         self.stats_moves_tool = FusionStatsMovesTool()
         self.name_tool = NameFusionTool()
-        self.pokeapi_base = "https://pokeapi.co/api/v2"
+        self.pokeapi = get_pokeapi_client()
+        self.catalog = get_catalog()
+        self.cache = get_fusion_cache()
+        self.pokedex = get_pokedex_store()
+        self._flights = {}  # pair -> (asyncio.Lock, users), only touched on the aio loop
     
-    def fuse(self, pokemon1_id, pokemon2_id):
-        """Main fusion method"""
-        
+    def fuse(self, pokemon1_id, pokemon2_id, on_progress=None, force_regenerate=False, regenerate=()):
+        """Sync wrapper of afuse"""
+        return aio.run(self.afuse(pokemon1_id, pokemon2_id, on_progress, force_regenerate, regenerate))
+    
+    @traced(kind='agent')
+    async def afuse(self, pokemon1_id, pokemon2_id, on_progress=None, force_regenerate=False, regenerate=()):
+        """
+        Main fusion method, stages run as a dependency graph:
+        pokemon1, pokemon2 -> name -> image
+                           -> cry
+                           -> stats_moves
+                           -> types
+        Stages already cached for this parent pair are not run again: force_regenerate
+        reruns every stage, regenerate reruns the listed ones (and the stages using them).
+        on_progress(stage, fraction) is called as stages complete (on the event loop, keep it short).
+        """
         self.logger.log_info("Fusion Agent: Started", {
             "pokemon1_id": pokemon1_id,
-            "pokemon2_id": pokemon2_id
+            "pokemon2_id": pokemon2_id,
+            "force_regenerate": force_regenerate,
+            "regenerate": list(regenerate or ())
         })
         
         try:
-            # Fetch both pokemons
-            pokemon1 = self._fetch_pokemon(pokemon1_id)
-            pokemon2 = self._fetch_pokemon(pokemon2_id)
-            
-            self.logger.log_info("Both pokemons fetched", {
-                "pokemon1_id": pokemon1.get('id'),
-                "pokemon1_name": pokemon1.get('name'),
-                "pokemon2_id": pokemon2.get('id'),
-                "pokemon2_name": pokemon2.get('name')
-            })
+            fusion_id = pair_key(pokemon1_id, pokemon2_id)
+            stale = set(FUSION_STAGES) if force_regenerate else stages_to_regenerate(regenerate or ())
             
-            # Generate fusion name (Mistral or fallback)
-            fusion_name = self.name_tool.generate_name(pokemon1, pokemon2)
-            fusion_id = f"{pokemon1_id}-{pokemon2_id}"
-            
-            # Step 1: Generate image
-            image_url = self.image_tool.generate_image(pokemon1, pokemon2, fusion_name)
-            self.logger.log_info("Image generated", {"fusion_id": fusion_id})
-            
-            # Step 2: Fuse cry
-            cry_url = self.cry_tool.fuse_cry(pokemon1, pokemon2, fusion_name)
-            self.logger.log_info("Cry fused", {"fusion_id": fusion_id})
+            # Concurrent fuses of the same pair wait for the first one, then hit the cache
+            async with self._single_flight(fusion_id):
+                # SQLite reads and writes of the cache run off the event loop (busy waits would stall it)
+                cached = {
+                    stage: value for stage, value in (await asyncio.to_thread(self._cached_stages, fusion_id)).items()
+                    if stage not in stale
+                }
+                
+                graph = StageGraph()
+                
+                def add_stage(stage, fn, deps):
+                    if stage in cached:
+                        graph.add(stage, lambda: cached[stage])
+                    else:
+                        graph.add(stage, fn, deps)
+                
+                if len(cached) < len(FUSION_STAGES):
+                    # Fetch both pokemons in parallel
+                    graph.add('pokemon1', lambda: self._fetch_pokemon(pokemon1_id))
+                    graph.add('pokemon2', lambda: self._fetch_pokemon(pokemon2_id))
+                # Generate fusion name (Mistral or fallback), then the image that needs it
+                add_stage('name', self.name_tool.agenerate_name, deps=('pokemon1', 'pokemon2'))
+                add_stage('image', self.image_tool.agenerate_image, deps=('pokemon1', 'pokemon2', 'name'))
+                # Cry, stats/moves and types only need the parents, they run alongside the name
+                add_stage('cry', self.cry_tool.fuse_cry, deps=('pokemon1', 'pokemon2'))
+                add_stage('stats_moves', self.stats_moves_tool.fuse_stats_moves, deps=('pokemon1', 'pokemon2'))
+                add_stage('types', self._fuse_types, deps=('pokemon1', 'pokemon2'))
+                
+                results, timings = await graph.run(on_stage_done=on_progress)
+                
+                await asyncio.to_thread(self.cache.store, fusion_id, {
+                    stage: results[stage] for stage in FUSION_STAGES if stage not in cached
+                })
             
-            # Step 3: Fuse stats and moves
-            stats_moves = self.stats_moves_tool.fuse_stats_moves(pokemon1, pokemon2)
-            self.logger.log_info("Stats and moves fused", {
-                "total_stats": sum(stats_moves['stats'].values())
+            self.logger.log_info("Fusion stage timings", {
+                "fusion_id": fusion_id,
+                "timings_ms": timings,
+                "cached_stages": sorted(cached)
             })
             
-            fusion_result = {
-                'id': fusion_id,
-                'name': fusion_name,
-                'image': image_url,
-                'cry': cry_url,
-                'stats': stats_moves['stats'],
-                'moves': stats_moves['moves'],
-                'types': list(set(pokemon1['types'] + pokemon2['types']))[:2]  # Max 2 types
-            }
+            self._count_cache_lookups(cached)
+            fusion_result = self._assemble(fusion_id, results, cached)
+            fusion_result['timings_ms'] = timings
             
             self.logger.log_success("Fusion completed", {
                 "fusion_id": fusion_id,
-                "name": fusion_name
+                "name": results['name'],
+                "cache_hit": fusion_result['cache']['hit']
             })
             
             return fusion_result
@@ -77,79 +115,233 @@ class FusionAgent:
             })
             raise
     
-    def _fetch_pokemon(self, pokemon_id):
-        """Fetch pokemon data from PokeAPI with proper error handling"""
+    async def afuse_batch(self, pairs, force_regenerate=False):
+        """
+        Fuse a list of (pokemon1_id, pokemon2_id) pairs, yielding one item per
+        distinct pair as it completes: {'id', 'pokemon1_id', 'pokemon2_id',
+        'status': cached|complete|failed, 'result' or 'error'}
+        - fully cached pairs come first, without fetching anything
+        - each parent species is fetched once for the whole batch
+        - cry, stats/moves and types are computed for every pair in one pass
+        - name and image generations share a pool bounded by FUSE_BATCH_CONCURRENCY
+          and FUSE_BATCH_RATE
+        Closing the generator cancels the generations still running.
+        """
+        requested = {}
+        for pokemon1_id, pokemon2_id in pairs:
+            requested.setdefault(pair_key(pokemon1_id, pokemon2_id), (pokemon1_id, pokemon2_id))
+        
+        self.logger.log_info("Fusion batch started", {
+            "pairs": len(pairs),
+            "distinct_pairs": len(requested),
+            "force_regenerate": force_regenerate
+        })
+        
+        pending = []
+        for fusion_id, (pokemon1_id, pokemon2_id) in requested.items():
+            cached = {} if force_regenerate else await asyncio.to_thread(self._cached_stages, fusion_id)
+            if len(cached) < len(FUSION_STAGES):
+                pending.append(fusion_id)
+                continue
+            self._count_cache_lookups(cached)
+            yield self._batch_item(fusion_id, pokemon1_id, pokemon2_id, 'cached',
+                                   result=self._assemble(fusion_id, cached, cached))
+        
+        if not pending:
+            return
+        
+        # Each parent species once, whatever the number of pairs using it
+        species = {}
+        for fusion_id in pending:
+            for pokemon_id in requested[fusion_id]:
+                species.setdefault(normalize_id(pokemon_id), pokemon_id)
+        fetched = await asyncio.gather(
+            *(self._fetch_pokemon(pokemon_id) for pokemon_id in species.values()),
+            return_exceptions=True
+        )
+        parents = dict(zip(species, fetched))
+        
+        ready = []
+        for fusion_id in pending:
+            pokemon1_id, pokemon2_id = requested[fusion_id]
+            errors = [
+                parents[normalize_id(pokemon_id)] for pokemon_id in (pokemon1_id, pokemon2_id)
+                if isinstance(parents[normalize_id(pokemon_id)], Exception)
+            ]
+            if errors:
+                yield self._batch_item(fusion_id, pokemon1_id, pokemon2_id, 'failed',
+                                       error=f"Fetch pokemon failed: {errors[0]}")
+            else:
+                ready.append((fusion_id, parents[normalize_id(pokemon1_id)], parents[normalize_id(pokemon2_id)]))
+        
+        if not ready:
+            return
+        
+        # Parent-only stages for every pair at once (CPU work, off the loop)
+        computed = await asyncio.to_thread(self._fuse_parents_batch, [(p1, p2) for _, p1, p2 in ready])
+        
+        limiter = aio.RateLimiter(FUSE_BATCH_RATE, FUSE_BATCH_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(self._complete_batch_pair(
+                fusion_id, requested[fusion_id], pokemon1, pokemon2, stages, limiter, force_regenerate
+            ))
+            for (fusion_id, pokemon1, pokemon2), stages in zip(ready, computed)
+        ]
         try:
-            url = f"{self.pokeapi_base}/pokemon/{pokemon_id}"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            self.logger.log_info("Pokemon data fetched", {"name": data['name']})
-            
-            # Fetch species data for French name
-            try:
-                species_url = data['species']['url']
-                species_response = requests.get(species_url, timeout=10)
-                species_data = species_response.json()
+            for done in asyncio.as_completed(tasks):
+                yield await done
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def _fuse_parents_batch(self, pairs):
+        """cry, stats_moves and types stages of several (pokemon1, pokemon2) pairs"""
+        cries = self.cry_tool.fuse_cry_batch(pairs)
+        stats_moves = self.stats_moves_tool.fuse_stats_moves_batch(pairs)
+        return [
+            {'cry': cry, 'stats_moves': fused, 'types': self._fuse_types(pokemon1, pokemon2)}
+            for cry, fused, (pokemon1, pokemon2) in zip(cries, stats_moves, pairs)
+        ]
+    
+    @traced(kind='agent')
+    async def _complete_batch_pair(self, fusion_id, parent_ids, pokemon1, pokemon2, computed, limiter, force_regenerate):
+        """Name and image of one batch pair, then cache its stages; never raises"""
+        pokemon1_id, pokemon2_id = parent_ids
+        try:
+            # Same pair fused elsewhere meanwhile: wait for it and reuse its stages
+            async with self._single_flight(fusion_id):
+                cached = {} if force_regenerate else await asyncio.to_thread(self._cached_stages, fusion_id)
+                if not computed['cry'] and 'cry' not in cached:
+                    raise Exception("No cry URL available for both pokemons")
+                results = {**computed, **cached}
                 
-                french_name = next(
-                    (n['name'] for n in species_data['names'] if n['language']['name'] == 'fr'),
-                    data['name']
-                )
-            except Exception as e:
-                self.logger.log_debug("Could not fetch French name", {"error": str(e)})
-                french_name = data['name']
-            
-            # Extract stats safely
-            stats_dict = {}
-            stat_names = ['hp', 'attack', 'defense', 'sp-attack', 'sp-defense', 'speed']
-            
-            for stat_name in stat_names:
-                try:
-                    stat_value = next(
-                        s['base_stat'] for s in data['stats'] if s['stat']['name'] == stat_name
-                    )
-                    key = stat_name.replace('-', '_')
-                    stats_dict[key] = stat_value
-                except StopIteration:
-                    self.logger.log_debug("Stat not found", {"stat": stat_name})
-                    key = stat_name.replace('-', '_')
-                    stats_dict[key] = 0
-            
-            # Extract moves
-            moves = []
-            for move in data.get('moves', [])[:8]:
-                try:
-                    moves.append(move['move']['name'])
-                except:
-                    pass
-
-            cry_url = None
-            try:
-                cries = data.get('cries', {})
-                cry_url = cries.get('latest') or cries.get('legacy')
-            except Exception:
-                cry_url = None
+                if 'name' not in cached:
+                    async with limiter:
+                        results['name'] = await self.name_tool.agenerate_name(pokemon1, pokemon2)
+                if 'image' not in cached:
+                    async with limiter:
+                        results['image'] = await self.image_tool.agenerate_image(pokemon1, pokemon2, results['name'])
+                
+                await asyncio.to_thread(self.cache.store, fusion_id, {
+                    stage: results[stage] for stage in FUSION_STAGES if stage not in cached
+                })
             
-            pokemon_obj = {
-                'id': data['id'],
-                'name': french_name,
-                'name_en': data['name'],
-                'types': [t['type']['name'] for t in data['types']],
-                'stats': stats_dict,
-                'moves': moves,
-                'cry': cry_url
+            self._count_cache_lookups(cached)
+            return self._batch_item(fusion_id, pokemon1_id, pokemon2_id, 'complete',
+                                    result=self._assemble(fusion_id, results, cached))
+        
+        except Exception as e:
+            self.logger.log_error("Batch pair fusion failed", {
+                "fusion_id": fusion_id,
+                "error": str(e),
+                "error_type": type(e).__name__
+            })
+            return self._batch_item(fusion_id, pokemon1_id, pokemon2_id, 'failed', error=str(e))
+    
+    def _batch_item(self, fusion_id, pokemon1_id, pokemon2_id, status, result=None, error=None):
+        item = {'id': fusion_id, 'pokemon1_id': pokemon1_id, 'pokemon2_id': pokemon2_id, 'status': status}
+        if result is not None:
+            item['result'] = result
+        if error is not None:
+            item['error'] = error
+        return item
+    
+    @traced(kind='agent')
+    def cached_fusion(self, pokemon1_id, pokemon2_id):
+        """Stored fusion when every stage is cached for this pair, None otherwise"""
+        fusion_id = pair_key(pokemon1_id, pokemon2_id)
+        cached = self._cached_stages(fusion_id)
+        if len(cached) < len(FUSION_STAGES):
+            return None
+        self.logger.log_info("Fusion cache hit", {"fusion_id": fusion_id})
+        self._count_cache_lookups(cached)
+        return self._assemble(fusion_id, cached, cached)
+    
+    def _count_cache_lookups(self, cached):
+        for stage in FUSION_STAGES:
+            CACHE_REQUESTS.inc('fusion', 'hit' if stage in cached else 'miss')
+    
+    def _assemble(self, fusion_id, results, cached):
+        stats_moves = results['stats_moves']
+        return {
+            'id': fusion_id,
+            'name': results['name'],
+            'image': results['image'],
+            'cry': results['cry'],
+            'stats': stats_moves['stats'],
+            'moves': stats_moves['moves'],
+            'types': results['types'],
+            'pipeline_version': pipeline_version(),
+            'cache': {
+                'hit': len(cached) == len(FUSION_STAGES),
+                'stages': {stage: 'hit' if stage in cached else 'miss' for stage in FUSION_STAGES}
             }
-            
+        }
+    
+    def _cached_stages(self, fusion_id):
+        """Cached artifacts of a pair, adopting a pokedex entry made before the cache existed"""
+        artifacts = self.cache.load(fusion_id)
+        if artifacts:
+            return artifacts
+        
+        entry = self.pokedex.get(fusion_id)
+        if not entry:
+            return {}
+        
+        adopted = {
+            'name': entry.get('name'),
+            'image': entry.get('image'),
+            'cry': entry.get('cry'),
+            'stats_moves': {'stats': entry['stats'], 'moves': entry['moves']} if entry.get('stats') else None,
+            'types': entry.get('types')
+        }
+        adopted = {stage: value for stage, value in adopted.items() if value}
+        self.cache.store(fusion_id, adopted)
+        self.logger.log_info("Pokedex entry adopted in fusion cache", {
+            "fusion_id": fusion_id,
+            "stages": sorted(adopted)
+        })
+        return adopted
+    
+    @asynccontextmanager
+    async def _single_flight(self, key):
+        # Single event loop: the dict needs no lock, awaiting the pair lock does not block the loop
+        lock, users = self._flights.get(key, (asyncio.Lock(), 0))
+        self._flights[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._flights[key]
+            if users == 1:
+                del self._flights[key]
+            else:
+                self._flights[key] = (lock, users - 1)
+    
+    def _fuse_types(self, pokemon1, pokemon2):
+        return list(set(pokemon1['types'] + pokemon2['types']))[:2]  # Max 2 types
+    
+    @traced(kind='agent')
+    async def _fetch_pokemon(self, pokemon_id):
+        """Fetch pokemon data from the local catalog, or PokeAPI with proper error handling"""
+        if self.catalog:
+            species = self.catalog.get(pokemon_id)
+            if species:
+                return {**species, 'moves': species['moves'][:8]}
+            self.logger.log_debug("Pokemon not in catalog, using PokeAPI", {"pokemon_id": pokemon_id})
+
+        try:
+            pokemon = await self.pokeapi.afetch_pokemon(pokemon_id)
+            pokemon_obj = {**pokemon, 'moves': pokemon['moves'][:8]}
+
             self.logger.log_info("Pokemon processed", {
                 "id": pokemon_obj['id'],
                 "name": pokemon_obj['name'],
                 "types": pokemon_obj['types']
             })
-            
+
             return pokemon_obj
-            
+
         except Exception as e:
             self.logger.log_error("Fetch pokemon failed", {
                 "pokemon_id": pokemon_id,
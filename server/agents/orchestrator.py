@@ -1,7 +1,13 @@
+import asyncio
+import os
+import threading
+import time
+from utils import aio
 from utils.logger import AgentLogger
 from agents.suggestion_agent import SuggestionAgent
 from agents.fusion_agent import FusionAgent
 from tools.pokedex_tools import AddPokedexEntry
+from utils.tracing import traced
 
 class OrchestratorAgent:
     """Main orchestrator agent - routes between sub-agents"""
@@ -13,15 +19,20 @@ class OrchestratorAgent:
         self.add_pokedex_tool = AddPokedexEntry()
     
     def suggest_fusion_candidates(self, pokemon_id):
+        """Sync wrapper of asuggest_fusion_candidates"""
+        return aio.run(self.asuggest_fusion_candidates(pokemon_id))
+    
+    @traced(kind='route')
+    async def asuggest_fusion_candidates(self, pokemon_id):
         """Route to suggestion agent"""
-        self.logger.log_info("Flow graph", {
+        self.logger.log_debug("Flow graph", lambda: {
             "flow": "API /api/suggest -> OrchestratorAgent -> SuggestionAgent -> SuggestionTypesTool -> StatFilterTop3Tool"
         })
         self.logger.log_info("Orchestrator: Starting suggestion flow", {"pokemon_id": pokemon_id})
         
         try:
             # Call suggestion agent
-            candidates = self.suggestion_agent.suggest_top_3(pokemon_id)
+            candidates = await self.suggestion_agent.asuggest_top_3(pokemon_id)
             
             self.logger.log_success("Orchestrator: Suggestions generated", {
                 "pokemon_id": pokemon_id,
@@ -34,9 +45,38 @@ class OrchestratorAgent:
             self.logger.log_error("Orchestrator: Suggestion flow failed", str(e))
             raise
     
-    def fuse_pokemons(self, pokemon1_id, pokemon2_id):
+    @traced(kind='route')
+    async def asuggest_many(self, pokemon_ids, top_k=3):
+        """Route a batch of bases to suggestion agent"""
+        self.logger.log_debug("Flow graph", lambda: {
+            "flow": "API /api/suggest/batch -> OrchestratorAgent -> SuggestionAgent -> SuggestionTypesTool (one pool, one matrix) -> StatFilterTop3Tool (batched)"
+        })
+        self.logger.log_info("Orchestrator: Starting batch suggestion flow", {
+            "pokemon_ids": list(pokemon_ids),
+            "top_k": top_k
+        })
+        
+        try:
+            results = await self.suggestion_agent.asuggest_many(pokemon_ids, top_k)
+            
+            self.logger.log_success("Orchestrator: Batch suggestions generated", {
+                "bases": len(results)
+            })
+            
+            return results
+            
+        except Exception as e:
+            self.logger.log_error("Orchestrator: Batch suggestion flow failed", str(e))
+            raise
+    
+    def fuse_pokemons(self, pokemon1_id, pokemon2_id, on_progress=None, force_regenerate=False, regenerate=()):
+        """Sync wrapper of afuse_pokemons"""
+        return aio.run(self.afuse_pokemons(pokemon1_id, pokemon2_id, on_progress, force_regenerate, regenerate))
+    
+    @traced(kind='route')
+    async def afuse_pokemons(self, pokemon1_id, pokemon2_id, on_progress=None, force_regenerate=False, regenerate=()):
         """Route to fusion agent"""
-        self.logger.log_info("Flow graph", {
+        self.logger.log_debug("Flow graph", lambda: {
             "flow": "API /api/fuse -> OrchestratorAgent -> FusionAgent -> NameFusionTool -> ImageFusionTool -> CryFusionTool -> FusionStatsMovesTool"
         })
         self.logger.log_info("Orchestrator: Starting fusion flow", {
@@ -46,7 +86,13 @@ class OrchestratorAgent:
         
         try:
             # Call fusion agent
-            fusion_result = self.fusion_agent.fuse(pokemon1_id, pokemon2_id)
+            fusion_result = await self.fusion_agent.afuse(
+                pokemon1_id,
+                pokemon2_id,
+                on_progress=on_progress,
+                force_regenerate=force_regenerate,
+                regenerate=regenerate
+            )
             
             self.logger.log_success("Orchestrator: Fusion completed", {
                 "fused_id": f"{pokemon1_id}-{pokemon2_id}"
@@ -58,9 +104,55 @@ class OrchestratorAgent:
             self.logger.log_error("Orchestrator: Fusion flow failed", str(e))
             raise
     
+    async def afuse_batch(self, pairs, force_regenerate=False):
+        """
+        Route a batch to the fusion agent, yielding its per-pair items as they complete,
+        then add every fused pokemon to the pokedex in one write and yield the summary
+        """
+        self.logger.log_debug("Flow graph", lambda: {
+            "flow": "API /api/fuse/batch -> OrchestratorAgent -> FusionAgent (batched stages) -> AddPokedexEntry (bulk)"
+        })
+        self.logger.log_info("Orchestrator: Starting fusion batch", {"pairs": len(pairs)})
+        
+        start = time.monotonic()
+        fused = []
+        counts = {'cached': 0, 'complete': 0, 'failed': 0}
+        try:
+            async for item in self.fusion_agent.afuse_batch(pairs, force_regenerate=force_regenerate):
+                counts[item['status']] += 1
+                if 'result' in item:
+                    item['result']['pokedex_url'] = f"/pokemon/{item['id']}"
+                    fused.append(item['result'])
+                yield item
+            
+            written = await asyncio.to_thread(self.add_many_to_pokedex, fused) if fused else 0
+            summary = {
+                'status': 'done',
+                'pairs': len(pairs),
+                **counts,
+                'pokedex_written': written,
+                'duration_ms': round((time.monotonic() - start) * 1000, 1)
+            }
+            self.logger.log_success("Orchestrator: Fusion batch completed", summary)
+            yield summary
+            
+        except Exception as e:
+            self.logger.log_error("Orchestrator: Fusion batch failed", str(e))
+            raise
+    
+    @traced(kind='route')
+    def cached_fusion(self, pokemon1_id, pokemon2_id):
+        """Route to the fusion cache, None unless every stage is cached"""
+        try:
+            return self.fusion_agent.cached_fusion(pokemon1_id, pokemon2_id)
+        except Exception as e:
+            self.logger.log_error("Orchestrator: Fusion cache lookup failed", str(e))
+            return None
+    
+    @traced(kind='route')
     def add_to_pokedex(self, fusion_data):
         """Route to add pokedex tool"""
-        self.logger.log_info("Flow graph", {
+        self.logger.log_debug("Flow graph", lambda: {
             "flow": "API /api/pokedex/add -> OrchestratorAgent -> AddPokedexEntry"
         })
         self.logger.log_info("Orchestrator: Adding to pokedex", {
@@ -81,6 +173,20 @@ class OrchestratorAgent:
             self.logger.log_error("Orchestrator: Add pokedex failed", str(e))
             raise
 
+    @traced(kind='route')
+    def add_many_to_pokedex(self, fusions):
+        """Route to add pokedex tool, every fusion in a single write"""
+        self.logger.log_info("Orchestrator: Adding to pokedex (bulk)", {"count": len(fusions)})
+        
+        try:
+            results = self.add_pokedex_tool.add_entries(fusions)
+            self.logger.log_success("Orchestrator: Pokedex entries added", {"count": len(results)})
+            return len(results)
+        except Exception as e:
+            self.logger.log_error("Orchestrator: Bulk add pokedex failed", str(e))
+            raise
+
+    @traced(kind='route')
     def get_pokedex_entry(self, fusion_id):
         """Route to get pokedex entry"""
         self.logger.log_info("Orchestrator: Get pokedex entry", {
@@ -103,16 +209,71 @@ class OrchestratorAgent:
             self.logger.log_error("Orchestrator: Get pokedex failed", str(e))
             raise
 
-    def list_pokedex_entries(self):
-        """Route to list pokedex entries"""
-        self.logger.log_info("Orchestrator: List pokedex entries", {})
+    @traced(kind='route')
+    def list_pokedex_entries(self, query=None, limit=50, cursor=None):
+        """Route to list a page of pokedex entries"""
+        self.logger.log_info("Orchestrator: List pokedex entries", {
+            "limit": limit,
+            "cursor": bool(cursor)
+        })
 
         try:
-            results = self.add_pokedex_tool.list_entries()
+            results = self.add_pokedex_tool.list_entries(query, limit, cursor)
             self.logger.log_success("Orchestrator: Entries listed", {
-                "count": len(results)
+                "count": len(results['items']),
+                "has_more": results['next_cursor'] is not None
             })
             return results
         except Exception as e:
             self.logger.log_error("Orchestrator: List pokedex failed", str(e))
             raise
+
+    @traced(kind='route')
+    def list_pokedex_atlas(self, query=None, limit=50, cursor=None):
+        """Route to list a page of pokedex entries with its sprite atlas"""
+        self.logger.log_info("Orchestrator: List pokedex atlas", {
+            "limit": limit,
+            "cursor": bool(cursor)
+        })
+
+        try:
+            results = self.add_pokedex_tool.list_entries_with_atlas(query, limit, cursor)
+            self.logger.log_success("Orchestrator: Atlas page listed", {
+                "count": len(results['items']),
+                "atlas": results['atlas'] is not None
+            })
+            return results
+        except Exception as e:
+            self.logger.log_error("Orchestrator: List pokedex atlas failed", str(e))
+            raise
+
+    def stream_pokedex_entries(self, query=None):
+        """Route to stream every matching pokedex entry (bulk export)"""
+        self.logger.log_info("Orchestrator: Stream pokedex entries", {})
+        return self.add_pokedex_tool.iter_entries(query)
+
+
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_orchestrator():
+    """Orchestrator of this process, built on first use (after fork in pre-forking servers)"""
+    global _orchestrator
+
+    if _orchestrator is None:
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                _orchestrator = OrchestratorAgent()
+    return _orchestrator
+
+
+def _reset_after_fork():
+    """Agents own thread pools and single-flight locks, which do not survive fork"""
+    global _orchestrator, _orchestrator_lock
+    _orchestrator = None
+    _orchestrator_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,5 +1,12 @@
-import requests
+import asyncio
+from utils import aio
 from utils.logger import AgentLogger
+from utils.catalog import get_catalog
+from utils.pokeapi_client import get_pokeapi_client
+from utils.suggest_index import get_suggest_index
+from utils.metrics import CACHE_REQUESTS
+from utils.config import SUGGEST_TYPE_LIMIT
+from utils.tracing import traced
 from tools.suggestion_tools import SuggestionTypesTool, StatFilterTop3Tool
 
 class SuggestionAgent:
@@ -9,32 +16,53 @@ class SuggestionAgent:
         self.logger = AgentLogger("SuggestionAgent")
         self.suggestion_types_tool = SuggestionTypesTool()
         self.stat_filter_tool = StatFilterTop3Tool()
-        self.pokeapi_base = "https://pokeapi.co/api/v2"
+        self.pokeapi = get_pokeapi_client()
+        self.catalog = get_catalog()
+        self.suggest_index = get_suggest_index()
     
     def suggest_top_3(self, pokemon_id):
+        """Sync wrapper of asuggest_top_3"""
+        return aio.run(self.asuggest_top_3(pokemon_id))
+    
+    @traced(kind='agent')
+    async def asuggest_top_3(self, pokemon_id):
         """Main method: Get base pokemon, suggest candidates, filter top 3"""
         
         self.logger.log_info("Suggestion Agent: Started", {"pokemon_id": pokemon_id})
         
         try:
+            # Precomputed index: one lookup, no pipeline run
+            if self.suggest_index:
+                top_3 = self.suggest_index.lookup(pokemon_id, self.catalog)
+                CACHE_REQUESTS.inc('suggest_index', 'miss' if top_3 is None else 'hit')
+                if top_3 is not None:
+                    self.logger.log_success("Top 3 served from suggestion index", {
+                        "top_3": [p.get('name') for p in top_3]
+                    })
+                    return top_3
+
             # Get base pokemon data
-            base_pokemon = self._fetch_pokemon(pokemon_id)
+            base_pokemon = await self._fetch_pokemon(pokemon_id)
             self.logger.log_debug("Base pokemon fetched", {
                 "name": base_pokemon.get('name'),
                 "types": base_pokemon.get('types')
             })
             
             # Step 1: Get candidates by type suggestion
-            candidates = self.suggestion_types_tool.suggest_by_types(
+            # (all of them with the stat index, the stat filter no longer samples)
+            # Scoring is CPU work (numpy, stat index): it runs in a worker thread, off the loop
+            candidates = await asyncio.to_thread(
+                self.suggestion_types_tool.suggest_by_types,
                 base_pokemon,
-                limit=50  # Get 50 candidates first
+                limit=None if self.stat_filter_tool.stat_index else SUGGEST_TYPE_LIMIT
             )
             self.logger.log_info("Type suggestion completed", {
                 "candidates_count": len(candidates)
             })
             
             # Step 2: Filter top 3 by stats similarity
-            top_3 = self.stat_filter_tool.filter_top_3(
+            top_3 = await asyncio.to_thread(
+                self.stat_filter_tool.filter_top_3,
                 base_pokemon,
                 candidates
             )
@@ -48,67 +76,92 @@ class SuggestionAgent:
             self.logger.log_error("Suggestion flow failed", str(e))
             raise
     
-    def _fetch_pokemon(self, pokemon_id):
-        """Fetch pokemon data from PokeAPI"""
+    def suggest_many(self, pokemon_ids, top_k=3):
+        """Sync wrapper of asuggest_many"""
+        return aio.run(self.asuggest_many(pokemon_ids, top_k))
+    
+    @traced(kind='agent')
+    async def asuggest_many(self, pokemon_ids, top_k=3):
+        """
+        Top k suggestions for several bases (team building), one item per id in order:
+        {'pokemon_id', 'suggestions'} or {'pokemon_id', 'error'}.
+        Bases in the suggestion index are looked up; the others share one candidate
+        pool, scored against all of them in one type pass and one stat pass.
+        """
+        self.logger.log_info("Suggestion Agent: Batch started", {
+            "pokemon_ids": list(pokemon_ids),
+            "top_k": top_k
+        })
+        
         try:
-            url = f"{self.pokeapi_base}/pokemon/{pokemon_id}"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            results = [{'pokemon_id': pokemon_id} for pokemon_id in pokemon_ids]
             
-            self.logger.log_info("Pokemon data fetched", {"name": data['name']})
+            pending = []
+            for item in results:
+                top = None
+                if self.suggest_index and top_k <= self.suggest_index.candidate_ids.shape[1]:
+                    top = self.suggest_index.lookup(item['pokemon_id'], self.catalog, top_k)
+                    CACHE_REQUESTS.inc('suggest_index', 'miss' if top is None else 'hit')
+                if top is None:
+                    pending.append(item)
+                else:
+                    item['suggestions'] = top
             
-            # Fetch species data for French name
-            try:
-                species_url = data['species']['url']
-                species_response = requests.get(species_url, timeout=10)
-                species_data = species_response.json()
-                
-                french_name = next(
-                    (n['name'] for n in species_data['names'] if n['language']['name'] == 'fr'),
-                    data['name']
+            if pending:
+                bases = await asyncio.gather(
+                    *(self._fetch_pokemon(item['pokemon_id']) for item in pending),
+                    return_exceptions=True
                 )
-            except Exception as e:
-                self.logger.log_debug("Could not fetch French name", {"error": str(e)})
-                french_name = data['name']
-            
-            # Extract stats safely
-            stats_dict = {}
-            stat_names = ['hp', 'attack', 'defense', 'sp-attack', 'sp-defense', 'speed']
+                scored = []
+                for item, base in zip(pending, bases):
+                    if isinstance(base, Exception):
+                        item['error'] = str(base)
+                    else:
+                        scored.append((item, base))
+                
+                if scored:
+                    top_k_lists = await asyncio.to_thread(self._score_bases, [base for _, base in scored], top_k)
+                    for (item, _), top in zip(scored, top_k_lists):
+                        item['suggestions'] = top
             
-            for stat_name in stat_names:
-                try:
-                    stat_value = next(
-                        s['base_stat'] for s in data['stats'] if s['stat']['name'] == stat_name
-                    )
-                    # Convert stat name (sp-attack -> sp_attack)
-                    key = stat_name.replace('-', '_')
-                    stats_dict[key] = stat_value
-                except StopIteration:
-                    self.logger.log_debug("Stat not found, using default", {"stat": stat_name})
-                    key = stat_name.replace('-', '_')
-                    stats_dict[key] = 0
-                except Exception as e:
-                    self.logger.log_debug("Error extracting stat", {"stat": stat_name, "error": str(e)})
-                    key = stat_name.replace('-', '_')
-                    stats_dict[key] = 0
+            self.logger.log_success("Batch suggestions generated", {
+                "bases": len(results),
+                "from_index": len(results) - len(pending),
+                "failed": sum('error' in item for item in results)
+            })
             
-            pokemon_obj = {
-                'id': data['id'],
-                'name': french_name,
-                'name_en': data['name'],
-                'types': [t['type']['name'] for t in data['types']],
-                'stats': stats_dict
-            }
+            return results
             
+        except Exception as e:
+            self.logger.log_error("Batch suggestion flow failed", str(e))
+            raise
+    
+    def _score_bases(self, base_pokemons, top_k):
+        """Candidate pool hydrated once, then type and stat scoring for every base (CPU work, worker thread)"""
+        candidates = self.suggestion_types_tool.candidate_pool(SUGGEST_TYPE_LIMIT)
+        type_scores = self.suggestion_types_tool.score_many(base_pokemons, candidates)
+        return self.stat_filter_tool.filter_top_k_many(base_pokemons, candidates, type_scores, top_k)
+    
+    @traced(kind='agent')
+    async def _fetch_pokemon(self, pokemon_id):
+        """Fetch pokemon data from the local catalog, or PokeAPI without one"""
+        if self.catalog:
+            species = self.catalog.get(pokemon_id)
+            if species:
+                return species
+            self.logger.log_debug("Pokemon not in catalog, using PokeAPI", {"pokemon_id": pokemon_id})
+
+        try:
+            pokemon_obj = await self.pokeapi.afetch_pokemon(pokemon_id)
+
             self.logger.log_info("Pokemon processed", {
                 "id": pokemon_obj['id'],
                 "name": pokemon_obj['name'],
                 "types": pokemon_obj['types']
             })
-            
+
             return pokemon_obj
-            
+
         except Exception as e:
             self.logger.log_error("Fetch pokemon failed", str(e))
             raise
@@ -1,27 +1,77 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, request, jsonify, redirect, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 from dotenv import load_dotenv
+import asyncio
+import hmac
+import json
 import os
-from agents.orchestrator import OrchestratorAgent
-from utils.logger import AgentLogger
+import queue
+import time
+from concurrent import futures
+from contextlib import ExitStack
+from agents.orchestrator import get_orchestrator
+from utils import aio, upstream
+from utils.catalog import get_catalog
+from utils.config import (
+    FLASK_ENV, FLASK_PORT, FUSE_BATCH_MAX_PAIRS, JOB_DRAIN_TIMEOUT, LEONARDO_WEBHOOK_SECRET,
+    POKEDEX_PAGE_SIZE, POKEDEX_MAX_PAGE_SIZE,
+    SUGGEST_BATCH_MAX_BASES, SUGGEST_BATCH_MAX_K, SUGGEST_BATCH_TOP_K
+)
+from utils.fusion_cache import get_fusion_cache, stages_to_regenerate
+from utils.generations import get_generation_tracker, parse_callback
+from utils.image_store import ORIGINAL, VARIANTS, get_image_store, image_url, parse_name
+from utils.job_queue import JobQueue, TERMINAL_STATUSES
+from utils.logger import AgentLogger, get_log_pipeline
+from utils.metrics import HTTP_LATENCY, HTTP_REQUESTS, registry
+from utils.pokedex_store import PokedexQuery, get_pokedex_store
+from utils.sprite_atlas import get_atlas_cache
+from utils.suggest_index import get_suggest_index
+from utils.tracing import new_request_id, recorder, trace
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+# Routes and request hooks; create_app() builds the Flask app around them.
+# Agents are created per process on first use (get_orchestrator), never at import,
+# so a pre-forking server does not share their threads, sockets and locks.
+api = Blueprint('api', __name__)
 
 logger = AgentLogger(__name__)
-orchestrator = OrchestratorAgent()
 
-@app.route('/api/health', methods=['GET'])
+@api.before_app_request
+def start_request_trace():
+    """Request id (client X-Request-ID or a new one) and root span of the request"""
+    g.request_start = time.monotonic()
+    g.request_id = new_request_id(request.headers.get('X-Request-ID'))
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.trace = ExitStack()
+    g.trace_root = g.trace.enter_context(trace(g.request_id, f"{request.method} {route}", method=request.method))
+
+@api.after_app_request
+def add_request_id(response):
+    response.headers['X-Request-ID'] = g.request_id
+    if g.get('trace_root') is not None:
+        g.trace_root.set(status=response.status_code)
+    # Route template, not the path: one series per endpoint (streams are timed until their headers)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUESTS.inc(route, request.method, str(response.status_code))
+    HTTP_LATENCY.observe(time.monotonic() - g.request_start, route)
+    return response
+
+@api.teardown_app_request
+def end_request_trace(error=None):
+    stack = g.pop('trace', None)
+    if stack is not None:
+        stack.close()
+
+@api.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
     logger.log_info("Health check", {})
     return jsonify({"status": "ok", "service": "pokemon-fusion-agents"}), 200
 
-@app.route('/api/suggest', methods=['POST'])
-def suggest():
-    """Suggestion endpoint - Get top 3 compatible pokemon"""
+@api.route('/api/suggest', methods=['POST'])
+async def suggest():
+    """Suggestion endpoint - Get top 3 compatible pokemon (awaits the agents on the shared aio loop)"""
     try:
         data = request.json
         pokemon_id = data.get('pokemon_id')
@@ -31,7 +81,7 @@ def suggest():
         if not pokemon_id:
             return jsonify({"error": "pokemon_id required"}), 400
         
-        result = orchestrator.suggest_fusion_candidates(pokemon_id)
+        result = await aio.wrap(get_orchestrator().asuggest_fusion_candidates(pokemon_id))
         
         logger.log_success("Suggest completed", {"result_count": len(result)})
         return jsonify(result), 200
@@ -40,9 +90,69 @@ def suggest():
         logger.log_error("Suggest failed", str(e))
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/fuse', methods=['POST'])
+@api.route('/api/suggest/batch', methods=['POST'])
+async def suggest_batch():
+    """Batch suggestion endpoint - Top K compatible pokemon for each base id (e.g. a whole team)"""
+    try:
+        data = request.json or {}
+        pokemon_ids = data.get('pokemon_ids')
+        top_k = data.get('top_k', SUGGEST_BATCH_TOP_K)
+
+        logger.log_info("Suggest batch request received", {"pokemon_ids": pokemon_ids, "top_k": top_k})
+
+        if not isinstance(pokemon_ids, list) or not pokemon_ids or not all(pokemon_ids):
+            return jsonify({"error": "pokemon_ids must be a non-empty list of ids"}), 400
+        if len(pokemon_ids) > SUGGEST_BATCH_MAX_BASES:
+            return jsonify({"error": f"at most {SUGGEST_BATCH_MAX_BASES} pokemon_ids per batch"}), 400
+        if not isinstance(top_k, int) or not 1 <= top_k <= SUGGEST_BATCH_MAX_K:
+            return jsonify({"error": f"top_k must be an integer between 1 and {SUGGEST_BATCH_MAX_K}"}), 400
+
+        results = await aio.wrap(get_orchestrator().asuggest_many(pokemon_ids, top_k))
+
+        logger.log_success("Suggest batch completed", {"bases": len(results)})
+        return jsonify({"top_k": top_k, "results": results}), 200
+
+    except Exception as e:
+        logger.log_error("Suggest batch failed", str(e))
+        return jsonify({"error": str(e)}), 500
+
+async def run_fuse_job(payload, progress):
+    """Job handler (runs on the aio loop): fuse, then auto add to pokedex"""
+    pokemon1_id = payload['pokemon1_id']
+    pokemon2_id = payload['pokemon2_id']
+
+    orchestrator = get_orchestrator()
+    result = await orchestrator.afuse_pokemons(
+        pokemon1_id,
+        pokemon2_id,
+        on_progress=lambda stage, fraction: progress(stage, fraction * 0.95),
+        force_regenerate=payload.get('force_regenerate', False),
+        regenerate=payload.get('regenerate', [])
+    )
+
+    # Auto add to pokedex
+    progress('pokedex', 0.99)
+    pokedex_result = await asyncio.to_thread(orchestrator.add_to_pokedex, result)
+
+    logger.log_success("Fuse completed", {
+        "fused_id": result['id'],
+        "pokedex_url": pokedex_result.get('url')
+    })
+
+    result['pokedex_url'] = pokedex_result.get('url')
+    return result
+
+job_queue = JobQueue()
+job_queue.register('fuse', run_fuse_job)
+
+@api.before_app_request
+def start_job_workers():
+    """Start job workers in the serving process only (not in the debug reloader parent)"""
+    job_queue.start()
+
+@api.route('/api/fuse', methods=['POST'])
 def fuse():
-    """Fusion endpoint - Generate fused pokemon"""
+    """Fusion endpoint - Enqueue a fusion job, returns its id straight away"""
     try:
         data = request.json
         pokemon1_id = data.get('pokemon1_id')
@@ -56,24 +166,161 @@ def fuse():
         if not pokemon1_id or not pokemon2_id:
             return jsonify({"error": "pokemon1_id and pokemon2_id required"}), 400
         
-        result = orchestrator.fuse_pokemons(pokemon1_id, pokemon2_id)
-
-        # Auto add to pokedex
-        pokedex_result = orchestrator.add_to_pokedex(result)
-
-        logger.log_success("Fuse completed", {
-            "fused_id": f"{pokemon1_id}-{pokemon2_id}",
-            "pokedex_url": pokedex_result.get('url')
+        force_regenerate = bool(data.get('force_regenerate', False))
+        regenerate = data.get('regenerate') or []
+        if isinstance(regenerate, str):
+            regenerate = [regenerate]
+        try:
+            stages_to_regenerate(regenerate)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Already generated fusion: answer straight away, no job
+        if not force_regenerate and not regenerate:
+            orchestrator = get_orchestrator()
+            cached = orchestrator.cached_fusion(pokemon1_id, pokemon2_id)
+            if cached:
+                if not orchestrator.get_pokedex_entry(cached['id']):
+                    orchestrator.add_to_pokedex(cached)
+                cached['pokedex_url'] = f"/pokemon/{cached['id']}"
+                logger.log_success("Fuse served from cache", {"fused_id": cached['id']})
+                return jsonify({"job_id": None, "status": "complete", "result": cached}), 200
+        
+        job = job_queue.submit('fuse', {
+            "pokemon1_id": pokemon1_id,
+            "pokemon2_id": pokemon2_id,
+            "force_regenerate": force_regenerate,
+            "regenerate": regenerate
         })
 
-        result['pokedex_url'] = pokedex_result.get('url')
-        return jsonify(result), 200
+        return jsonify({
+            "job_id": job['job_id'],
+            "status": job['status'],
+            "status_url": f"/api/fuse/jobs/{job['job_id']}",
+            "events_url": f"/api/fuse/jobs/{job['job_id']}/events"
+        }), 202
         
     except Exception as e:
         logger.log_error("Fuse failed", str(e))
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/pokedex/add', methods=['POST'])
+def parse_batch_pairs(raw_pairs):
+    """[{pokemon1_id, pokemon2_id}] or [[id1, id2]] -> [(id1, id2)], raises ValueError"""
+    if not isinstance(raw_pairs, list) or not raw_pairs:
+        raise ValueError("pairs must be a non-empty list")
+    if len(raw_pairs) > FUSE_BATCH_MAX_PAIRS:
+        raise ValueError(f"at most {FUSE_BATCH_MAX_PAIRS} pairs per batch")
+
+    pairs = []
+    for raw in raw_pairs:
+        if isinstance(raw, dict):
+            pair = (raw.get('pokemon1_id'), raw.get('pokemon2_id'))
+        elif isinstance(raw, (list, tuple)) and len(raw) == 2:
+            pair = tuple(raw)
+        else:
+            raise ValueError(f"invalid pair {raw!r}")
+        if not pair[0] or not pair[1]:
+            raise ValueError("each pair needs pokemon1_id and pokemon2_id")
+        pairs.append(pair)
+    return pairs
+
+# Batches keep running when their client disconnects; drain() waits for them
+_batches = set()
+
+@api.route('/api/fuse/batch', methods=['POST'])
+def fuse_batch():
+    """
+    Batch fusion endpoint - Fuse a list of pairs, streamed as NDJSON:
+    one line per distinct pair as it completes (status cached|complete|failed),
+    then a summary line once every fusion is in the pokedex (one bulk write)
+    """
+    try:
+        data = request.json or {}
+        pairs = parse_batch_pairs(data.get('pairs'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    force_regenerate = bool(data.get('force_regenerate', False))
+    logger.log_info("Fuse batch request received", {
+        "pairs": len(pairs),
+        "force_regenerate": force_regenerate
+    })
+
+    # The batch runs on the aio loop and hands its lines to the response through a queue
+    lines = queue.Queue()
+
+    async def run_batch():
+        try:
+            # Upstream calls of the batch give way to interactive fusions and suggestions
+            with upstream.priority(upstream.BATCH):
+                async for item in get_orchestrator().afuse_batch(pairs, force_regenerate=force_regenerate):
+                    lines.put(item)
+        except Exception as e:
+            lines.put({"status": "error", "error": str(e)})
+        finally:
+            lines.put(None)
+
+    future = aio.submit(run_batch())
+    _batches.add(future)
+    future.add_done_callback(_batches.discard)
+
+    def stream():
+        while True:
+            item = lines.get()
+            if item is None:
+                return
+            yield json.dumps(item) + "\n"
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api.route('/api/fuse/jobs/<job_id>', methods=['GET'])
+def get_fuse_job(job_id):
+    """Fusion job status, progress and result"""
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "job_id not found"}), 404
+    return jsonify(job), 200
+
+@api.route('/api/fuse/jobs/<job_id>/events', methods=['GET'])
+def stream_fuse_job(job_id):
+    """Fusion job progress as Server-Sent Events (progress, then complete or failed)"""
+    if not job_queue.get(job_id):
+        return jsonify({"error": "job_id not found"}), 404
+
+    def events():
+        for job in job_queue.iter_events(job_id):
+            event = job['status'] if job['status'] in TERMINAL_STATUSES else 'progress'
+            yield f"event: {event}\ndata: {json.dumps(job)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api.route('/api/webhooks/leonardo', methods=['POST'])
+def leonardo_webhook():
+    """Leonardo generation callback: completes the waiting image stage (any worker, via the shared store)"""
+    if not LEONARDO_WEBHOOK_SECRET:
+        return jsonify({"error": "Leonardo webhook disabled (LEONARDO_WEBHOOK_SECRET not set)"}), 404
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {LEONARDO_WEBHOOK_SECRET}".encode()):
+        return jsonify({"error": "invalid webhook credentials"}), 401
+
+    try:
+        generation_id, status, image_url, error = parse_callback(request.get_json(silent=True))
+    except (ValueError, AttributeError) as e:
+        return jsonify({"error": f"invalid callback: {e}"}), 400
+
+    get_generation_tracker().record_callback(generation_id, status, image_url, error)
+    logger.log_info("Leonardo callback received", {"generation_id": generation_id, "status": status})
+    return jsonify({"received": True}), 200
+
+@api.route('/api/pokedex/add', methods=['POST'])
 def add_pokedex():
     """Add fused pokemon to pokedex"""
     try:
@@ -87,7 +334,7 @@ def add_pokedex():
         if not fusion_data:
             return jsonify({"error": "fusion_data required"}), 400
         
-        result = orchestrator.add_to_pokedex(fusion_data)
+        result = get_orchestrator().add_to_pokedex(fusion_data)
         
         logger.log_success("Pokedex entry added", {"url": result.get('url')})
         return jsonify(result), 200
@@ -96,11 +343,11 @@ def add_pokedex():
         logger.log_error("Add pokedex failed", str(e))
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/pokedex/<fusion_id>', methods=['GET'])
+@api.route('/api/pokedex/<fusion_id>', methods=['GET'])
 def get_pokedex_entry(fusion_id):
     """Get fused pokemon from pokedex by id"""
     try:
-        result = orchestrator.get_pokedex_entry(fusion_id)
+        result = get_orchestrator().get_pokedex_entry(fusion_id)
 
         if not result:
             return jsonify({"error": "fusion_id not found"}), 404
@@ -111,17 +358,165 @@ def get_pokedex_entry(fusion_id):
         logger.log_error("Get pokedex failed", str(e))
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/pokedex', methods=['GET'])
+def pokedex_query(args):
+    """PokedexQuery from listing query parameters, raises ValueError"""
+    return PokedexQuery(
+        types=args.getlist('type'),
+        parent_id=args.get('parent_id'),
+        min_stat_total=args.get('min_stat_total'),
+        max_stat_total=args.get('max_stat_total'),
+        sort=args.get('sort', 'created'),
+        order=args.get('order', 'asc')
+    )
+
+def page_limit(args):
+    return min(max(int(args.get('limit', POKEDEX_PAGE_SIZE)), 1), POKEDEX_MAX_PAGE_SIZE)
+
+@api.route('/api/pokedex', methods=['GET'])
 def list_pokedex_entries():
-    """List fused pokemons in pokedex"""
+    """
+    List fused pokemons in pokedex, one page at a time
+    Query: type (repeatable), parent_id, min_stat_total, max_stat_total,
+    sort (created|id|name|stat_total), order (asc|desc), limit, cursor,
+    format=ndjson streams every matching entry instead of a page.
+    """
     try:
-        result = orchestrator.list_pokedex_entries()
+        args = request.args
+        query = pokedex_query(args)
+
+        if args.get('format') == 'ndjson':
+            def lines():
+                for entry in get_orchestrator().stream_pokedex_entries(query):
+                    yield json.dumps(entry) + "\n"
+            return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+        result = get_orchestrator().list_pokedex_entries(query, page_limit(args), args.get('cursor'))
         return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.log_error("List pokedex failed", str(e))
         return jsonify({"error": str(e)}), 500
 
+@api.route('/api/pokedex/atlas', methods=['GET'])
+def list_pokedex_atlas():
+    """
+    One page of /api/pokedex plus a sprite atlas of its thumbnails (same query parameters):
+    {items, next_cursor, atlas: {url, width, height, tile, sprites: {fusion_id: {x, y, w, h}}} or null}
+    """
+    try:
+        args = request.args
+        result = get_orchestrator().list_pokedex_atlas(pokedex_query(args), page_limit(args), args.get('cursor'))
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.log_error("List pokedex atlas failed", str(e))
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/pokedex/atlas/<name>', methods=['GET'])
+def get_pokedex_atlas(name):
+    """Atlas sheet by content key, immutable like /api/images"""
+    key, _, extension = name.partition('.')
+    path = get_atlas_cache().path(key)
+    if extension != 'webp' or len(key) != 64 or not key.isalnum() or not os.path.exists(path):
+        return jsonify({"error": "atlas not found"}), 404
+    return send_immutable(path, 'image/webp', key)
+
+def send_immutable(path, mimetype, etag):
+    """File whose content never changes for its URL: strong ETag, cached for a year, Range requests"""
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@api.route('/api/images/<name>', methods=['GET'])
+def get_image(name):
+    """
+    Fusion image by content hash: <sha256>.png (original), <sha256>.thumb.webp, <sha256>.webp
+    Immutable: strong ETag (If-None-Match -> 304), cached for a year, Range requests supported
+    """
+    parsed = parse_name(name)
+    if parsed is None:
+        return jsonify({"error": "image not found"}), 404
+    digest, variant = parsed
+
+    store = get_image_store()
+    if not store.exists(digest):
+        return jsonify({"error": "image not found"}), 404
+    if not store.exists(digest, variant):
+        # Variant not derived yet (or Pillow missing): the original meanwhile, not cached under this name
+        store.schedule_variants(digest)
+        response = redirect(image_url(digest, ORIGINAL), code=302)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    return send_immutable(store.path(digest, variant), VARIANTS[variant][1], f"{digest}-{variant}")
+
+@api.route('/api/debug/traces', methods=['GET'])
+def debug_traces():
+    """Recent request traces and per-span p50/p95 (in-process ring buffer)"""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "summary": recorder.summary(),
+        "traces": recorder.traces(limit, request.args.get('request_id'))
+    }), 200
+
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text format: routes, upstream calls, caches, Pokedex size"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def create_app():
+    """Flask app factory (also picked up by `flask run` and wsgi.py)"""
+    app = Flask(__name__)
+    CORS(app, expose_headers=['X-Request-ID'])
+    app.register_blueprint(api)
+
+    registry.gauge("pokedex_entries", "Fusions stored in the Pokedex", lambda: get_pokedex_store().count())
+    registry.gauge("pokedex_fusion_jobs", "Fusion jobs by status", lambda: {
+        (status,): count for status, count in job_queue.stats().items()
+    }, ("status",))
+    registry.gauge("pokedex_upstream_calls", "Outbound calls running or queued by the upstream scheduler, by provider", lambda: {
+        (provider, state): counts[state] for provider, counts in upstream.stats().items() for state in ('running', 'queued')
+    }, ("provider", "state"))
+    registry.gauge("pokedex_leonardo_pending_generations", "Leonardo generations waited on by this process",
+                   lambda: get_generation_tracker().stats()['pending'])
+    registry.gauge("pokedex_log_records_dropped", "Log records dropped because the log queue was full",
+                   lambda: get_log_pipeline().dropped)
+    return app
+
+def warm_up():
+    """Load catalog, indexes, agents and stores, start job workers: run once per worker before serving"""
+    start = time.monotonic()
+    catalog = get_catalog()
+    suggest_index = get_suggest_index()
+    get_orchestrator()
+    entries = get_pokedex_store().count()
+    get_fusion_cache()
+    job_queue.start()
+    logger.log_success("Worker warmed up", {
+        "pid": os.getpid(),
+        "catalog": len(catalog) if catalog else None,
+        "suggest_index": suggest_index is not None,
+        "pokedex_entries": entries,
+        "duration_ms": round((time.monotonic() - start) * 1000, 1)
+    })
+
+def drain(timeout=JOB_DRAIN_TIMEOUT):
+    """Graceful stop: no new jobs claimed, running fusions and batches finish (up to timeout), pending writes flushed"""
+    logger.log_info("Draining fusion jobs", {"pid": os.getpid(), "timeout": timeout})
+    deadline = time.monotonic() + timeout
+    job_queue.shutdown(wait=True, timeout=timeout)
+    if _batches:
+        futures.wait(list(_batches), timeout=max(deadline - time.monotonic(), 0))
+    get_pokedex_store().flush()
+    get_log_pipeline().flush()
+
 if __name__ == '__main__':
-    port = int(os.getenv('FLASK_PORT', 8081))
-    logger.log_info("Flask server starting", {"port": port})
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # Development server; production: gunicorn -c gunicorn.conf.py wsgi:app
+    debug = FLASK_ENV == 'development'
+    logger.log_info("Flask server starting", {"port": FLASK_PORT, "debug": debug})
+    create_app().run(host='0.0.0.0', port=FLASK_PORT, debug=debug)
@@ -0,0 +1 @@
+"""Offline micro-benchmarks of the scoring, fusion, logging and Pokedex storage hot paths (python -m benchmarks)"""
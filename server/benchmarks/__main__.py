@@ -0,0 +1,122 @@
+"""
+Offline micro-benchmarks on synthetic catalogs (no network, no real data touched).
+
+    python -m benchmarks                                  # 150, 1000 and 10000 species
+    python -m benchmarks --sizes 150 --quick --filter suggest.
+    python -m benchmarks --save-baseline                  # record benchmarks/results/baseline.json
+    python -m benchmarks --baseline benchmarks/results/baseline.json --threshold 0.25
+
+Results go to --out (JSON, per case: best and median time per call, per item).
+With --baseline, exits with status 1 when a case is slower than the baseline
+by more than --threshold (0.25 = 25%). Compare runs of the same machine.
+"""
+import argparse
+import fnmatch
+import os
+import shutil
+import sys
+import tempfile
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def isolate(data_dir):
+    """Point every data path to data_dir before utils.config is imported (the app's data stays untouched)"""
+    os.environ.update({
+        'CATALOG_FILE': os.path.join(data_dir, 'no_catalog.json'),  # the synthetic catalogs are set on the tools
+        'SUGGEST_INDEX_DIR': os.path.join(data_dir, 'suggest_index'),
+        'POKEDEX_BACKEND': 'sqlite',
+        'POKEDEX_DB_FILE': os.path.join(data_dir, 'pokedex.db'),
+        'POKEDEX_JSON_FILE': os.path.join(data_dir, 'fused_pokemons.json'),
+        'POKEDEX_JSON_EXPORT': 'false',
+        'FUSION_CACHE_DB': os.path.join(data_dir, 'fusion_cache.db'),
+        'FUSION_JOBS_DB': os.path.join(data_dir, 'jobs.db'),
+        'LEONARDO_GENERATIONS_DB': os.path.join(data_dir, 'generations.db'),
+        'IMAGE_STORE_DIR': os.path.join(data_dir, 'images'),
+        'TRACE_EXPORT_FILE': '',
+        'LOG_LEVEL': 'INFO',
+        'LOG_STDOUT': 'false',
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Offline micro-benchmarks")
+    parser.add_argument('--sizes', default='150,1000,10000', help="Synthetic catalog sizes (species, and Pokedex fusions)")
+    parser.add_argument('--filter', action='append', default=[],
+                        help="Run cases whose name matches (substring or glob, repeatable)")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per case")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds per timed run")
+    parser.add_argument('--quick', action='store_true', help="3 runs of 0.05 s (smoke run, noisy)")
+    parser.add_argument('--pokedex-backend', choices=('sqlite', 'json'), default='sqlite')
+    parser.add_argument('--out', default=os.path.join(RESULTS_DIR, 'latest.json'), help="Results file")
+    parser.add_argument('--baseline', help="Results file to compare with")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument('--save-baseline', action='store_true', help="Also write the results to results/baseline.json")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    repeat, min_time = (3, 0.05) if args.quick else (args.repeat, args.min_time)
+
+    data_dir = tempfile.mkdtemp(prefix='pokedex-bench-')
+    isolate(data_dir)
+    try:
+        return run(args, sizes, repeat, min_time, data_dir)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def run(args, sizes, repeat, min_time, data_dir):
+    from utils.config import LOG_QUEUE_SIZE
+    from utils.logger import RotatingLogFile, get_log_pipeline
+    from benchmarks import harness
+    from benchmarks.cases import build_cases
+
+    # Records logged by the measured code go to the temporary directory, not logs/agents.log
+    get_log_pipeline().output = RotatingLogFile(os.path.join(data_dir, 'agents.log'))
+
+    baseline = harness.load(args.baseline)['results'] if args.baseline else None
+
+    def selected(case):
+        return not args.filter or any(
+            pattern in case.name or fnmatch.fnmatch(case.name, pattern) for pattern in args.filter
+        )
+
+    print(f"Benchmarks: sizes {sizes}, {repeat} runs of >= {min_time:g}s, data in {data_dir}")
+    results = {}
+    for case in build_cases(sizes, args.pokedex_backend, data_dir, LOG_QUEUE_SIZE):
+        if not selected(case):
+            continue
+        result = harness.measure(case, repeat=repeat, min_time=min_time)
+        results[case.key] = result
+        print(f"  {case.key:<50} {harness.format_us(result['per_call_us']):>12}/call  "
+              f"{result['per_item_ns']:>12.1f} ns/item  (x{result['number']})")
+
+    meta = dict(harness.environment(), sizes=sizes, repeat=repeat, min_time=min_time,
+                pokedex_backend=args.pokedex_backend)
+    harness.save(args.out, results, meta)
+    print(f"Results written: {args.out}")
+    if args.save_baseline:
+        path = os.path.join(RESULTS_DIR, 'baseline.json')
+        harness.save(path, results, meta)
+        print(f"Baseline written: {path}")
+
+    if baseline is None:
+        return 0
+
+    if args.filter:
+        baseline = {key: value for key, value in baseline.items() if key in results}  # cases not run are not missing
+    rows = harness.compare(results, baseline, args.threshold)
+    print(f"\nComparison with {args.baseline} (threshold {args.threshold:.0%}):")
+    for key, before, after, ratio, status in rows:
+        change = f"{(ratio - 1) * 100:+.1f}%" if ratio is not None else ''
+        print(f"  {key:<50} {harness.format_us(before):>12} -> {harness.format_us(after):>12} {change:>9}  {status}")
+
+    regressions = [row[0] for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
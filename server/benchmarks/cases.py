@@ -0,0 +1,228 @@
+"""
+Benchmark cases. Imported only after benchmarks.__main__ pointed every data
+path to a temporary directory (see isolate()), never at import time of the app.
+
+Per catalog size:
+- suggest.*: type compatibility of one base against the whole catalog,
+  scalar SuggestionTypesTool._score_compatibility and its matrix version
+- stats.*: StatFilterTop3Tool._normalize_stats / _euclidean_distance over
+  the catalog, and the vectorized stat_scores
+- fusion.*: FusionStatsMovesTool.fuse_stats_moves / _calculate_type_synergy
+  over FUSION_PAIRS random pairs, and their table/batch versions
+- pokedex.*: AddPokedexEntry get / list / add on a store holding `size`
+  fusions (add runs last: the store grows by the entries it adds)
+Once:
+- logger.*: AgentLogger per-call cost, enabled and level-gated
+"""
+import itertools
+import random
+from utils.config import TYPE_EFFECTIVENESS
+from utils.logger import AgentLogger, get_log_pipeline
+from utils.pokedex_store import JsonPokedexStore, PokedexQuery, SqlitePokedexStore
+from utils.stat_index import normalized_stats, stat_scores
+from utils.type_matrix import encode_types, score_compatibility_batch, type_synergy
+from benchmarks import synthetic
+from benchmarks.harness import Case
+
+FUSION_PAIRS = 200
+POKEDEX_LOOKUPS = 200
+PAGE_SIZE = 50
+
+
+def _base_profile(base):
+    weaknesses, strong_against = set(), set()
+    for ptype in base['types']:
+        weaknesses.update(TYPE_EFFECTIVENESS[ptype]['weak_to'])
+        strong_against.update(TYPE_EFFECTIVENESS[ptype]['strong_against'])
+    return weaknesses, strong_against
+
+
+def suggest_cases(catalog, types_tool, stats_tool):
+    size = len(catalog)
+    every = catalog.all()
+    base = every[0]
+
+    def score_compatibility():
+        weaknesses, strong_against = _base_profile(base)
+
+        def run():
+            for candidate in every:
+                types_tool._score_compatibility(candidate, weaknesses, strong_against, base['types'])
+        return run
+
+    def score_compatibility_batch_setup():
+        encoded = encode_types([c['types'] for c in every])
+        return lambda: score_compatibility_batch(base['types'], encoded)
+
+    def normalize_stats():
+        def run():
+            for candidate in every:
+                stats_tool._normalize_stats(candidate['stats'])
+        return run
+
+    def euclidean_distance():
+        base_norm = stats_tool._normalize_stats(base['stats'])
+        candidates_norm = [stats_tool._normalize_stats(c['stats']) for c in every]
+
+        def run():
+            for candidate_norm in candidates_norm:
+                stats_tool._euclidean_distance(base_norm, candidate_norm)
+        return run
+
+    def stat_scores_setup():
+        base_norm = normalized_stats([base['stats']])[0]
+        candidates_norm = normalized_stats([c['stats'] for c in every])
+        return lambda: stat_scores(base_norm, candidates_norm)
+
+    return [
+        Case('suggest.score_compatibility', score_compatibility, size, items=size),
+        Case('suggest.score_compatibility_batch', score_compatibility_batch_setup, size, items=size),
+        Case('stats.normalize_stats', normalize_stats, size, items=size),
+        Case('stats.euclidean_distance', euclidean_distance, size, items=size),
+        Case('stats.stat_scores', stat_scores_setup, size, items=size),
+    ]
+
+
+def fusion_cases(catalog, fusion_tool):
+    size = len(catalog)
+    pairs = synthetic.sample_pairs(catalog, FUSION_PAIRS)
+
+    def fuse_stats_moves():
+        def run():
+            for pokemon1, pokemon2 in pairs:
+                fusion_tool.fuse_stats_moves(pokemon1, pokemon2)
+        return run, get_log_pipeline().flush
+
+    def fuse_stats_moves_batch():
+        return (lambda: fusion_tool.fuse_stats_moves_batch(pairs)), get_log_pipeline().flush
+
+    def calculate_type_synergy():
+        def run():
+            for pokemon1, pokemon2 in pairs:
+                fusion_tool._calculate_type_synergy(pokemon1['types'], pokemon2['types'])
+        return run
+
+    def type_synergy_setup():
+        def run():
+            for pokemon1, pokemon2 in pairs:
+                type_synergy(pokemon1['types'], pokemon2['types'])
+        return run
+
+    # Both log two records per call: runs are bounded and the log queue drained between them, so none is dropped
+    return [
+        Case('fusion.fuse_stats_moves', fuse_stats_moves, size, items=FUSION_PAIRS, max_number=20),
+        Case('fusion.fuse_stats_moves_batch', fuse_stats_moves_batch, size, items=FUSION_PAIRS, max_number=2000),
+        Case('fusion.calculate_type_synergy', calculate_type_synergy, size, items=FUSION_PAIRS),
+        Case('fusion.type_synergy', type_synergy_setup, size, items=FUSION_PAIRS),
+    ]
+
+
+def pokedex_cases(catalog, pokedex_tool, backend, data_dir):
+    """get / list / add on a store pre-filled with len(catalog) fusions"""
+    size = len(catalog)
+    entries = synthetic.fusion_entries(catalog, size)
+    state = {}
+
+    def store():
+        if 'store' not in state:
+            if backend == 'json':
+                state['store'] = JsonPokedexStore(json_file=f"{data_dir}/pokedex-{size}.json")
+            else:
+                state['store'] = SqlitePokedexStore(db_file=f"{data_dir}/pokedex-{size}.db", json_file=None,
+                                                    json_export=False)
+            state['store'].upsert_many(entries)
+        pokedex_tool.store = state['store']
+        return state['store']
+
+    def get_entry():
+        store()
+        rng = random.Random(size)
+        ids = [rng.choice(entries)['id'] for _ in range(POKEDEX_LOOKUPS)]
+
+        def run():
+            for fusion_id in ids:
+                pokedex_tool.get_entry(fusion_id)
+        return run
+
+    def list_first_page():
+        store()
+        return lambda: pokedex_tool.list_entries(PokedexQuery(), PAGE_SIZE)
+
+    def list_filtered_deep_page():
+        store()
+        query = PokedexQuery(types=[synthetic.TYPES[0]], sort='stat_total', order='desc')
+        # Cursor halfway through the filtered listing
+        cursor, pages = None, []
+        while True:
+            result = pokedex_tool.list_entries(query, PAGE_SIZE, cursor)
+            pages.append(cursor)
+            cursor = result['next_cursor']
+            if cursor is None:
+                break
+        middle = pages[len(pages) // 2]
+        return lambda: pokedex_tool.list_entries(query, PAGE_SIZE, middle)
+
+    def add_entry():
+        store()
+        every = catalog.all()
+        counter = itertools.count(1)
+        rng = random.Random(size)
+
+        def run():
+            pokemon1, pokemon2 = rng.sample(every, 2)
+            entry = synthetic.fusion_entry(pokemon1, pokemon2)
+            entry['id'] = f"{1000000 + next(counter)}-{pokemon2['id']}"  # always a new fusion
+            pokedex_tool.add_entry(entry)
+        return run, get_log_pipeline().flush
+
+    # JSON backend rewrites the whole file per add: cap its runs
+    add_cap = 50 if backend == 'json' else 2000
+    return [
+        Case('pokedex.get_entry', get_entry, size, items=POKEDEX_LOOKUPS),
+        Case('pokedex.list_first_page', list_first_page, size, items=PAGE_SIZE),
+        Case('pokedex.list_filtered_deep_page', list_filtered_deep_page, size, items=PAGE_SIZE),
+        Case('pokedex.add_entry', add_entry, size, max_number=add_cap),
+    ]
+
+
+def logger_cases(queue_size):
+    logger = AgentLogger("Benchmark")
+    pipeline = get_log_pipeline()
+    data = {"pokemon1": "pikachu", "pokemon2": "dracaufeu", "count": 3}
+    # Runs stay under the queue size and the queue is drained between runs: measured records are never dropped
+    cap = max(queue_size // 2, 1)
+
+    def log_info():
+        return (lambda: logger.log_info("Benchmark record", data)), pipeline.flush
+
+    def log_debug_disabled():
+        return lambda: logger.log_debug("Benchmark record", data)
+
+    def log_debug_lazy():
+        return lambda: logger.log_debug("Benchmark record", lambda: {"moves": sorted(data)})
+
+    return [
+        Case('logger.log_info', log_info, max_number=cap),
+        Case('logger.log_debug_disabled', log_debug_disabled),
+        Case('logger.log_debug_lazy', log_debug_lazy),
+    ]
+
+
+def build_cases(sizes, backend, data_dir, queue_size):
+    """Every case, in run order (catalogs are built lazily, one size at a time)"""
+    from tools.fusion_tools import FusionStatsMovesTool
+    from tools.pokedex_tools import AddPokedexEntry
+    from tools.suggestion_tools import StatFilterTop3Tool, SuggestionTypesTool
+
+    types_tool = SuggestionTypesTool()
+    stats_tool = StatFilterTop3Tool()
+    fusion_tool = FusionStatsMovesTool()
+    pokedex_tool = AddPokedexEntry()
+
+    yield from logger_cases(queue_size)
+    for size in sizes:
+        catalog = synthetic.make_catalog(size)
+        types_tool.catalog = stats_tool.catalog = catalog
+        yield from suggest_cases(catalog, types_tool, stats_tool)
+        yield from fusion_cases(catalog, fusion_tool)
+        yield from pokedex_cases(catalog, pokedex_tool, backend, data_dir)
@@ -0,0 +1,161 @@
+"""
+Timing, result files and baseline comparison of the benchmark suite.
+
+Each case is timed like timeit: the number of calls per run grows until a
+run lasts `min_time`, then `repeat` runs are timed. The best run is the
+reference (least disturbed by the rest of the machine), the median is
+reported alongside it.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+RESULTS_VERSION = 1
+
+
+class Case:
+    """
+    One benchmark: setup() returns the function to time (called without
+    arguments), or (function, teardown) where teardown runs between timed runs.
+    items: units of work per call (species scored, pairs fused...), for per-item times.
+    """
+
+    def __init__(self, name, setup, size=None, items=1, max_number=None):
+        self.name = name
+        self.setup = setup
+        self.size = size
+        self.items = items
+        self.max_number = max_number  # cap on calls per run (e.g. the log queue size)
+
+    @property
+    def key(self):
+        return self.name if self.size is None else f"{self.name}[n={self.size}]"
+
+
+def _run(fn, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - start
+
+
+def measure(case, repeat=5, min_time=0.2):
+    """Time a case, returns its result dict"""
+    prepared = case.setup()
+    fn, teardown = prepared if isinstance(prepared, tuple) else (prepared, None)
+    max_number = case.max_number or 10 ** 9
+
+    # Calibration (also warms up caches and lazy imports)
+    number = 1
+    while True:
+        elapsed = _run(fn, number)
+        if teardown:
+            teardown()
+        if elapsed >= min_time or number >= max_number:
+            break
+        estimate = int(number * min_time / elapsed * 1.2) if elapsed > 0 else number * 10
+        number = min(max(number * 2, estimate), max_number)
+
+    timings = []
+    for _ in range(repeat):
+        timings.append(_run(fn, number))
+        if teardown:
+            teardown()
+
+    best = min(timings) / number
+    median = statistics.median(timings) / number
+    return {
+        "name": case.name,
+        "size": case.size,
+        "items": case.items,
+        "number": number,
+        "repeat": repeat,
+        "per_call_us": round(best * 1e6, 3),
+        "median_per_call_us": round(median * 1e6, 3),
+        "per_item_ns": round(best * 1e9 / case.items, 1),
+    }
+
+
+def environment():
+    """Machine and code version the results were measured on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(__file__)
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy_version,
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def save(path, results, meta):
+    """Write results as {'version', 'meta', 'results': {key: result}}"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": RESULTS_VERSION, "meta": meta, "results": results}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    if payload.get('version') != RESULTS_VERSION:
+        raise ValueError(f"{path}: results version {payload.get('version')}, expected {RESULTS_VERSION}")
+    return payload
+
+
+def compare(results, baseline, threshold):
+    """
+    Rows (key, baseline us, current us, ratio, status) for every case of either run.
+    status: regression when the best per-call time grew by more than threshold
+    (0.25 = 25% slower), improvement when it shrank by as much, ok, new or missing.
+    """
+    rows = []
+    for key in sorted(set(results) | set(baseline)):
+        current, previous = results.get(key), baseline.get(key)
+        if previous is None:
+            rows.append((key, None, current['per_call_us'], None, 'new'))
+            continue
+        if current is None:
+            rows.append((key, previous['per_call_us'], None, None, 'missing'))
+            continue
+        ratio = current['per_call_us'] / previous['per_call_us'] if previous['per_call_us'] else 1.0
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold):
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append((key, previous['per_call_us'], current['per_call_us'], ratio, status))
+    return rows
+
+
+def format_us(value):
+    if value is None:
+        return '-'
+    if value >= 1e6:
+        return f"{value / 1e6:.2f} s"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f} ms"
+    return f"{value:.2f} us"
@@ -0,0 +1,263 @@
+"""
+End-to-end load generator: drives a running server at a target request rate.
+
+    python -m fakes                                   # upstream stand-ins (see fakes/__main__.py)
+    python -m benchmarks.load --rps 20 --duration 60 --mix suggest=5,fuse=1,pokedex=4
+    python -m benchmarks.load --url http://localhost:8081 --rps 5 --follow-jobs --out load.json
+
+Arrivals are open loop (Poisson at --rps, whatever the response times), so a
+saturated server shows up as growing latencies and errors rather than as a
+lower request rate. Requests that would exceed --concurrency in flight are
+dropped and counted. Reported per endpoint after the --warmup seconds:
+throughput, latency percentiles and errors by kind. With --follow-jobs, each
+fusion job is polled to its end and its total time reported as fuse.job.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import httpx
+
+ENDPOINTS = ('suggest', 'fuse', 'pokedex')
+POKEDEX_SORTS = ('created', 'id', 'name', 'stat_total')
+TYPES = ('normal', 'fire', 'water', 'electric', 'grass', 'ice', 'fighting', 'poison', 'ground',
+         'flying', 'psychic', 'bug', 'rock', 'ghost', 'dragon', 'dark', 'steel', 'fairy')
+PERCENTILES = (50, 90, 95, 99)
+
+
+def parse_mix(value):
+    """'suggest=5,fuse=1,pokedex=4' -> {'suggest': 5.0, ...}, raises ValueError"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (expected one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("mix needs at least one positive weight")
+    return mix
+
+
+def parse_ids(value):
+    """'1-151' or '1,4,7' -> list of ids"""
+    ids = []
+    for part in value.split(','):
+        start, _, end = part.partition('-')
+        ids.extend(range(int(start), int(end or start) + 1))
+    return ids
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Recorder:
+    """Latencies and outcomes per endpoint, only for requests started after the warmup"""
+
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.latencies = {}
+        self.outcomes = {}
+        self.dropped = 0
+
+    def record(self, endpoint, started, outcome):
+        if started < self.measure_from:
+            return
+        self.outcomes.setdefault(endpoint, {}).setdefault(outcome, 0)
+        self.outcomes[endpoint][outcome] += 1
+        if outcome == 'ok':
+            self.latencies.setdefault(endpoint, []).append(time.monotonic() - started)
+
+    def drop(self, started):
+        if started >= self.measure_from:
+            self.dropped += 1
+
+    def report(self, elapsed):
+        """Per endpoint: requests, ok, errors by kind, throughput (ok/s) and latency percentiles (ms)"""
+        rows = {}
+        for endpoint in sorted(self.outcomes):
+            outcomes = self.outcomes[endpoint]
+            latencies = sorted(self.latencies.get(endpoint, []))
+            requests = sum(outcomes.values())
+            ok = outcomes.get('ok', 0)
+            row = {
+                "requests": requests,
+                "ok": ok,
+                "errors": {kind: count for kind, count in sorted(outcomes.items()) if kind != 'ok'},
+                "error_rate": round(1 - ok / requests, 4) if requests else 0.0,
+                "throughput": round(ok / elapsed, 2) if elapsed else 0.0,
+            }
+            for p in PERCENTILES:
+                value = percentile(latencies, p)
+                row[f"p{p}_ms"] = round(value * 1000, 1) if value is not None else None
+            row["max_ms"] = round(latencies[-1] * 1000, 1) if latencies else None
+            rows[endpoint] = row
+        return rows
+
+
+class LoadGenerator:
+    def __init__(self, client, args, mix, ids, recorder):
+        self.client = client
+        self.args = args
+        self.endpoints = list(mix)
+        self.weights = list(mix.values())
+        self.ids = ids
+        self.recorder = recorder
+        self.rng = random.Random(args.seed)
+        self.in_flight = 0
+        self.tasks = set()
+
+    async def run(self, until):
+        """Open loop arrivals until `until` (monotonic), then wait for the requests in flight"""
+        next_at = time.monotonic()
+        while True:
+            next_at += self.rng.expovariate(self.args.rps)
+            if next_at >= until:
+                break
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            started = time.monotonic()
+            if self.in_flight >= self.args.concurrency:
+                self.recorder.drop(started)
+                continue
+            endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+            task = asyncio.create_task(self.request(endpoint, started))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        if self.tasks:
+            await asyncio.wait(self.tasks)
+
+    async def request(self, endpoint, started):
+        self.in_flight += 1
+        try:
+            response = await getattr(self, endpoint)()
+            outcome = 'ok' if response.status_code < 400 else f"http_{response.status_code}"
+        except httpx.TimeoutException:
+            response, outcome = None, 'timeout'
+        except httpx.HTTPError as e:
+            response, outcome = None, type(e).__name__
+        finally:
+            self.in_flight -= 1
+        self.recorder.record(endpoint, started, outcome)
+
+        if endpoint == 'fuse' and outcome == 'ok' and self.args.follow_jobs:
+            body = response.json()
+            if body.get('job_id'):
+                self.recorder.record('fuse.job', started, await self.follow(body['job_id']))
+            else:
+                self.recorder.record('fuse.job', started, 'ok')  # served from the fusion cache
+
+    async def suggest(self):
+        return await self.client.post('/api/suggest', json={"pokemon_id": self.rng.choice(self.ids)})
+
+    async def fuse(self):
+        pokemon1_id, pokemon2_id = self.rng.sample(self.ids, 2)
+        return await self.client.post('/api/fuse', json={"pokemon1_id": pokemon1_id, "pokemon2_id": pokemon2_id})
+
+    async def pokedex(self):
+        params = {"limit": 20, "sort": self.rng.choice(POKEDEX_SORTS), "order": self.rng.choice(('asc', 'desc'))}
+        if self.rng.random() < 0.5:
+            params["type"] = self.rng.choice(TYPES)
+        return await self.client.get('/api/pokedex', params=params)
+
+    async def follow(self, job_id):
+        """Poll a fusion job to its end: 'ok' when complete, else the failure kind"""
+        deadline = time.monotonic() + self.args.job_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.args.poll_interval)
+            try:
+                response = await self.client.get(f'/api/fuse/jobs/{job_id}')
+            except httpx.HTTPError:
+                continue
+            if response.status_code != 200:
+                return f"http_{response.status_code}"
+            status = response.json().get('status')
+            if status == 'complete':
+                return 'ok'
+            if status == 'failed':
+                return 'job_failed'
+        return 'job_timeout'
+
+
+def print_report(rows, dropped, elapsed, args):
+    print(f"\nLoad: {args.rps:g} req/s for {elapsed:.0f}s measured (after {args.warmup:g}s warmup), "
+          f"{dropped} dropped over --concurrency {args.concurrency}")
+    header = f"  {'endpoint':<10} {'requests':>8} {'ok':>7} {'err %':>6} {'ok/s':>7}" + \
+        "".join(f" {f'p{p}':>8}" for p in PERCENTILES) + f" {'max':>8}  errors"
+    print(header)
+    for endpoint, row in rows.items():
+        latencies = "".join(
+            f" {row[key]:>8.1f}" if row[key] is not None else f" {'-':>8}"
+            for key in [f"p{p}_ms" for p in PERCENTILES] + ["max_ms"]
+        )
+        errors = ", ".join(f"{kind}: {count}" for kind, count in row['errors'].items())
+        print(f"  {endpoint:<10} {row['requests']:>8} {row['ok']:>7} {row['error_rate'] * 100:>6.1f} "
+              f"{row['throughput']:>7.2f}{latencies}  {errors}")
+    print("  (latencies in ms, of successful requests)")
+
+
+async def run(args, mix, ids):
+    start = time.monotonic()
+    measure_from = start + args.warmup
+    recorder = Recorder(measure_from)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        health = await client.get('/api/health')
+        health.raise_for_status()
+        await LoadGenerator(client, args, mix, ids, recorder).run(measure_from + args.duration)
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description="End-to-end load generator")
+    parser.add_argument('--url', default='http://localhost:8081', help="Server base URL")
+    parser.add_argument('--rps', type=float, default=10.0, help="Target request rate (Poisson arrivals)")
+    parser.add_argument('--duration', type=float, default=30.0, help="Measured seconds")
+    parser.add_argument('--warmup', type=float, default=5.0, help="Seconds of load before measuring")
+    parser.add_argument('--mix', default='suggest=5,fuse=1,pokedex=4', help="Endpoint weights")
+    parser.add_argument('--ids', default='1-151', help="Species ids to draw from (ranges and lists)")
+    parser.add_argument('--concurrency', type=int, default=200, help="Max requests in flight, above are dropped")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per request timeout (seconds)")
+    parser.add_argument('--follow-jobs', action='store_true', help="Poll fusion jobs to their end (fuse.job)")
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--job-timeout', type=float, default=300.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--out', help="Write the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        mix, ids = parse_mix(args.mix), parse_ids(args.ids)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.rps <= 0 or len(ids) < 2:
+        parser.error("--rps must be positive and --ids hold at least two ids")
+
+    print(f"Load on {args.url}: {args.rps:g} req/s, mix {mix}, {len(ids)} ids, "
+          f"{args.warmup:g}s warmup + {args.duration:g}s")
+    try:
+        recorder = asyncio.run(run(args, mix, ids))
+    except httpx.HTTPError as e:
+        print(f"Server not reachable on {args.url}: {e}")
+        return 2
+
+    rows = recorder.report(args.duration)  # requests started in the measured window, over its length
+    print_report(rows, recorder.dropped, args.duration, args)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({
+                "url": args.url, "rps": args.rps, "mix": mix, "duration": args.duration,
+                "warmup": args.warmup, "concurrency": args.concurrency, "dropped": recorder.dropped,
+                "endpoints": rows
+            }, f, indent=2)
+        print(f"Report written: {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Deterministic synthetic data: species catalogs and Pokedex fusion entries.
+
+Shapes follow build_species_entry and AddPokedexEntry._entry, with value
+ranges close to the real Pokedex (1-2 types, base stats 5-255, 20-80 moves).
+"""
+import hashlib
+import random
+from utils.catalog import SpeciesCatalog
+from utils.config import TYPE_EFFECTIVENESS
+from utils.stat_index import STAT_ORDER
+
+TYPES = sorted(TYPE_EFFECTIVENESS)
+MOVES = [f"move-{i}" for i in range(900)]
+
+
+def species(pokemon_id, rng):
+    types = rng.sample(TYPES, rng.choice((1, 2)))
+    name = f"synth{pokemon_id}"
+    return {
+        'id': pokemon_id,
+        'name': name.capitalize(),
+        'name_en': name,
+        'types': types,
+        'stats': {key: rng.randint(5, 255) for key in STAT_ORDER},
+        'moves': rng.sample(MOVES, rng.randint(20, 80)),
+        'cry': None
+    }
+
+
+def make_catalog(size, seed=0):
+    """SpeciesCatalog of `size` species with ids 1..size"""
+    rng = random.Random(f"catalog-{size}-{seed}")
+    return SpeciesCatalog([species(i, rng) for i in range(1, size + 1)], source=f"synthetic:{size}")
+
+
+def sample_pairs(catalog, count, seed=0):
+    """`count` random (pokemon1, pokemon2) species pairs of the catalog"""
+    rng = random.Random(f"pairs-{len(catalog)}-{seed}")
+    every = catalog.all()
+    return [tuple(rng.sample(every, 2)) for _ in range(count)]
+
+
+def fusion_entry(pokemon1, pokemon2):
+    """Pokedex entry of a fusion, as written by AddPokedexEntry"""
+    fusion_id = f"{pokemon1['id']}-{pokemon2['id']}"
+    digest = hashlib.sha256(fusion_id.encode('utf-8')).hexdigest()
+    return {
+        'id': fusion_id,
+        'name': f"{pokemon1['name'][:4]}{pokemon2['name'][-4:]}",
+        'image': {
+            'type': 'image',
+            'local_path': f"/api/images/{digest}.png",
+            'thumbnail_path': f"/api/images/{digest}.thumb.webp",
+            'webp_path': f"/api/images/{digest}.webp",
+            'sha256': digest,
+            'fusion_name': fusion_id,
+            'size_bytes': 1500000
+        },
+        'cry': {'type': 'cry', 'local_path': None, 'pokemon1_cry': None, 'pokemon2_cry': None},
+        'types': list(dict.fromkeys(pokemon1['types'][:1] + pokemon2['types'][-1:])),
+        'stats': {key: (pokemon1['stats'][key] + pokemon2['stats'][key]) // 2 for key in STAT_ORDER},
+        'moves': list(dict.fromkeys(pokemon1['moves'] + pokemon2['moves']))[:8]
+    }
+
+
+def fusion_entries(catalog, count, seed=0):
+    """`count` distinct fusion entries of catalog species (fewer if the catalog has not enough pairs)"""
+    rng = random.Random(f"fusions-{len(catalog)}-{seed}")
+    every = catalog.all()
+    entries = {}
+    attempts = 0
+    while len(entries) < count and attempts < count * 20:
+        attempts += 1
+        pokemon1, pokemon2 = rng.sample(every, 2)
+        entry = fusion_entry(pokemon1, pokemon2)
+        entries.setdefault(entry['id'], entry)
+    return list(entries.values())
@@ -0,0 +1,32 @@
+"""
+Build the on-disk species catalog used by the suggestion and fusion agents.
+
+    python build_catalog.py --dump /path/to/api-data/data/api/v2
+    python build_catalog.py --api http://localhost:8000/api/v2
+"""
+import argparse
+from utils.catalog import CatalogImporter
+from utils.config import CATALOG_FILE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the species catalog")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--dump', help="PokeAPI dump directory (api-data layout)")
+    source.add_argument('--api', help="PokeAPI-compatible base URL (e.g. a local mock server)")
+    parser.add_argument('--limit', type=int, default=100000, help="Max species to import with --api")
+    parser.add_argument('--out', default=CATALOG_FILE, help="Output catalog file")
+    args = parser.parse_args()
+
+    importer = CatalogImporter()
+    if args.dump:
+        catalog = importer.from_dump(args.dump)
+    else:
+        catalog = importer.from_api(args.api.rstrip('/'), limit=args.limit)
+
+    catalog.save(args.out)
+    print(f"Catalog written: {args.out} ({len(catalog)} species)")
+
+
+if __name__ == '__main__':
+    main()
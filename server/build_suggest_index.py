@@ -0,0 +1,49 @@
+"""
+Build (or incrementally refresh) the precomputed suggestion index from the species catalog.
+
+    python build_suggest_index.py
+    python build_suggest_index.py --full --verify 50
+"""
+import argparse
+import random
+from utils.catalog import get_catalog
+from utils.config import SUGGEST_INDEX_DIR, SUGGEST_INDEX_TOP_K
+from utils.suggest_index import SuggestIndex, SuggestIndexBuilder
+
+
+def verify(catalog, index_dir, sample_size):
+    """Compare index rows with the live suggestion pipeline for a random sample of species"""
+    from agents.suggestion_agent import SuggestionAgent
+
+    agent = SuggestionAgent()
+    agent.suggest_index = None  # force the live pipeline
+    index = SuggestIndex.load(index_dir)
+
+    species = random.sample(catalog.all(), min(sample_size, len(catalog)))
+    mismatches = [s['id'] for s in species if index.lookup(s['id'], catalog) != agent.suggest_top_3(s['id'])]
+    return len(species), mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed suggestion index")
+    parser.add_argument('--out', default=SUGGEST_INDEX_DIR, help="Index directory")
+    parser.add_argument('--top-k', type=int, default=SUGGEST_INDEX_TOP_K, help="Suggestions kept per species")
+    parser.add_argument('--full', action='store_true', help="Ignore the previous index and rebuild every row")
+    parser.add_argument('--verify', type=int, default=0, metavar='N', help="Check N random rows against the live pipeline")
+    args = parser.parse_args()
+
+    catalog = get_catalog()
+    if not catalog:
+        raise SystemExit("No species catalog found, run build_catalog.py first")
+
+    summary = SuggestIndexBuilder(catalog, top_k=args.top_k).build(args.out, full=args.full)
+    print(f"Suggestion index written: {args.out} {summary}")
+
+    if args.verify:
+        checked, mismatches = verify(catalog, args.out, args.verify)
+        print(f"Verified {checked} rows against the live pipeline, {len(mismatches)} mismatches {mismatches}")
+        raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
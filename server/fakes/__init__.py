@@ -0,0 +1 @@
+"""Local fake upstream servers (PokeAPI, Mistral, Leonardo) for development and load testing (stdlib only)"""
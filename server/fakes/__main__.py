@@ -0,0 +1,73 @@
+"""
+Start the fake PokeAPI, Mistral and Leonardo servers together.
+
+    python -m fakes
+    python -m fakes --mistral-error-rate 0.05 --leonardo-mean 4 --leonardo-fail-rate 0.05
+
+Prints the environment to start the server with (then build a catalog from
+the fake PokeAPI, see fakes/pokeapi.py). Each fake can also run alone:
+python -m fakes.pokeapi / fakes.mistral / fakes.leonardo.
+"""
+import argparse
+from fakes import leonardo, mistral, pokeapi
+from fakes.common import DISTRIBUTIONS, wait_forever
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m fakes', description="Fake PokeAPI, Mistral and Leonardo servers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='lognormal',
+                        help="Latency / generation time distribution of every fake")
+    parser.add_argument('--jitter', type=float, default=0.3)
+
+    group = parser.add_argument_group('PokeAPI')
+    group.add_argument('--pokeapi-port', type=int, default=8091)
+    group.add_argument('--pokeapi-mean', type=float, default=0.02, help="Mean response latency (seconds)")
+    group.add_argument('--pokeapi-error-rate', type=float, default=0.0)
+    group.add_argument('--species', type=int, default=151, help="Species in the generated dataset")
+    group.add_argument('--catalog', help="Serve the species of this catalog file instead")
+
+    group = parser.add_argument_group('Mistral')
+    group.add_argument('--mistral-port', type=int, default=8092)
+    group.add_argument('--mistral-mean', type=float, default=0.6, help="Mean response latency (seconds)")
+    group.add_argument('--mistral-error-rate', type=float, default=0.0)
+    group.add_argument('--mistral-rate-limit', type=float, default=0.0, help="Requests per second before 429")
+
+    group = parser.add_argument_group('Leonardo')
+    group.add_argument('--leonardo-port', type=int, default=8090)
+    group.add_argument('--leonardo-mean', type=float, default=8.0, help="Mean generation time (seconds)")
+    group.add_argument('--leonardo-fail-rate', type=float, default=0.0, help="Share of generations ending FAILED")
+    group.add_argument('--leonardo-error-rate', type=float, default=0.0)
+    group.add_argument('--leonardo-rate-limit', type=float, default=0.0, help="Requests per second before 429")
+    group.add_argument('--webhook', help="Callback URL, e.g. http://localhost:8081/api/webhooks/leonardo")
+    group.add_argument('--webhook-secret', default='')
+    args = parser.parse_args()
+
+    host, shared = args.host, dict(distribution=args.distribution, jitter=args.jitter)
+    pokeapi_server, fake_pokeapi = pokeapi.serve(
+        host, args.pokeapi_port, species_count=args.species, catalog=args.catalog, mean=args.pokeapi_mean,
+        error_rate=args.pokeapi_error_rate, **shared
+    )
+    mistral_server, _ = mistral.serve(
+        host, args.mistral_port, mean=args.mistral_mean, error_rate=args.mistral_error_rate,
+        rate_limit=args.mistral_rate_limit, **shared
+    )
+    leonardo_server, _ = leonardo.serve(
+        host, args.leonardo_port, mean=args.leonardo_mean, fail_rate=args.leonardo_fail_rate,
+        error_rate=args.leonardo_error_rate, rate_limit=args.leonardo_rate_limit, webhook=args.webhook,
+        webhook_secret=args.webhook_secret, **shared
+    )
+
+    pokeapi_base = f"http://{host}:{args.pokeapi_port}{pokeapi.API_PREFIX}"
+    print(f"Fakes running ({len(fake_pokeapi.ids)} species), GET /stats on each for counters. Server environment:\n")
+    print(f"export POKEAPI_BASE={pokeapi_base}")
+    print(f"export MISTRAL_API_BASE=http://{host}:{args.mistral_port}{mistral.API_PREFIX} MISTRAL_API_KEY=fake")
+    print(f"export LEONARDO_API_BASE=http://{host}:{args.leonardo_port}{leonardo.API_PREFIX} LEONARDO_API_KEY=fake")
+    if args.webhook:
+        print(f"export LEONARDO_WEBHOOK_SECRET={args.webhook_secret}")
+    print(f"\nCatalog: python build_catalog.py --api {pokeapi_base} --out <catalog file> (then CATALOG_FILE=<catalog file>)")
+    wait_forever(pokeapi_server, mistral_server, leonardo_server)
+
+
+if __name__ == '__main__':
+    main()
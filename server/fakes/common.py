@@ -0,0 +1,175 @@
+"""
+Building blocks shared by the fake servers: latency distributions, injected
+failures and rate limits, request counters, JSON handlers and startup.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+
+class Latency:
+    """
+    Delay distribution around `mean` seconds
+    - fixed: always mean
+    - uniform: mean * [1 - jitter, 1 + jitter]
+    - exponential: memoryless, mean
+    - lognormal: mean * lognormal(0, jitter), long right tail (median mean)
+    """
+
+    def __init__(self, mean, distribution='lognormal', jitter=0.3, minimum=0.0):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{distribution}' (expected one of {', '.join(DISTRIBUTIONS)})")
+        self.mean = mean
+        self.distribution = distribution
+        self.jitter = jitter
+        self.minimum = minimum
+
+    def sample(self):
+        if self.mean <= 0:
+            return self.minimum
+        if self.distribution == 'fixed':
+            value = self.mean
+        elif self.distribution == 'uniform':
+            value = random.uniform(self.mean * (1 - self.jitter), self.mean * (1 + self.jitter))
+        elif self.distribution == 'exponential':
+            value = random.expovariate(1 / self.mean)
+        else:
+            value = random.lognormvariate(0, self.jitter) * self.mean
+        return max(self.minimum, value)
+
+
+class FakeService:
+    """State shared by the request handlers of one fake: counters, injected errors, rate limit, latency"""
+
+    def __init__(self, latency=None, error_rate=0.0, rate_limit=0.0, counters=()):
+        self.latency = latency or Latency(0)
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+
+        self.lock = threading.Lock()
+        self.window = []  # request times of the last second, for the rate limit
+        self.counters = {name: 0 for name in ("requests", "errors", "rate_limited", *counters)}
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def rate_limited(self):
+        """True when the request exceeds rate_limit requests per second"""
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            self.window = [t for t in self.window if t > now - 1.0]
+            if len(self.window) >= self.rate_limit:
+                self.counters["rate_limited"] += 1
+                return True
+            self.window.append(now)
+        return False
+
+    def failing(self):
+        """True for the share of requests answered with an injected 500"""
+        if self.error_rate and random.random() < self.error_rate:
+            self.count("errors")
+            return True
+        return False
+
+    def delay(self):
+        """Sleep the sampled response latency"""
+        seconds = self.latency.sample()
+        if seconds:
+            time.sleep(seconds)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    """Request handler with JSON helpers, `service` is set by make_handler"""
+
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def log_message(self, *args):
+        pass
+
+    def read_body(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            return json.loads(raw) if raw else {}
+        except ValueError:
+            return None
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_bytes(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def too_many_requests(self):
+        self.send_json(429, {"error": "rate limit exceeded"}, {"Retry-After": "1"})
+
+    def admitted(self):
+        """
+        Count the request, answer it with an injected 429 or 500 when due (False),
+        otherwise wait the sampled latency (True)
+        """
+        self.service.count("requests")
+        if self.service.rate_limited():
+            self.too_many_requests()
+            return False
+        if self.service.failing():
+            self.send_json(500, {"error": "injected failure"})
+            return False
+        self.service.delay()
+        return True
+
+    def send_stats(self):
+        self.send_json(200, self.service.stats())
+
+
+def make_handler(handler_class, service):
+    return type(handler_class.__name__, (handler_class,), {"service": service})
+
+
+def serve(handler_class, service, host, port, name):
+    """Start a fake in a background thread, returns the server"""
+    server = ThreadingHTTPServer((host, port), make_handler(handler_class, service))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+    return server
+
+
+def add_service_arguments(parser, mean, help_mean="Mean response latency (seconds)"):
+    """Latency, failure and rate limit options of every fake"""
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--mean', type=float, default=mean, help=help_mean)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='lognormal', help="Latency distribution")
+    parser.add_argument('--jitter', type=float, default=0.3, help="Spread: lognormal sigma, or uniform +/- share")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Requests per second before 429 (0: none)")
+
+
+def wait_forever(*servers):
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
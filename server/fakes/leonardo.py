@@ -0,0 +1,168 @@
+"""
+Fake Leonardo API: generations that complete after a random delay, optional webhook callbacks.
+
+    python -m fakes.leonardo --port 8090 --mean 8 --distribution lognormal --fail-rate 0.05
+    python -m fakes.leonardo --webhook http://localhost:8081/api/webhooks/leonardo --webhook-secret dev
+
+Point the server at it with LEONARDO_API_BASE=http://localhost:8090/api/rest/v1
+(any LEONARDO_API_KEY). --error-rate / --rate-limit inject 500 / 429 answers
+on the API calls. GET /stats returns the request counters.
+"""
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+import urllib.request
+import uuid
+import zlib
+from fakes.common import FakeService, JsonHandler, Latency, add_service_arguments, serve as serve_fake, wait_forever
+
+API_PREFIX = "/api/rest/v1"
+
+
+def png_bytes(seed, size=64):
+    """Small valid PNG of one color derived from seed"""
+    rng = random.Random(seed)
+    pixel = bytes(rng.randrange(256) for _ in range(3))
+    raw = b"".join(b"\x00" + pixel * size for _ in range(size))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+class FakeLeonardo(FakeService):
+    """Generation state shared by the request handlers"""
+
+    def __init__(self, base_url, mean=8.0, jitter=0.3, fail_rate=0.0, rate_limit=0.0,
+                 webhook=None, webhook_secret="", distribution='lognormal', error_rate=0.0):
+        super().__init__(error_rate=error_rate, rate_limit=rate_limit,
+                         counters=("generations", "polls", "downloads", "callbacks", "callback_errors"))
+        self.base_url = base_url
+        self.duration = Latency(mean, distribution, jitter, minimum=0.1)  # generation time
+        self.fail_rate = fail_rate
+        self.webhook = webhook
+        self.webhook_secret = webhook_secret
+
+        self.generations = {}  # id -> (ready_at, failed)
+
+    def create(self):
+        generation_id = str(uuid.uuid4())
+        duration = self.duration.sample()
+        failed = random.random() < self.fail_rate
+        with self.lock:
+            self.generations[generation_id] = (time.monotonic() + duration, failed)
+            self.counters["generations"] += 1
+        if self.webhook:
+            timer = threading.Timer(duration, self.callback, (generation_id,))
+            timer.daemon = True
+            timer.start()
+        return generation_id
+
+    def view(self, generation_id):
+        """generations_by_pk body, None for unknown ids"""
+        with self.lock:
+            state = self.generations.get(generation_id)
+        if state is None:
+            return None
+        ready_at, failed = state
+        status = "PENDING" if time.monotonic() < ready_at else ("FAILED" if failed else "COMPLETE")
+        images = [{"id": generation_id, "url": f"{self.base_url}/images/{generation_id}.png"}] if status == "COMPLETE" else []
+        return {"id": generation_id, "status": status, "generated_images": images}
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            pending = sum(ready_at > now for ready_at, _ in self.generations.values())
+        return dict(super().stats(), pending=pending)
+
+    def callback_body(self, generation_id):
+        """Webhook envelope, like Leonardo's image_generation.complete event"""
+        generation = self.view(generation_id)
+        return {
+            "type": "image_generation.complete" if generation["status"] == "COMPLETE" else "image_generation.failed",
+            "object": "generation",
+            "data": {"object": {"id": generation_id, "status": generation["status"],
+                                "images": generation["generated_images"]}}
+        }
+
+    def callback(self, generation_id):
+        body = json.dumps(self.callback_body(generation_id)).encode()
+        request = urllib.request.Request(self.webhook, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.webhook_secret}"
+        })
+        try:
+            urllib.request.urlopen(request, timeout=10).read()
+            self.count("callbacks")
+        except Exception:
+            self.count("callback_errors")
+
+
+class LeonardoHandler(JsonHandler):
+    def do_POST(self):
+        self.read_body()
+        if self.path != f"{API_PREFIX}/generations":
+            return self.send_json(404, {"error": "not found"})
+        if not self.admitted():
+            return
+        self.send_json(200, {"sdGenerationJob": {"generationId": self.service.create(), "apiCreditCost": 0}})
+
+    def do_GET(self):
+        if self.path == "/stats":
+            return self.send_stats()
+
+        if self.path.startswith("/images/"):
+            self.service.count("downloads")
+            return self.send_bytes(200, png_bytes(self.path), "image/png")
+
+        if self.path.startswith(f"{API_PREFIX}/generations/"):
+            if not self.admitted():
+                return
+            self.service.count("polls")
+            generation = self.service.view(self.path.rsplit("/", 1)[-1])
+            if generation is None:
+                return self.send_json(404, {"error": "generation not found"})
+            return self.send_json(200, {"generations_by_pk": generation})
+
+        self.send_json(404, {"error": "not found"})
+
+
+def serve(host="127.0.0.1", port=8090, **options):
+    """Start the fake in a background thread, returns (server, fake). Port 0 picks a free port."""
+    fake = FakeLeonardo(f"http://{host}:{port}", **options)
+    server = serve_fake(LeonardoHandler, fake, host, port, "fake-leonardo")
+    fake.base_url = f"http://{host}:{server.server_address[1]}"
+    return server, fake
+
+
+def add_arguments(parser):
+    add_service_arguments(parser, mean=8.0, help_mean="Mean generation time (seconds)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Share of generations ending FAILED")
+    parser.add_argument('--webhook', help="Callback URL, e.g. http://localhost:8081/api/webhooks/leonardo")
+    parser.add_argument('--webhook-secret', default='', help="Bearer key sent with callbacks (LEONARDO_WEBHOOK_SECRET)")
+
+
+def options(args):
+    return dict(mean=args.mean, jitter=args.jitter, distribution=args.distribution, fail_rate=args.fail_rate,
+                error_rate=args.error_rate, rate_limit=args.rate_limit, webhook=args.webhook,
+                webhook_secret=args.webhook_secret)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Leonardo API")
+    parser.add_argument('--port', type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server, _ = serve(args.host, args.port, **options(args))
+    print(f"Fake Leonardo on http://{args.host}:{args.port}{API_PREFIX}")
+    wait_forever(server)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Fake Mistral chat API: canned chat completions with configurable latency and failures.
+
+    python -m fakes.mistral --port 8092 --mean 0.6 --rate-limit 5 --error-rate 0.02
+
+POST /v1/chat/completions answers a chat.completion whose content is a fusion
+name blended from the "Parents: X and Y." part of the last user message (any
+other prompt gets a fixed answer). GET /stats returns the request counters.
+
+Point the server at it with MISTRAL_API_BASE=http://localhost:8092/v1 (any MISTRAL_API_KEY).
+"""
+import argparse
+import re
+import time
+import uuid
+from fakes.common import FakeService, JsonHandler, Latency, add_service_arguments, serve as serve_fake, wait_forever
+
+API_PREFIX = "/v1"
+PARENTS = re.compile(r"Parents:\s*(.+?)\s+and\s+(.+?)\.?\s*$")
+
+
+def canned_answer(messages):
+    """Fusion name for the fusion prompt of NameFusionTool, a fixed answer otherwise"""
+    prompt = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+    match = PARENTS.search(prompt if isinstance(prompt, str) else '')
+    if not match:
+        return "Fakemon"
+    name1, name2 = match.groups()
+    return f"{name1[:max(3, len(name1) // 2)]}{name2[-max(3, len(name2) // 2):].lower()}"
+
+
+def count_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeMistral(FakeService):
+    def __init__(self, **options):
+        super().__init__(counters=("completions", "prompt_tokens", "completion_tokens"), **options)
+
+    def completion(self, body):
+        messages = body.get('messages') or []
+        content = canned_answer(messages)
+        prompt_tokens = sum(count_tokens(str(m.get('content') or '')) for m in messages)
+        completion_tokens = count_tokens(content)
+        with self.lock:
+            self.counters["completions"] += 1
+            self.counters["prompt_tokens"] += prompt_tokens
+            self.counters["completion_tokens"] += completion_tokens
+        return {
+            "id": uuid.uuid4().hex,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'mistral-small-latest'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "tool_calls": None},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+
+class MistralHandler(JsonHandler):
+    def do_POST(self):
+        body = self.read_body()
+        if self.path != f"{API_PREFIX}/chat/completions":
+            return self.send_json(404, {"error": "not found"})
+        if body is None or not isinstance(body.get('messages'), list):
+            return self.send_json(422, {"object": "error", "message": "messages required"})
+        if not self.admitted():
+            return
+        self.send_json(200, self.service.completion(body))
+
+    def do_GET(self):
+        if self.path == "/stats":
+            return self.send_stats()
+        self.send_json(404, {"error": "not found"})
+
+
+def serve(host="127.0.0.1", port=8092, mean=0.6, distribution='lognormal', jitter=0.3, error_rate=0.0,
+          rate_limit=0.0):
+    """Start the fake in a background thread, returns (server, fake)"""
+    fake = FakeMistral(latency=Latency(mean, distribution, jitter), error_rate=error_rate, rate_limit=rate_limit)
+    return serve_fake(MistralHandler, fake, host, port, "fake-mistral"), fake
+
+
+def add_arguments(parser):
+    add_service_arguments(parser, mean=0.6)
+
+
+def options(args):
+    return dict(mean=args.mean, distribution=args.distribution, jitter=args.jitter, error_rate=args.error_rate,
+                rate_limit=args.rate_limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Mistral chat API")
+    parser.add_argument('--port', type=int, default=8092)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server, _ = serve(args.host, args.port, **options(args))
+    print(f"Fake Mistral on http://{args.host}:{args.port}{API_PREFIX}")
+    wait_forever(server)
+
+
+if __name__ == '__main__':
+    main()
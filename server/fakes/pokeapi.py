@@ -0,0 +1,180 @@
+"""
+Fake PokeAPI: a fixed, deterministic dataset served with configurable latency.
+
+    python -m fakes.pokeapi --port 8091 --species 151 --mean 0.02
+    python -m fakes.pokeapi --catalog data/species_catalog.json   # serve an existing catalog instead
+
+Endpoints (the subset the server and build_catalog.py read):
+- GET /api/v2/pokemon?limit=&offset=
+- GET /api/v2/pokemon/<id or name>
+- GET /api/v2/pokemon-species/<id>  (French name in `names`)
+- GET /cries/<id>.ogg  (cry URL of the generated species, a few placeholder bytes)
+- GET /stats
+
+Point the server at it with POKEAPI_BASE=http://localhost:8091/api/v2, and
+build a matching catalog with python build_catalog.py --api http://localhost:8091/api/v2.
+"""
+import argparse
+import json
+import random
+from urllib.parse import parse_qs, urlsplit
+from fakes.common import FakeService, JsonHandler, Latency, add_service_arguments, serve as serve_fake, wait_forever
+
+API_PREFIX = "/api/v2"
+TYPES = (
+    'normal', 'fire', 'water', 'electric', 'grass', 'ice', 'fighting', 'poison', 'ground',
+    'flying', 'psychic', 'bug', 'rock', 'ghost', 'dragon', 'dark', 'steel', 'fairy'
+)
+STATS = ('hp', 'attack', 'defense', 'special-attack', 'special-defense', 'speed')
+MOVES = [f"move-{i}" for i in range(400)]
+SYLLABLES = ('pi', 'ka', 'chu', 'sala', 'meche', 'bulbi', 'zarre', 'cara', 'puce', 'rondo', 'dra', 'co', 'feu',
+             'ro', 'nin', 'mew', 'lo', 'gi', 'ta', 'ra')
+
+
+def make_species(count, seed=0):
+    """`count` catalog-shaped species with ids 1..count, identical for a given seed"""
+    rng = random.Random(f"fake-pokeapi-{seed}")
+    species = []
+    for pokemon_id in range(1, count + 1):
+        name = "".join(rng.sample(SYLLABLES, rng.randint(2, 3)))
+        species.append({
+            'id': pokemon_id,
+            'name': f"{name.capitalize()}{pokemon_id}",
+            'name_en': f"{name}{pokemon_id}",
+            'types': rng.sample(TYPES, rng.choice((1, 2))),
+            'stats': {stat: rng.randint(20, 160) for stat in STATS},
+            'moves': rng.sample(MOVES, rng.randint(10, 40)),
+        })
+    return species
+
+
+def load_species(path):
+    """Species of a catalog file written by build_catalog.py (stats keyed by catalog name)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        species = json.load(f)['species']
+    catalog_keys = {'sp_attack': 'special-attack', 'sp_defense': 'special-defense'}
+    for entry in species:
+        entry['stats'] = {catalog_keys.get(key, key): value for key, value in entry['stats'].items()}
+    return species
+
+
+class FakePokeApi(FakeService):
+    """Dataset and counters shared by the request handlers"""
+
+    def __init__(self, base_url, cries_url, species, **options):
+        super().__init__(counters=("lists", "pokemon", "species", "cries", "not_found"), **options)
+        self.base_url = base_url
+        self.cries_url = cries_url
+        self.by_id = {entry['id']: entry for entry in species}
+        self.by_name = {entry['name_en']: entry for entry in species}
+        self.ids = sorted(self.by_id)
+
+    def find(self, key):
+        if key.isdigit():
+            return self.by_id.get(int(key))
+        return self.by_name.get(key.lower())
+
+    def listing(self, limit, offset):
+        ids = self.ids[offset:offset + limit]
+        return {
+            "count": len(self.ids),
+            "next": None if offset + limit >= len(self.ids) else
+            f"{self.base_url}/pokemon?limit={limit}&offset={offset + limit}",
+            "previous": None,
+            "results": [{"name": self.by_id[i]['name_en'], "url": f"{self.base_url}/pokemon/{i}/"} for i in ids]
+        }
+
+    def pokemon(self, entry):
+        pokemon_id = entry['id']
+        return {
+            "id": pokemon_id,
+            "name": entry['name_en'],
+            "types": [{"slot": slot, "type": {"name": name}} for slot, name in enumerate(entry['types'], 1)],
+            "stats": [{"base_stat": value, "effort": 0, "stat": {"name": name}} for name, value in entry['stats'].items()],
+            "moves": [{"move": {"name": name}} for name in entry['moves']],
+            "species": {"name": entry['name_en'], "url": f"{self.base_url}/pokemon-species/{pokemon_id}/"},
+            "cries": {"latest": entry.get('cry', f"{self.cries_url}/{pokemon_id}.ogg"), "legacy": None},
+        }
+
+    def species(self, entry):
+        return {
+            "id": entry['id'],
+            "name": entry['name_en'],
+            "names": [
+                {"language": {"name": "en"}, "name": entry['name_en'].capitalize()},
+                {"language": {"name": "fr"}, "name": entry['name']},
+            ]
+        }
+
+
+class PokeApiHandler(JsonHandler):
+    def do_GET(self):
+        if self.path == "/stats":
+            return self.send_stats()
+
+        if self.path.startswith("/cries/"):
+            self.service.count("cries")
+            return self.send_bytes(200, b"OggS" + bytes(60), "audio/ogg")
+
+        url = urlsplit(self.path)
+        parts = url.path[len(API_PREFIX):].strip("/").split("/") if url.path.startswith(API_PREFIX) else []
+        if not parts or parts[0] not in ("pokemon", "pokemon-species") or len(parts) > 2:
+            return self.send_json(404, {"error": "not found"})
+        if not self.admitted():
+            return
+
+        fake = self.service
+        if len(parts) == 1:
+            if parts[0] != "pokemon":
+                return self.send_json(404, {"error": "not found"})
+            query = parse_qs(url.query)
+            fake.count("lists")
+            return self.send_json(200, fake.listing(int(query.get("limit", ["20"])[0]),
+                                                    int(query.get("offset", ["0"])[0])))
+
+        entry = fake.find(parts[1])
+        if entry is None:
+            fake.count("not_found")
+            return self.send_json(404, {"detail": "Not found."})
+        if parts[0] == "pokemon":
+            fake.count("pokemon")
+            return self.send_json(200, fake.pokemon(entry))
+        fake.count("species")
+        self.send_json(200, fake.species(entry))
+
+
+def serve(host="127.0.0.1", port=8091, species_count=151, catalog=None, seed=0,
+          mean=0.02, distribution='lognormal', jitter=0.3, error_rate=0.0, rate_limit=0.0):
+    """Start the fake in a background thread, returns (server, fake)"""
+    species = load_species(catalog) if catalog else make_species(species_count, seed)
+    fake = FakePokeApi(f"http://{host}:{port}{API_PREFIX}", f"http://{host}:{port}/cries", species,
+                       latency=Latency(mean, distribution, jitter), error_rate=error_rate, rate_limit=rate_limit)
+    return serve_fake(PokeApiHandler, fake, host, port, "fake-pokeapi"), fake
+
+
+def add_arguments(parser):
+    add_service_arguments(parser, mean=0.02)
+    parser.add_argument('--species', type=int, default=151, help="Species in the generated dataset")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generated dataset")
+    parser.add_argument('--catalog', help="Serve the species of this catalog file instead")
+
+
+def options(args):
+    return dict(species_count=args.species, catalog=args.catalog, seed=args.seed, mean=args.mean,
+                distribution=args.distribution, jitter=args.jitter, error_rate=args.error_rate,
+                rate_limit=args.rate_limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake PokeAPI")
+    parser.add_argument('--port', type=int, default=8091)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server, fake = serve(args.host, args.port, **options(args))
+    print(f"Fake PokeAPI on http://{args.host}:{args.port}{API_PREFIX} ({len(fake.ids)} species)")
+    wait_forever(server)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Gunicorn settings: one process per core, a few threads per process.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker warms up (catalog, indexes, agents, stores, fusion job workers)
+before accepting requests, and drains its running fusion jobs on shutdown.
+Process-local singletons (agents, PokeAPI client, Pokedex store, SQLite
+connections) are rebuilt in each worker after fork.
+"""
+import multiprocessing
+import os
+from utils.config import JOB_DRAIN_TIMEOUT
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('FLASK_PORT', 8081)}")
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Requests are short (fusions run as jobs); SSE streams hold a thread while a job runs
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 5
+# Leave stopping workers the time to finish their fusion jobs
+graceful_timeout = int(JOB_DRAIN_TIMEOUT) + 10
+
+# Import the app once in the master: read-only data (catalog, suggest index)
+# is then shared copy-on-write by the workers
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def when_ready(server):
+    """Master, before the workers are forked: load the read-only data they share"""
+    if preload_app:
+        from utils.catalog import get_catalog
+        from utils.stat_index import get_stat_index
+        from utils.suggest_index import get_suggest_index
+        get_catalog()
+        get_stat_index()
+        get_suggest_index()
+
+
+def post_worker_init(worker):
+    """Runs in the worker after fork, before it accepts connections"""
+    from app import warm_up
+    warm_up()
+
+
+def worker_exit(server, worker):
+    from app import drain
+    drain()
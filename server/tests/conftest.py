@@ -0,0 +1,39 @@
+"""
+Test setup: every data path points to a temporary directory before utils.config
+is imported (the app's data stays untouched), and the server directory is importable.
+
+    cd server && python -m pytest -q
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = tempfile.mkdtemp(prefix='pokedex-tests-')
+
+sys.path.insert(0, SERVER_DIR)
+os.environ.update({
+    'CATALOG_FILE': os.path.join(DATA_DIR, 'species_catalog.json'),
+    'SUGGEST_INDEX_DIR': os.path.join(DATA_DIR, 'suggest_index'),
+    'POKEDEX_BACKEND': 'sqlite',
+    'POKEDEX_DB_FILE': os.path.join(DATA_DIR, 'pokedex.db'),
+    'POKEDEX_JSON_FILE': os.path.join(DATA_DIR, 'fused_pokemons.json'),
+    'POKEDEX_JSON_EXPORT': 'false',
+    'FUSION_CACHE_DB': os.path.join(DATA_DIR, 'fusion_cache.db'),
+    'FUSION_JOBS_DB': os.path.join(DATA_DIR, 'jobs.db'),
+    'LEONARDO_GENERATIONS_DB': os.path.join(DATA_DIR, 'generations.db'),
+    'IMAGE_STORE_DIR': os.path.join(DATA_DIR, 'images'),
+    'ATLAS_DIR': os.path.join(DATA_DIR, 'atlases'),
+    'TRACE_EXPORT_FILE': '',
+    'LOG_STDOUT': 'false',
+    # Fast polls against the fake Leonardo
+    'LEONARDO_POLL_INITIAL': '0.1',
+    'LEONARDO_POLL_MIN_INTERVAL': '0.1',
+    'LEONARDO_POLL_MAX_INTERVAL': '0.5',
+    'LEONARDO_WEBHOOK_SECRET': 'test-secret',
+})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
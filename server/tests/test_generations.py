@@ -0,0 +1,106 @@
+"""GenerationTracker against the fake Leonardo server: poll, webhook, failure and timeout"""
+import os
+import time
+import pytest
+from conftest import DATA_DIR
+from fakes import leonardo
+from utils import aio, generations
+from utils.generations import GenerationTracker, parse_callback
+
+
+@pytest.fixture
+def fake_leonardo():
+    """Start a fake Leonardo on a free port; call it with the fake's options, returns (fake, api base URL)"""
+    servers = []
+
+    def start(**options):
+        server, fake = leonardo.serve(port=0, distribution='fixed', **options)
+        servers.append(server)
+        return fake, f"{fake.base_url}{leonardo.API_PREFIX}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def tracker_db(request):
+    return os.path.join(DATA_DIR, f"generations-{request.node.name}.db")
+
+
+def test_completion_by_poll(fake_leonardo, tracker_db):
+    fake, api_base = fake_leonardo(mean=0.3)
+    tracker = GenerationTracker(db_file=tracker_db, api_base=api_base, max_wait=10)
+
+    generation_id = fake.create()
+    image_url = aio.run(tracker.wait(generation_id, {}), timeout=15)
+
+    assert image_url == f"{fake.base_url}/images/{generation_id}.png"
+    assert fake.stats()['polls'] >= 1
+    assert tracker.stats()['completions'] == 1
+
+
+def test_completion_by_webhook(fake_leonardo, tracker_db, monkeypatch):
+    import app as app_module
+
+    fake, api_base = fake_leonardo(mean=0.2)
+    tracker = GenerationTracker(db_file=tracker_db, api_base=api_base, max_wait=10)
+    monkeypatch.setattr(generations, 'LEONARDO_POLL_INITIAL', 30.0)  # only the webhook can resolve it
+    monkeypatch.setattr(app_module, 'get_generation_tracker', lambda: tracker)
+    client = app_module.create_app().test_client()
+
+    generation_id = fake.create()
+    waiter = aio.submit(tracker.wait(generation_id, {}))
+    while fake.view(generation_id)['status'] == 'PENDING':
+        time.sleep(0.05)
+    body = fake.callback_body(generation_id)
+
+    response = client.post('/api/webhooks/leonardo', json=body, headers={'Authorization': 'Bearer wrong'})
+    assert response.status_code == 401
+    assert not waiter.done()
+
+    response = client.post('/api/webhooks/leonardo', json=body, headers={'Authorization': 'Bearer test-secret'})
+    assert response.status_code == 200
+    assert waiter.result(timeout=5) == f"{fake.base_url}/images/{generation_id}.png"
+    assert fake.stats()['polls'] == 0
+
+    # Stored for the other workers, which resolve it on their next store check
+    row = tracker.db.connection().execute(
+        "SELECT status, image_url FROM generation_callbacks WHERE generation_id = ?", (generation_id,)
+    ).fetchone()
+    assert tuple(row) == ('COMPLETE', body['data']['object']['images'][0]['url'])
+
+
+def test_parse_callback_shapes():
+    envelope = {"type": "image_generation.complete",
+                "data": {"object": {"id": "g1", "status": "COMPLETE", "images": [{"url": "http://x/1.png"}]}}}
+    assert parse_callback(envelope) == ("g1", "COMPLETE", "http://x/1.png", None)
+
+    polled = {"generations_by_pk": {"id": "g2", "status": "FAILED", "generated_images": []}}
+    assert parse_callback(polled) == ("g2", "FAILED", None, None)
+
+    with pytest.raises(ValueError):
+        parse_callback({"data": {"object": {"status": "COMPLETE"}}})
+    with pytest.raises(ValueError):
+        parse_callback({"data": {"object": {"id": "g3", "status": "COMPLETE", "images": []}}})
+
+
+def test_failed_generation(fake_leonardo, tracker_db):
+    fake, api_base = fake_leonardo(mean=0.2, fail_rate=1.0)
+    tracker = GenerationTracker(db_file=tracker_db, api_base=api_base, max_wait=10)
+
+    with pytest.raises(Exception, match="Generation failed"):
+        aio.run(tracker.wait(fake.create(), {}), timeout=15)
+    assert tracker.stats()['completions'] == 0
+
+
+def test_timeout(fake_leonardo, tracker_db):
+    fake, api_base = fake_leonardo(mean=30)
+    tracker = GenerationTracker(db_file=tracker_db, api_base=api_base, max_wait=0.5)
+
+    start = time.monotonic()
+    with pytest.raises(Exception, match="timeout after 0.5s"):
+        aio.run(tracker.wait(fake.create(), {}), timeout=15)
+    assert time.monotonic() - start < 5
+    assert tracker.stats()['pending'] == 0
@@ -0,0 +1,37 @@
+"""Image files are only resolved inside the image store and the static directory"""
+import hashlib
+import os
+import pytest
+from conftest import DATA_DIR
+from utils import sprite_atlas
+from utils.image_store import ImageStore
+from utils.sprite_atlas import SpriteAtlasCache
+
+
+def test_image_store_rejects_invalid_digests():
+    store = ImageStore(root=os.path.join(DATA_DIR, 'images-paths'))
+    digest = hashlib.sha256(b'png').hexdigest()
+    assert store.path(digest, 'thumb') == os.path.join(store.root, digest[:2], f"{digest}.thumb.webp")
+
+    for bad in ('../../etc/passwd', digest.upper(), digest[:-1], f"{digest}/..", '', None):
+        with pytest.raises(ValueError):
+            store.path(bad)
+        assert store.exists(bad) is False
+
+
+def test_legacy_static_path_stays_in_static_dir(tmp_path, monkeypatch):
+    tmp_path = tmp_path.resolve()  # STATIC_DIR is a real path
+    static_dir = tmp_path / 'static'
+    (static_dir / 'images').mkdir(parents=True)
+    (static_dir / 'images' / 'legacy.png').write_bytes(b'png')
+    (tmp_path / 'secret.txt').write_text('secret')
+    (static_dir / 'images' / 'link.png').symlink_to(tmp_path / 'secret.txt')
+    monkeypatch.setattr(sprite_atlas, 'STATIC_DIR', str(static_dir))
+
+    atlas = SpriteAtlasCache(atlas_dir=str(tmp_path / 'atlases'))
+    source = atlas._source({'image': {'local_path': '/static/images/legacy.png'}})
+    assert source is not None and source[1] == str(static_dir / 'images' / 'legacy.png')
+
+    for local_path in ('/static/../secret.txt', '/static/images/../../secret.txt', '/static/images/link.png'):
+        assert atlas._source({'image': {'local_path': local_path}}) is None
+    assert atlas._source({'image': {'sha256': '../../secret', 'local_path': ''}}) is None
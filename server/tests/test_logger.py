@@ -0,0 +1,46 @@
+"""AgentLogger records hold the data as it was at the log call"""
+import logging
+import pytest
+from utils.logger import AgentLogger
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def captured():
+    logger = AgentLogger("TestLogger")
+    handler = _Capture()
+    logger.logger.addHandler(handler)
+    yield logger, handler.records
+    logger.logger.removeHandler(handler)
+
+
+def test_dict_data_is_copied(captured):
+    logger, records = captured
+    data = {"step": 1}
+    logger.log_info("Step", data)
+    data["step"] = 2
+    assert records[-1].data == {"step": 1}
+
+
+def test_callable_data_only_built_when_enabled(captured):
+    logger, records = captured
+    level = logger.logger.level
+    logger.logger.setLevel(logging.INFO)
+    calls = []
+    logger.log_debug("Flow graph", lambda: calls.append(1) or {"flow": "a -> b"})
+    assert calls == [] and records == []
+
+    logger.logger.setLevel(logging.DEBUG)
+    try:
+        logger.log_debug("Flow graph", lambda: calls.append(1) or {"flow": "a -> b"})
+    finally:
+        logger.logger.setLevel(level)
+    assert calls == [1] and records[-1].data == {"flow": "a -> b"}
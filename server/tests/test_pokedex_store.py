@@ -0,0 +1,36 @@
+"""Both pokedex backends implement the PokedexStore interface"""
+import pytest
+from utils.pokedex_store import JsonPokedexStore, PokedexQuery, PokedexStore, SqlitePokedexStore
+
+
+def _entry(fusion_id, stat_total):
+    return {'id': fusion_id, 'name': f"Fusion {fusion_id}", 'types': ['fire'],
+            'parents': {'pokemon1': {'id': 1}, 'pokemon2': {'id': 4}}, 'stats': {'total': stat_total}}
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        PokedexStore()
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_backend_round_trip(backend, tmp_path):
+    if backend == 'json':
+        store = JsonPokedexStore(json_file=tmp_path / 'pokedex.json')
+    else:
+        store = SqlitePokedexStore(db_file=str(tmp_path / 'pokedex.db'), json_file=None)
+
+    store.upsert(_entry('a', 300))
+    store.upsert_many([_entry('b', 400), _entry('c', 500)])
+    store.flush()
+
+    assert store.count() == 3
+    assert store.get('b')['name'] == "Fusion b"
+    assert store.get('missing') is None
+    assert [e['id'] for e in store.iter_entries()] == ['a', 'b', 'c']
+
+    query = PokedexQuery(sort='id')
+    first = store.page(query, limit=2)
+    assert [e['id'] for e in first['items']] == ['a', 'b']
+    rest = store.page(query, limit=2, cursor=first['next_cursor'])
+    assert [e['id'] for e in rest['items']] == ['c'] and rest['next_cursor'] is None
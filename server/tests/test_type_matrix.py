@@ -0,0 +1,48 @@
+"""Matrix type scores against the scalar tool implementations, for every 1-2 type combination"""
+import pytest
+from utils.config import TYPE_EFFECTIVENESS
+from utils.type_matrix import (
+    TYPE_NAMES, encode_types, score_compatibility_batch, type_synergy, type_synergy_batch
+)
+from tools.suggestion_tools import SuggestionTypesTool
+from tools.fusion_tools import FusionStatsMovesTool
+
+COMBOS = [[a] for a in TYPE_NAMES] + [[a, b] for i, a in enumerate(TYPE_NAMES) for b in TYPE_NAMES[i + 1:]]
+
+
+@pytest.fixture(scope='module')
+def types_tool():
+    return SuggestionTypesTool.__new__(SuggestionTypesTool)
+
+
+@pytest.fixture(scope='module')
+def stats_tool():
+    return FusionStatsMovesTool.__new__(FusionStatsMovesTool)
+
+
+def test_score_compatibility_parity(types_tool):
+    candidate_encoded = encode_types(COMBOS)
+    mismatches = []
+    for base_types in COMBOS:
+        weaknesses, strong_against = set(), set()
+        for ptype in base_types:
+            weaknesses.update(TYPE_EFFECTIVENESS[ptype]['weak_to'])
+            strong_against.update(TYPE_EFFECTIVENESS[ptype]['strong_against'])
+
+        batch = score_compatibility_batch(base_types, candidate_encoded)
+        for candidate_types, score in zip(COMBOS, batch):
+            expected = types_tool._score_compatibility({'types': candidate_types}, weaknesses, strong_against, base_types)
+            if expected != score:
+                mismatches.append((base_types, candidate_types, expected, score))
+    assert mismatches == []
+
+
+def test_type_synergy_parity(stats_tool):
+    mismatches = []
+    for base_types in COMBOS:
+        batch = type_synergy_batch([base_types] * len(COMBOS), COMBOS)
+        for candidate_types, bonus in zip(COMBOS, batch):
+            expected = stats_tool._calculate_type_synergy(base_types, candidate_types)
+            if not expected == type_synergy(base_types, candidate_types) == bonus:
+                mismatches.append((base_types, candidate_types, expected, type_synergy(base_types, candidate_types), bonus))
+    assert mismatches == []
@@ -1,11 +1,17 @@
 import os
+import asyncio
 import base64
-import time
 import random
-import requests
+import numpy as np
 from langchain_mistralai import ChatMistralAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from utils import aio, upstream
 from utils.logger import AgentLogger
+from utils.config import LEONARDO_API_BASE, MISTRAL_API_BASE
+from utils.generations import get_generation_tracker
+from utils.image_store import get_image_store
+from utils.tracing import span, traced
+from utils.type_matrix import type_synergy, type_synergy_batch
 
 class ImageFusionTool:
     """Tool: Generate fused pokemon image via Leonardo AI"""
@@ -13,19 +19,25 @@ class ImageFusionTool:
     def __init__(self):
         self.logger = AgentLogger("ImageFusionTool")
         self.leonardo_api_key = os.getenv('LEONARDO_API_KEY')
-        self.generate_url = "https://cloud.leonardo.ai/api/rest/v1/generations"
-        self.check_url = "https://cloud.leonardo.ai/api/rest/v1/generations/{}"
+        self.generate_url = f"{LEONARDO_API_BASE}/generations"
+        self.generations = get_generation_tracker()
+        self.images = get_image_store()
         if not self.leonardo_api_key:
             self.logger.log_error("Leonardo API key missing", {
                 "api_key_set": False
             })
     
     def generate_image(self, pokemon1, pokemon2, fusion_name):
+        """Sync wrapper of agenerate_image"""
+        return aio.run(self.agenerate_image(pokemon1, pokemon2, fusion_name))
+
+    @traced(kind='tool')
+    async def agenerate_image(self, pokemon1, pokemon2, fusion_name):
         """
         Generate image for fused pokemon using Leonardo AI
         1. Create detailed image prompt
         2. Send to Leonardo AI
-        3. Poll generation status
+        3. Wait for completion (webhook or shared poller)
         4. Download and save image
         5. Return image path
         """
@@ -47,25 +59,29 @@ class ImageFusionTool:
                 "prompt": image_prompt[:100] + "..."
             })
             
-            # Step 2: Call Leonardo AI generation
-            image_url = self._generate_with_leonardo(image_prompt, negative_prompt)
+            # Step 2: Call Leonardo AI generation, wait for its completion
+            image_url = await self._generate_with_leonardo(image_prompt, negative_prompt)
             self.logger.log_info("Leonardo image URL", {"image_url": image_url})
             
             # Step 3: Download image
-            image_bytes = self._download_image(image_url)
+            image_bytes = await self._download_image(image_url)
             
-            # Step 4: Save image locally
-            local_path = self._save_image_locally(image_bytes, fusion_name)
+            # Step 4: Save image locally (file write off the event loop)
+            digest, urls = await asyncio.to_thread(self._save_image_locally, image_bytes, fusion_name)
             
             self.logger.log_success("Image generated and saved", {
                 "fusion_name": fusion_name,
-                "local_path": local_path,
+                "local_path": urls['original'],
                 "size_kb": len(image_bytes) / 1024
             })
             
+            # local_path stays the full-size PNG; thumbnail_path/webp_path are derived in the background
             return {
                 "type": "image",
-                "local_path": local_path,
+                "local_path": urls['original'],
+                "thumbnail_path": urls.get('thumb'),
+                "webp_path": urls.get('webp'),
+                "sha256": digest,
                 "fusion_name": fusion_name,
                 "size_bytes": len(image_bytes)
             }
@@ -92,7 +108,7 @@ Official Pokémon Trading Card Game illustration style. Clean anime lineart, smo
     def _create_negative_prompt(self):
         return "split body, half and half, symmetrical split, divided face, vertical line separation, mirrored composition, poorly blended fusion, bad anatomy, extra limbs, extra wings, blurry, low quality"
 
-    def _generate_with_leonardo(self, prompt, negative_prompt):
+    async def _generate_with_leonardo(self, prompt, negative_prompt):
         headers = {
             "Authorization": f"Bearer {self.leonardo_api_key}",
             "Content-Type": "application/json"
@@ -106,56 +122,48 @@ Official Pokémon Trading Card Game illustration style. Clean anime lineart, smo
             "prompt": prompt,
             "negative_prompt": negative_prompt
         }
-        response = requests.post(self.generate_url, json=payload, headers=headers, timeout=30)
-        if not response.ok:
-            self.logger.log_error("Leonardo API error", {
-                "status": response.status_code,
-                "response": response.text
-            })
-            response.raise_for_status()
+        async def send():
+            response = await aio.http_client().post(self.generate_url, json=payload, headers=headers, timeout=30)
+            if not response.is_success:
+                self.logger.log_error("Leonardo API error", {
+                    "status": response.status_code,
+                    "response": response.text
+                })
+                response.raise_for_status()
+            return response
+
+        with span("leonardo.generate", 'http'):
+            response = await upstream.call('leonardo', 'generate', send)
         generation_id = response.json()["sdGenerationJob"]["generationId"]
         self.logger.log_debug("Leonardo generation started", {"generation_id": generation_id})
-        return self._poll_generation(generation_id, headers)
-
-    def _poll_generation(self, generation_id, headers, max_wait=300):
-        start_time = time.time()
-        while time.time() - start_time < max_wait:
-            check_response = requests.get(self.check_url.format(generation_id), headers=headers, timeout=30)
-            check_response.raise_for_status()
-            data = check_response.json()
-            status = data["generations_by_pk"]["status"]
-            if status == "COMPLETE":
-                image_url = data["generations_by_pk"]["generated_images"][0]["url"]
-                self.logger.log_info("Leonardo generation complete", {"image_url": image_url})
-                return image_url
-            if status == "FAILED":
-                raise Exception(data["generations_by_pk"].get("error", "Generation failed"))
-            time.sleep(5)
-        raise Exception(f"Leonardo generation timeout after {max_wait}s")
-
-    def _download_image(self, image_url):
-        response = requests.get(image_url, timeout=30)
-        response.raise_for_status()
+        # Completed by the webhook or the shared poller, no polling loop per generation
+        image_url = await self.generations.wait(generation_id, headers)
+        self.logger.log_info("Leonardo generation complete", {"image_url": image_url})
+        return image_url
+
+    async def _download_image(self, image_url):
+        with span("leonardo.download", 'http'):
+            response = await upstream.call('leonardo', 'download', lambda: self._get(image_url, follow_redirects=True))
         return response.content
 
+    async def _get(self, url, **kwargs):
+        response = await aio.http_client().get(url, timeout=30, **kwargs)
+        response.raise_for_status()
+        return response
+
     def _save_image_locally(self, image_bytes, fusion_name):
-        """Save image bytes to local file"""
+        """Save image bytes in the content-addressed image store, returns the image URLs"""
         try:
-            image_dir = "server/static/images/fusions"
-            os.makedirs(image_dir, exist_ok=True)
-
-            filename = f"{fusion_name.lower().replace(' ', '_')}.png"
-            filepath = os.path.join(image_dir, filename)
-
-            with open(filepath, 'wb') as f:
-                f.write(image_bytes)
+            digest = self.images.put(image_bytes)
+            urls = self.images.urls(digest)
 
             self.logger.log_debug("Image saved locally", {
-                "filepath": filepath,
+                "fusion_name": fusion_name,
+                "digest": digest,
                 "size_kb": len(image_bytes) / 1024
             })
 
-            return f"/static/images/fusions/{filename}"
+            return digest, urls
 
         except Exception as e:
             self.logger.log_error("Failed to save image locally", str(e))
@@ -172,11 +180,18 @@ class NameFusionTool:
         if self.mistral_api_key:
             self.llm = ChatMistralAI(
                 api_key=self.mistral_api_key,
+                endpoint=MISTRAL_API_BASE,
                 model="mistral-small-latest",
-                temperature=0.8
+                temperature=0.8,
+                max_retries=0  # retries (429 included) are handled by the mistral upstream scheduler
             )
 
     def generate_name(self, pokemon1, pokemon2):
+        """Sync wrapper of agenerate_name"""
+        return aio.run(self.agenerate_name(pokemon1, pokemon2))
+
+    @traced(kind='tool')
+    async def agenerate_name(self, pokemon1, pokemon2):
         """Generate a creative fusion name. Falls back to local blend if needed."""
         try:
             if not self.llm:
@@ -188,10 +203,12 @@ class NameFusionTool:
                 f"Parents: {pokemon1['name']} and {pokemon2['name']}."
             )
 
-            response = self.llm.invoke([
+            messages = [
                 SystemMessage(content="You are a creative Pokémon name generator."),
                 HumanMessage(content=prompt)
-            ])
+            ]
+            with span("mistral.invoke", 'llm', model="mistral-small-latest"):
+                response = await upstream.call('mistral', 'invoke', lambda: self.llm.ainvoke(messages))
 
             name = (response.content or "").strip()
 
@@ -222,7 +239,8 @@ class CryFusionTool:
         # self.elevenlabs_api_key = os.getenv('ELEVENLABS_API_KEY')
         # self.elevenlabs_url = "https://api.elevenlabs.io/v1"
     
-    def fuse_cry(self, pokemon1, pokemon2, fusion_name):
+    @traced(kind='tool')
+    def fuse_cry(self, pokemon1, pokemon2, fusion_name=None):
         """
         Select a cry randomly between the two parent pokemons
         """
@@ -248,6 +266,20 @@ class CryFusionTool:
             self.logger.log_error("Cry fusion failed", str(e))
             raise
     
+    @traced(kind='tool')
+    def fuse_cry_batch(self, pairs):
+        """fuse_cry for a list of (pokemon1, pokemon2) pairs, None where neither parent has a cry"""
+        cries = []
+        for pokemon1, pokemon2 in pairs:
+            options = [c for c in [pokemon1.get('cry'), pokemon2.get('cry')] if c]
+            cries.append(random.choice(options) if options else None)
+        
+        self.logger.log_success("Cries selected", {
+            "pairs": len(pairs),
+            "missing": cries.count(None)
+        })
+        return cries
+    
     # def _generate_cry_text(self, pokemon1, pokemon2, fusion_name):
     #     """Generate onomatopoeia for cry by blending parent cries"""
     #     # Simple algorithm: blend names
@@ -309,6 +341,7 @@ class FusionStatsMovesTool:
     def __init__(self):
         self.logger = AgentLogger("FusionStatsMovesTool")
     
+    @traced(kind='tool')
     def fuse_stats_moves(self, pokemon1, pokemon2):
         """
         Fuse stats and moves from two pokemons
@@ -322,7 +355,7 @@ class FusionStatsMovesTool:
         
         try:
             # Calculate type synergy bonus
-            synergy_bonus = self._calculate_type_synergy(pokemon1['types'], pokemon2['types'])
+            synergy_bonus = type_synergy(pokemon1['types'], pokemon2['types'])
             
             # Fuse stats: average + synergy bonus
             fused_stats = {}
@@ -331,7 +364,7 @@ class FusionStatsMovesTool:
                 bonus = avg * (0.05 + synergy_bonus)  # 5% base + synergy
                 fused_stats[stat_key] = int(avg + bonus)
             
-            self.logger.log_debug("Stats fused", {
+            self.logger.log_debug("Stats fused", lambda: {
                 "total": sum(fused_stats.values()),
                 "synergy_bonus": f"{(synergy_bonus*100):.1f}%"
             })
@@ -340,7 +373,7 @@ class FusionStatsMovesTool:
             all_moves = pokemon1.get('moves', []) + pokemon2.get('moves', [])
             fused_moves = list(dict.fromkeys(all_moves))[:8]  # Max 8 moves, preserve order
             
-            self.logger.log_debug("Moves fused", {
+            self.logger.log_debug("Moves fused", lambda: {
                 "moves_count": len(fused_moves),
                 "moves": fused_moves
             })
@@ -359,9 +392,48 @@ class FusionStatsMovesTool:
             self.logger.log_error("Stats and moves fusion failed", str(e))
             raise
     
+    @traced(kind='tool')
+    def fuse_stats_moves_batch(self, pairs):
+        """
+        fuse_stats_moves for a list of (pokemon1, pokemon2) pairs, stats computed
+        as one (N, 6) array operation (same integers as the per-pair version)
+        """
+        self.logger.log_info("Batch stats and moves fusion started", {"pairs": len(pairs)})
+        
+        try:
+            if not pairs:
+                return []
+            
+            stat_keys = list(pairs[0][0]['stats'])
+            stats1 = np.array([[p1['stats'][key] for key in stat_keys] for p1, _ in pairs], dtype=np.float64)
+            stats2 = np.array([[p2['stats'][key] for key in stat_keys] for _, p2 in pairs], dtype=np.float64)
+            synergy = type_synergy_batch([p1['types'] for p1, _ in pairs], [p2['types'] for _, p2 in pairs])
+            
+            avg = (stats1 + stats2) / 2.0
+            fused = (avg + avg * (0.05 + synergy[:, None])).astype(np.int64)
+            
+            results = []
+            for row, (pokemon1, pokemon2) in zip(fused.tolist(), pairs):
+                all_moves = pokemon1.get('moves', []) + pokemon2.get('moves', [])
+                results.append({
+                    'stats': dict(zip(stat_keys, row)),
+                    'moves': list(dict.fromkeys(all_moves))[:8]
+                })
+            
+            self.logger.log_success("Batch stats and moves fusion completed", {
+                "pairs": len(pairs),
+                "mean_stats_total": round(float(fused.sum(axis=1).mean()), 1)
+            })
+            
+            return results
+            
+        except Exception as e:
+            self.logger.log_error("Batch stats and moves fusion failed", str(e))
+            raise
+    
     def _calculate_type_synergy(self, types1, types2):
         """
-        Calculate type synergy bonus
+        Calculate type synergy bonus (scalar reference of utils.type_matrix.type_synergy)
         Same types = low bonus
         Complementary types = high bonus
         """
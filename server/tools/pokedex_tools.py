@@ -1,15 +1,16 @@
-import json
-from pathlib import Path
 from utils.logger import AgentLogger
+from utils.pokedex_store import get_pokedex_store
+from utils.sprite_atlas import get_atlas_cache
+from utils.tracing import traced
 
 class AddPokedexEntry:
     """Tool: Add fused pokemon to pokedex database"""
     
     def __init__(self):
         self.logger = AgentLogger("AddPokedexEntry")
-        self.db_file = Path(__file__).parent.parent.parent / "src" / "data" / "fused_pokemons.json"
-        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.store = get_pokedex_store()
     
+    @traced(kind='tool')
     def add_entry(self, fusion_data):
         """Add fusion pokemon to database"""
         self.logger.log_info("Add pokedex entry started", {
@@ -17,25 +18,12 @@ class AddPokedexEntry:
         })
         
         try:
-            # Load existing database
-            pokemons = self._load_db()
-            
             # Create entry
-            entry = {
-                'id': fusion_data['id'],
-                'name': fusion_data['name'],
-                'image': fusion_data['image'],
-                'cry': fusion_data['cry'],
-                'types': fusion_data['types'],
-                'stats': fusion_data['stats'],
-                'moves': fusion_data['moves']
-            }
-            
-            # Add to database
-            pokemons[fusion_data['id']] = entry
+            entry = self._entry(fusion_data)
             
-            # Save database
-            self._save_db(pokemons)
+            # Add to database (atomic upsert)
+            self.store.upsert(entry)
+            get_atlas_cache().invalidate([entry])
             
             # Create URL
             url = f"/pokemon/{fusion_data['id']}"
@@ -54,41 +42,61 @@ class AddPokedexEntry:
             self.logger.log_error("Add pokedex entry failed", str(e))
             raise
 
+    @traced(kind='tool')
+    def add_entries(self, fusions):
+        """Add several fusion pokemons in one store write"""
+        self.logger.log_info("Add pokedex entries started", {"count": len(fusions)})
+        
+        try:
+            entries = [self._entry(fusion_data) for fusion_data in fusions]
+            self.store.upsert_many(entries)
+            get_atlas_cache().invalidate(entries)
+            
+            self.logger.log_success("Pokedex entries added", {"count": len(entries)})
+            return [{'url': f"/pokemon/{entry['id']}", 'fusion_id': entry['id']} for entry in entries]
+            
+        except Exception as e:
+            self.logger.log_error("Add pokedex entries failed", str(e))
+            raise
+
+    def _entry(self, fusion_data):
+        return {
+            'id': fusion_data['id'],
+            'name': fusion_data['name'],
+            'image': fusion_data['image'],
+            'cry': fusion_data['cry'],
+            'types': fusion_data['types'],
+            'stats': fusion_data['stats'],
+            'moves': fusion_data['moves']
+        }
+
+    @traced(kind='tool')
     def get_entry(self, fusion_id):
         """Get fusion pokemon entry by id"""
         try:
-            pokemons = self._load_db()
-            return pokemons.get(fusion_id)
+            return self.store.get(fusion_id)
         except Exception as e:
             self.logger.log_error("Get pokedex entry failed", str(e))
             raise
 
-    def list_entries(self):
-        """List all fused pokemon entries"""
+    @traced(kind='tool')
+    def list_entries(self, query=None, limit=50, cursor=None):
+        """One page of fused pokemon entries: {'items', 'next_cursor'}"""
         try:
-            pokemons = self._load_db()
-            return list(pokemons.values())
+            return self.store.page(query, limit, cursor)
         except Exception as e:
             self.logger.log_error("List pokedex entries failed", str(e))
             raise
-    
-    def _load_db(self):
-        """Load fused pokemons database"""
-        try:
-            if self.db_file.exists():
-                with open(self.db_file, 'r') as f:
-                    return json.load(f)
-            return {}
-        except Exception as e:
-            self.logger.log_error("Load DB failed", str(e))
-            return {}
-    
-    def _save_db(self, pokemons):
-        """Save fused pokemons database"""
+
+    @traced(kind='tool')
+    def list_entries_with_atlas(self, query=None, limit=50, cursor=None):
+        """One page of entries plus the sprite atlas of their thumbnails: {'items', 'next_cursor', 'atlas'}"""
         try:
-            with open(self.db_file, 'w') as f:
-                json.dump(pokemons, f, indent=2)
-            self.logger.log_debug("DB saved", {"entries": len(pokemons)})
+            return get_atlas_cache().page(query, limit, cursor)
         except Exception as e:
-            self.logger.log_error("Save DB failed", str(e))
+            self.logger.log_error("List pokedex atlas failed", str(e))
             raise
+
+    def iter_entries(self, query=None):
+        """Stream every fused pokemon entry matching query"""
+        return self.store.iter_entries(query)
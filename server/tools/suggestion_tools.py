@@ -1,20 +1,37 @@
-import requests
+import asyncio
 import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+from utils import aio
 from utils.logger import AgentLogger
-from utils.config import TYPE_EFFECTIVENESS, STATS_WEIGHTS
+from utils.type_matrix import encode_types, score_compatibility_batch, score_compatibility_matrix
+from utils.catalog import get_catalog
+from utils.pokeapi_client import get_pokeapi_client
+from utils.stat_index import get_stat_index, normalized_stats, stat_scores
+from utils.tracing import submit, traced
+from utils.config import (
+    TYPE_EFFECTIVENESS, STATS_WEIGHTS,
+    SUGGEST_STAT_SAMPLE, SUGGEST_HYDRATION_WORKERS, SUGGEST_HYDRATION_BUDGET
+)
 
 class SuggestionTypesTool:
     """Tool: Suggest pokemon by type advantages/disadvantages"""
     
     def __init__(self):
         self.logger = AgentLogger("SuggestionTypesTool")
-        self.pokeapi_base = "https://pokeapi.co/api/v2"
+        self.pokeapi = get_pokeapi_client()
+        self.catalog = get_catalog()
+        self._catalog_encoded = None
     
+    @traced(kind='tool')
     def suggest_by_types(self, base_pokemon, limit=50):
         """
         Suggest compatible pokemon based on type coverage
         - If base has weaknesses, suggest pokemon strong against those types
         - If base has resistances, suggest pokemon that complement them
+        limit=None returns every scored candidate (catalog only)
         """
         self.logger.log_info("Type suggestion started", {
             "base_name": base_pokemon['name'],
@@ -24,41 +41,27 @@ class SuggestionTypesTool:
         try:
             base_types = base_pokemon['types']
             
-            # Identify base pokemon weaknesses and strong points
-            weaknesses = set()
-            strong_against = set()
-            
-            for ptype in base_types:
-                if ptype in TYPE_EFFECTIVENESS:
-                    weaknesses.update(TYPE_EFFECTIVENESS[ptype]['weak_to'])
-                    strong_against.update(TYPE_EFFECTIVENESS[ptype]['strong_against'])
-            
             # Get all pokemon (simplified - in production, paginate)
             all_pokemon = self._get_all_pokemon(limit)
             
-            # Score candidates
-            scored = []
-            for candidate in all_pokemon:
+            # Score every candidate in one batched matrix call
+            scores = score_compatibility_batch(base_types, self._encode_candidates(all_pokemon))
+            
+            # Sort by score (stable, like list.sort) and return top candidates
+            top_candidates = []
+            for index in np.argsort(-scores, kind='stable'):
+                candidate = all_pokemon[index]
                 if candidate['id'] == base_pokemon['id']:
                     continue  # Skip base pokemon
                 
-                score = self._score_compatibility(
-                    candidate,
-                    weaknesses,
-                    strong_against,
-                    base_types
-                )
-                
-                scored.append({
+                top_candidates.append({
                     'id': candidate['id'],
                     'name': candidate['name'],
                     'types': candidate['types'],
-                    'compatibility_score': score
+                    'compatibility_score': float(scores[index])
                 })
-            
-            # Sort by score and return top candidates
-            scored.sort(key=lambda x: x['compatibility_score'], reverse=True)
-            top_candidates = scored[:limit]
+                if len(top_candidates) == limit:
+                    break
             
             self.logger.log_success("Type suggestion completed", {
                 "candidates_count": len(top_candidates),
@@ -71,8 +74,36 @@ class SuggestionTypesTool:
             self.logger.log_error("Type suggestion failed", str(e))
             raise
     
+    @traced(kind='tool')
+    def candidate_pool(self, limit=50):
+        """Candidates shared by every base of a batch (whole catalog, or first `limit` from PokeAPI)"""
+        return self._get_all_pokemon(limit)
+    
+    @traced(kind='tool')
+    def score_many(self, base_pokemons, candidates):
+        """Type compatibility of every base against every candidate in one matrix call, shape (B, N)"""
+        self.logger.log_info("Batch type scoring started", {
+            "bases": len(base_pokemons),
+            "candidates_count": len(candidates)
+        })
+        
+        try:
+            base_encoded = encode_types([base['types'] for base in base_pokemons])
+            return score_compatibility_matrix(base_encoded, self._encode_candidates(candidates))
+        except Exception as e:
+            self.logger.log_error("Batch type scoring failed", str(e))
+            raise
+    
+    def _encode_candidates(self, candidates):
+        """Type count matrix for the candidates (cached for the catalog)"""
+        if self.catalog and candidates is self.catalog.all():
+            if self._catalog_encoded is None:
+                self._catalog_encoded = encode_types([c['types'] for c in candidates])
+            return self._catalog_encoded
+        return encode_types([c['types'] for c in candidates])
+    
     def _score_compatibility(self, candidate, weaknesses, strong_against, base_types):
-        """Score how well candidate complements base pokemon"""
+        """Score how well candidate complements base pokemon (scalar reference of score_compatibility_batch)"""
         score = 0.0
         candidate_types = candidate['types']
         
@@ -98,65 +129,84 @@ class SuggestionTypesTool:
         return score
     
     def _get_all_pokemon(self, limit):
-        """Get all pokemon (simplified - first 151 for demo)"""
+        """Get all pokemon: whole local catalog, or first `limit` from PokeAPI without one"""
+        if self.catalog:
+            return self.catalog.all()
+
         try:
-            url = f"{self.pokeapi_base}/pokemon?limit={limit}&offset=0"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
             results = []
-            poke_list = response.json()['results']
-            
-            # Process with timeout for each pokemon
-            for i, poke in enumerate(poke_list[:limit]):
-                try:
-                    poke_data = requests.get(poke['url'], timeout=5).json()
-                    
-                    # Get species data for French name
-                    try:
-                        species_data = requests.get(poke_data['species']['url'], timeout=5).json()
-                        french_name = next(
-                            (n['name'] for n in species_data['names'] if n['language']['name'] == 'fr'),
-                            poke_data['name']
-                        )
-                    except:
-                        french_name = poke_data['name']
-                    
-                    results.append({
-                        'id': poke_data['id'],
-                        'name': french_name,
-                        'name_en': poke_data['name'],
-                        'types': [t['type']['name'] for t in poke_data['types']]
-                    })
-                    
-                    # Log progress every 10 pokemon
-                    if (i + 1) % 10 == 0:
-                        self.logger.log_debug("Loading progress", {"count": i + 1})
-                        
-                except Exception as e:
-                    self.logger.log_debug("Skipped pokemon", {"name": poke['name'], "error": str(e)})
+            names = [poke['name'] for poke in self.pokeapi.list_pokemon(limit)[:limit]]
+
+            # Fetched concurrently on the aio loop (bounded by the PokeAPI pool), 5s timeout each
+            for name, pokemon in zip(names, aio.run(self._afetch_all(names))):
+                if isinstance(pokemon, Exception):
+                    self.logger.log_debug("Skipped pokemon", {"name": name, "error": str(pokemon)})
                     continue
-            
+                results.append(pokemon)
+
             self.logger.log_info("All pokemon loaded", {"count": len(results)})
             return results
         except Exception as e:
             self.logger.log_error("Get all pokemon failed", str(e))
             raise
 
+    async def _afetch_all(self, names):
+        return await asyncio.gather(
+            *(self.pokeapi.afetch_pokemon(name, timeout=5) for name in names),
+            return_exceptions=True
+        )
+
+
+_hydration_executor = None
+_hydration_lock = threading.Lock()
+
+
+def get_hydration_executor():
+    """Process-wide pool hydrating sampled candidates from PokeAPI, shared by every StatFilterTop3Tool"""
+    global _hydration_executor
+
+    if _hydration_executor is None:
+        with _hydration_lock:
+            if _hydration_executor is None:
+                _hydration_executor = ThreadPoolExecutor(
+                    max_workers=SUGGEST_HYDRATION_WORKERS,
+                    thread_name_prefix="stat-hydration"
+                )
+    return _hydration_executor
+
+
+def _reset_after_fork():
+    """The pool's threads do not survive fork"""
+    global _hydration_executor, _hydration_lock
+    _hydration_executor = None
+    _hydration_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 
 class StatFilterTop3Tool:
     """Tool: Filter candidates by stat similarity to base pokemon"""
     
     def __init__(self):
         self.logger = AgentLogger("StatFilterTop3Tool")
-        self.pokeapi_base = "https://pokeapi.co/api/v2"
+        self.pokeapi = get_pokeapi_client()
+        self.catalog = get_catalog()
+        self.stat_index = get_stat_index()
+        self.sample_size = SUGGEST_STAT_SAMPLE
+        self.hydration_budget = SUGGEST_HYDRATION_BUDGET
+        self.executor = get_hydration_executor()
     
+    @traced(kind='tool')
     def filter_top_3(self, base_pokemon, candidates):
         """
         Filter top 3 candidates based on stat similarity
         - Normalize stats
         - Calculate distance from base
         - Return 3 closest
+        With the catalog, every type-compatible candidate is considered (k-NN over the stat index);
+        without it, the first SUGGEST_STAT_SAMPLE candidates are hydrated from PokeAPI.
         """
         self.logger.log_info("Stat filter started", {
             "base_name": base_pokemon['name'],
@@ -164,32 +214,10 @@ class StatFilterTop3Tool:
         })
         
         try:
-            base_stats_norm = self._normalize_stats(base_pokemon['stats'])
-            
-            scored = []
-            for candidate_data in candidates[:20]:  # Sample first 20
-                try:
-                    candidate = self._fetch_pokemon_stats(candidate_data['id'])
-                    candidate_stats_norm = self._normalize_stats(candidate['stats'])
-                    
-                    distance = self._euclidean_distance(base_stats_norm, candidate_stats_norm)
-                    
-                    scored.append({
-                        'id': int(candidate['id']),
-                        'name': str(candidate['name']),
-                        'types': list(candidate['types']),
-                        'compatibility_score': float(1.0 / (1.0 + distance))  # Convert distance to score
-                    })
-                except Exception as e:
-                    self.logger.log_debug("Skipped candidate during stat filter", {
-                        "candidate_id": candidate_data.get('id'),
-                        "error": str(e)
-                    })
-                    continue
-            
-            # Sort by compatibility score (higher = better)
-            scored.sort(key=lambda x: x['compatibility_score'], reverse=True)
-            top_3 = scored[:3]
+            if self.stat_index and all(self.catalog.get(c['id']) for c in candidates):
+                top_3 = self._filter_with_stat_index(base_pokemon, candidates)
+            else:
+                top_3 = self._filter_sampled(base_pokemon, candidates)
             
             self.logger.log_info("Stat filter completed", {
                 "top_3": [p['name'] for p in top_3],
@@ -201,6 +229,157 @@ class StatFilterTop3Tool:
         except Exception as e:
             self.logger.log_error("Stat filter failed", str(e))
             raise
+
+    @traced(kind='tool')
+    def filter_top_k_many(self, base_pokemons, candidates, type_scores, k=3):
+        """
+        Top k of several bases at once, ranked like filter_top_3, one list per base
+        - type_scores: (B, N) scores of every base against every candidate (score_many)
+        - stat index (catalog pool): k-NN over the type-compatible candidates of each base
+          (every candidate when none is)
+        - otherwise: stat similarity of the SUGGEST_STAT_SAMPLE best candidates by type score
+          (the pool is already hydrated, nothing is fetched)
+        """
+        self.logger.log_info("Batch stat filter started", {
+            "bases": len(base_pokemons),
+            "candidates_count": len(candidates),
+            "k": k
+        })
+        
+        try:
+            base_norm = normalized_stats([base['stats'] for base in base_pokemons])
+            candidate_ids = np.array([c['id'] for c in candidates])
+            own = candidate_ids[None, :] == np.array([base['id'] for base in base_pokemons])[:, None]
+            
+            if self.stat_index and self.catalog and candidates is self.catalog.all():
+                # Pool positions are stat index positions
+                mask = (type_scores > 0) & ~own
+                fallback = ~mask.any(axis=1)
+                mask[fallback] = ~own[fallback]
+                positions, scores = self.stat_index.query_many(base_norm, k, mask)
+            else:
+                positions, scores = self._rank_sampled_many(base_norm, candidates, type_scores, own, k)
+            
+            results = []
+            for row_positions, row_scores in zip(positions, scores):
+                results.append([
+                    {
+                        'id': int(candidates[position]['id']),
+                        'name': str(candidates[position]['name']),
+                        'types': list(candidates[position]['types']),
+                        'compatibility_score': float(score)
+                    }
+                    for position, score in zip(row_positions, row_scores) if position >= 0
+                ])
+            
+            self.logger.log_info("Batch stat filter completed", {
+                "bases": len(results),
+                "counts": [len(top) for top in results]
+            })
+            
+            return results
+            
+        except Exception as e:
+            self.logger.log_error("Batch stat filter failed", str(e))
+            raise
+
+    def _rank_sampled_many(self, base_norm, candidates, type_scores, own, k):
+        """Positions (B, k) and stat scores of the top k among each base's type sample, -1/nan padded"""
+        bases, count = type_scores.shape
+        order = np.argsort(-type_scores, axis=1, kind='stable')
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, np.broadcast_to(np.arange(count), order.shape), axis=1)
+        
+        # Sample: the first SUGGEST_STAT_SAMPLE candidates by type score, base excluded
+        own_sorted = np.take_along_axis(own, order, axis=1)
+        sample_sorted = ~own_sorted & (np.arange(count) - np.cumsum(own_sorted, axis=1) < self.sample_size)
+        sample = np.zeros_like(own)
+        np.put_along_axis(sample, order, sample_sorted, axis=1)
+        
+        candidate_norm = normalized_stats([c['stats'] for c in candidates])
+        exact = np.where(sample, stat_scores(base_norm[:, None, :], candidate_norm[None, :, :]), -np.inf)
+        
+        # Ties keep type order, like the per-base stable sort
+        top = np.lexsort((rank, -exact), axis=-1)[:, :k]
+        top_scores = np.take_along_axis(exact, top, axis=1)
+        found = np.isfinite(top_scores)
+        
+        positions = np.full((bases, k), -1, dtype=np.int64)
+        scores = np.full((bases, k), np.nan)
+        width = top.shape[1]
+        positions[:, :width] = np.where(found, top, -1)
+        scores[:, :width] = np.where(found, top_scores, np.nan)
+        return positions, scores
+
+    def _filter_with_stat_index(self, base_pokemon, candidates, k=3):
+        """Weighted k-NN over every type-compatible candidate (positive type score)"""
+        compatible = [c['id'] for c in candidates if c.get('compatibility_score', 0) > 0]
+        mask = self.stat_index.mask_for_ids(compatible or [c['id'] for c in candidates])
+
+        top = []
+        for position, score in self.stat_index.query(base_pokemon['stats'], k, mask):
+            candidate = self.catalog.get(int(self.stat_index.ids[position]))
+            top.append({
+                'id': int(candidate['id']),
+                'name': str(candidate['name']),
+                'types': list(candidate['types']),
+                'compatibility_score': score
+            })
+        return top
+
+    def _filter_sampled(self, base_pokemon, candidates):
+        """Hydrate and score the first SUGGEST_STAT_SAMPLE candidates"""
+        base_stats_norm = self._normalize_stats(base_pokemon['stats'])
+        sample = candidates[:self.sample_size]  # Sample first N
+
+        # Hydrate candidates concurrently, bounded by the shared pool and the deadline budget
+        futures = {
+            submit(self.executor, self._score_candidate, base_stats_norm, candidate_data): index
+            for index, candidate_data in enumerate(sample)
+        }
+        done, not_done = wait(futures, timeout=self.hydration_budget)
+
+        if not_done:
+            for future in not_done:
+                future.cancel()
+            self.logger.log_info("Stat filter deadline reached, using partial results", {
+                "budget_s": self.hydration_budget,
+                "hydrated": len(done),
+                "pending": len(not_done)
+            })
+
+        ranked = []
+        for future in done:
+            index = futures[future]
+            try:
+                ranked.append((index, future.result()))
+            except Exception as e:
+                self.logger.log_debug("Skipped candidate during stat filter", {
+                    "candidate_id": sample[index].get('id'),
+                    "error": str(e)
+                })
+
+        # Keep candidate order for ties, as the sequential loop did
+        ranked.sort(key=lambda item: item[0])
+        scored = [candidate for _, candidate in ranked]
+
+        # Sort by compatibility score (higher = better)
+        scored.sort(key=lambda x: x['compatibility_score'], reverse=True)
+        return scored[:3]
+
+    def _score_candidate(self, base_stats_norm, candidate_data):
+        """Hydrate one candidate and score its stat similarity to the base"""
+        candidate = self._fetch_pokemon_stats(candidate_data['id'])
+        candidate_stats_norm = self._normalize_stats(candidate['stats'])
+
+        distance = self._euclidean_distance(base_stats_norm, candidate_stats_norm)
+
+        return {
+            'id': int(candidate['id']),
+            'name': str(candidate['name']),
+            'types': list(candidate['types']),
+            'compatibility_score': float(1.0 / (1.0 + distance))  # Convert distance to score
+        }
     
     def _normalize_stats(self, stats):
         """Normalize stats using min-max normalization"""
@@ -223,48 +402,14 @@ class StatFilterTop3Tool:
         return math.sqrt(distance)
     
     def _fetch_pokemon_stats(self, pokemon_id):
-        """Fetch pokemon stats from PokeAPI with proper error handling"""
+        """Fetch pokemon stats from the local catalog, or PokeAPI without one"""
+        if self.catalog:
+            species = self.catalog.get(pokemon_id)
+            if species:
+                return species
+
         try:
-            url = f"{self.pokeapi_base}/pokemon/{pokemon_id}"
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Get French name
-            try:
-                species_url = data['species']['url']
-                species_response = requests.get(species_url, timeout=5)
-                species_data = species_response.json()
-                
-                french_name = next(
-                    (n['name'] for n in species_data['names'] if n['language']['name'] == 'fr'),
-                    data['name']
-                )
-            except:
-                french_name = data['name']
-            
-            # Extract stats safely
-            stats_dict = {}
-            stat_names = ['hp', 'attack', 'defense', 'sp-attack', 'sp-defense', 'speed']
-            
-            for stat_name in stat_names:
-                try:
-                    stat_value = next(
-                        s['base_stat'] for s in data['stats'] if s['stat']['name'] == stat_name
-                    )
-                    key = stat_name.replace('-', '_')
-                    stats_dict[key] = stat_value
-                except StopIteration:
-                    key = stat_name.replace('-', '_')
-                    stats_dict[key] = 0
-            
-            return {
-                'id': data['id'],
-                'name': french_name,
-                'name_en': data['name'],
-                'types': [t['type']['name'] for t in data['types']],
-                'stats': stats_dict
-            }
+            return self.pokeapi.fetch_pokemon(pokemon_id, timeout=5)
         except Exception as e:
             self.logger.log_error("Fetch pokemon stats failed", {
                 "pokemon_id": pokemon_id,
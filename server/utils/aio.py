@@ -0,0 +1,117 @@
+"""
+Process-wide asyncio event loop running on a background thread.
+
+Outbound I/O (PokeAPI, Leonardo, Mistral) is implemented with coroutines
+that all run on this one loop, so hundreds of fusions and suggestions can
+wait on upstreams at once without a thread each. Synchronous callers (Flask
+views, job worker threads, tool pools) use run(), which blocks the calling
+thread only; async code elsewhere (Flask async views) awaits wrap().
+
+The caller's context variables (request id, current span) are copied into
+the coroutine, so traces and logs follow the request onto the loop.
+"""
+import asyncio
+import os
+import threading
+import httpx
+from utils.config import HTTP_MAX_CONNECTIONS, HTTP_TIMEOUT
+
+_loop = None
+_thread = None
+_http = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    """The background loop, started on first use (and again in a forked child)"""
+    global _loop, _thread
+
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _thread = threading.Thread(target=loop.run_forever, name="aio-loop", daemon=True)
+                _thread.start()
+                _loop = loop
+    return _loop
+
+
+def in_loop():
+    """True on the background loop thread (where run() would deadlock)"""
+    return _thread is not None and threading.current_thread() is _thread
+
+
+def submit(coro):
+    """Schedule a coroutine on the loop, returns a concurrent.futures.Future"""
+    # call_soon_threadsafe copies the calling context: the task keeps request id and span
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro, timeout=None):
+    """Run a coroutine on the loop and wait for its result (sync API wrapper)"""
+    if in_loop():
+        coro.close()
+        raise RuntimeError("aio.run() called from the event loop, await the coroutine instead")
+    return submit(coro).result(timeout)
+
+
+def wrap(coro):
+    """Awaitable running coro on the background loop, for code running in another event loop"""
+    return asyncio.wrap_future(submit(coro))
+
+
+class RateLimiter:
+    """
+    async with limiter: at most `concurrency` holders at once, and holders
+    admitted at most `rate` per second (0 disables the rate). Loop-local.
+    """
+
+    def __init__(self, rate, concurrency):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._slots = asyncio.Semaphore(max(concurrency, 1))
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self._slots.acquire()
+        if self.interval:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+            if start > now:
+                try:
+                    await asyncio.sleep(start - now)
+                except BaseException:
+                    self._slots.release()
+                    raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._slots.release()
+
+
+def http_client():
+    """Shared httpx.AsyncClient, only to be used from the background loop"""
+    global _http
+
+    if _http is None:
+        with _lock:
+            if _http is None:
+                _http = httpx.AsyncClient(
+                    timeout=HTTP_TIMEOUT,
+                    limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS)
+                )
+    return _http
+
+
+def _reset_after_fork():
+    """The loop thread and the pooled connections belong to the parent process"""
+    global _loop, _thread, _http, _lock
+    _loop = None
+    _thread = None
+    _http = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
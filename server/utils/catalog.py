@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+import requests
+from utils.config import CATALOG_FILE, CATALOG_VERSION
+from utils.logger import AgentLogger
+
+# PokeAPI stat name -> our stat key
+STAT_KEYS = {
+    'hp': 'hp',
+    'attack': 'attack',
+    'defense': 'defense',
+    'special-attack': 'sp_attack',
+    'special-defense': 'sp_defense',
+    'speed': 'speed',
+}
+
+
+def build_species_entry(data, species_data=None):
+    """Build a catalog entry from raw PokeAPI pokemon + species payloads"""
+    french_name = data['name']
+    if species_data:
+        french_name = next(
+            (n['name'] for n in species_data.get('names', []) if n['language']['name'] == 'fr'),
+            data['name']
+        )
+
+    # Convert stat names (special-attack -> sp_attack), missing stats default to 0
+    stats_dict = {key: 0 for key in STAT_KEYS.values()}
+    for s in data.get('stats', []):
+        key = STAT_KEYS.get(s['stat']['name'])
+        if key:
+            stats_dict[key] = s['base_stat']
+
+    cries = data.get('cries') or {}
+
+    return {
+        'id': data['id'],
+        'name': french_name,
+        'name_en': data['name'],
+        'types': [t['type']['name'] for t in data.get('types', [])],
+        'stats': stats_dict,
+        'moves': [m['move']['name'] for m in data.get('moves', [])],
+        'cry': cries.get('latest') or cries.get('legacy')
+    }
+
+
+class CatalogVersionError(Exception):
+    """Raised when the catalog file was built with another schema version"""
+
+
+class SpeciesCatalog:
+    """In-memory species catalog (ids, names, types, stats, moves, cries)"""
+
+    def __init__(self, species, built_at=None, source=None, version=CATALOG_VERSION):
+        self.version = version
+        self.built_at = built_at or datetime.now().isoformat()
+        self.source = source
+        self.species = sorted(species, key=lambda s: s['id'])
+        self._by_id = {s['id']: s for s in self.species}
+        self._by_name = {s['name_en'].lower(): s for s in self.species}
+
+    def __len__(self):
+        return len(self.species)
+
+    def get(self, pokemon_id):
+        """Get species by numeric id or english name, None if unknown"""
+        if isinstance(pokemon_id, int):
+            return self._by_id.get(pokemon_id)
+        key = str(pokemon_id).strip().lower()
+        if key.isdigit():
+            return self._by_id.get(int(key))
+        return self._by_name.get(key)
+
+    def all(self):
+        """All species ordered by id"""
+        return self.species
+
+    @classmethod
+    def load(cls, path=CATALOG_FILE):
+        """Load catalog from disk"""
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+
+        version = payload.get('version')
+        if version != CATALOG_VERSION:
+            raise CatalogVersionError(
+                f"Catalog version {version} does not match expected {CATALOG_VERSION}, rebuild it"
+            )
+
+        return cls(
+            payload['species'],
+            built_at=payload.get('built_at'),
+            source=payload.get('source'),
+            version=version
+        )
+
+    def save(self, path=CATALOG_FILE):
+        """Write catalog atomically (temp file + rename)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': self.version,
+                'built_at': self.built_at,
+                'source': self.source,
+                'count': len(self.species),
+                'species': self.species
+            }, f, ensure_ascii=False)
+
+        os.replace(tmp_path, path)
+
+
+class CatalogImporter:
+    """Bulk importer: builds a SpeciesCatalog from a PokeAPI dump or a (mock) server"""
+
+    def __init__(self):
+        self.logger = AgentLogger("CatalogImporter")
+
+    def from_dump(self, dump_dir):
+        """
+        Import from a PokeAPI dump directory (api-data layout)
+        Accepts either the dump root or its api/v2 folder:
+        <dir>/pokemon/<id>/index.json and <dir>/pokemon-species/<id>/index.json
+        """
+        root = self._resolve_dump_root(Path(dump_dir))
+        self.logger.log_info("Catalog import from dump started", {"dump_dir": str(root)})
+
+        species = []
+        for pokemon_file in sorted((root / "pokemon").glob("*/index.json")):
+            try:
+                with open(pokemon_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+
+                species_data = None
+                species_file = root / "pokemon-species" / self._url_id(data['species']['url']) / "index.json"
+                if species_file.exists():
+                    with open(species_file, 'r', encoding='utf-8') as f:
+                        species_data = json.load(f)
+
+                species.append(build_species_entry(data, species_data))
+            except Exception as e:
+                self.logger.log_debug("Skipped dump entry", {"file": str(pokemon_file), "error": str(e)})
+
+        self.logger.log_success("Catalog import from dump completed", {"count": len(species)})
+        return SpeciesCatalog(species, source=f"dump:{root}")
+
+    def from_api(self, base_url, limit=100000):
+        """Import by crawling a PokeAPI-compatible server (meant for local mock servers)"""
+        self.logger.log_info("Catalog import from API started", {"base_url": base_url, "limit": limit})
+
+        session = requests.Session()
+        response = session.get(f"{base_url}/pokemon?limit={limit}&offset=0", timeout=30)
+        response.raise_for_status()
+
+        species = []
+        for i, poke in enumerate(response.json()['results']):
+            try:
+                data = session.get(poke['url'], timeout=10).json()
+                try:
+                    species_data = session.get(data['species']['url'], timeout=10).json()
+                except Exception:
+                    species_data = None
+
+                species.append(build_species_entry(data, species_data))
+
+                if (i + 1) % 100 == 0:
+                    self.logger.log_debug("Import progress", {"count": i + 1})
+            except Exception as e:
+                self.logger.log_debug("Skipped pokemon", {"name": poke.get('name'), "error": str(e)})
+
+        self.logger.log_success("Catalog import from API completed", {"count": len(species)})
+        return SpeciesCatalog(species, source=f"api:{base_url}")
+
+    def _resolve_dump_root(self, dump_dir):
+        for candidate in (dump_dir, dump_dir / "api" / "v2", dump_dir / "data" / "api" / "v2"):
+            if (candidate / "pokemon").is_dir():
+                return candidate
+        raise FileNotFoundError(f"No pokemon/ folder found in dump {dump_dir}")
+
+    def _url_id(self, url):
+        return url.rstrip('/').split('/')[-1]
+
+
+_catalog = None
+_catalog_loaded = False
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Process-wide catalog, loaded once. Returns None when no catalog was built."""
+    global _catalog, _catalog_loaded
+
+    if _catalog_loaded:
+        return _catalog
+
+    with _catalog_lock:
+        if not _catalog_loaded:
+            logger = AgentLogger("SpeciesCatalog")
+            try:
+                if os.path.exists(CATALOG_FILE):
+                    _catalog = SpeciesCatalog.load(CATALOG_FILE)
+                    logger.log_success("Species catalog loaded", {
+                        "count": len(_catalog),
+                        "built_at": _catalog.built_at
+                    })
+                else:
+                    logger.log_info("No species catalog, falling back to PokeAPI", {
+                        "catalog_file": CATALOG_FILE
+                    })
+            except Exception as e:
+                logger.log_error("Species catalog load failed", str(e))
+                _catalog = None
+            _catalog_loaded = True
+
+    return _catalog
@@ -6,6 +6,7 @@ load_dotenv()
 # Mistral API Configuration
 MISTRAL_API_KEY = os.getenv('MISTRAL_API_KEY')
 MISTRAL_MODEL = "mistral-large-latest"
+MISTRAL_API_BASE = os.getenv('MISTRAL_API_BASE', 'https://api.mistral.ai/v1')  # e.g. the local fake (python -m fakes)
 
 # Flask Configuration
 FLASK_PORT = int(os.getenv('FLASK_PORT', 8081))
@@ -14,6 +15,64 @@ FLASK_ENV = os.getenv('FLASK_ENV', 'development')
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FILE = os.path.join(os.path.dirname(__file__), '..', 'logs', 'agents.log')
+LOG_STDOUT = os.getenv('LOG_STDOUT', 'true').lower() in ('1', 'true', 'yes')  # echo info/error lines to stdout
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # records buffered before dropping
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 256))  # records per write
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 0.2))  # seconds
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))  # rotate above this size, 0 disables
+LOG_MAX_AGE_SECONDS = int(os.getenv('LOG_MAX_AGE_SECONDS', 24 * 3600))  # rotate older segments, 0 disables
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 7))  # rotated segments kept
+LOG_COMPRESS = os.getenv('LOG_COMPRESS', 'true').lower() in ('1', 'true', 'yes')  # gzip rotated segments
+
+# Request tracing (spans kept in memory, optional JSON lines export)
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', 5000))  # spans kept for /api/debug/traces
+TRACE_EXPORT_FILE = os.getenv('TRACE_EXPORT_FILE', '')  # e.g. logs/traces.jsonl, empty disables
+
+# PokeAPI Configuration
+POKEAPI_BASE = os.getenv('POKEAPI_BASE', 'https://pokeapi.co/api/v2').rstrip('/')
+POKEAPI_POOL_SIZE = int(os.getenv('POKEAPI_POOL_SIZE', 20))
+POKEAPI_CACHE_SIZE = int(os.getenv('POKEAPI_CACHE_SIZE', 4096))
+POKEAPI_CACHE_TTL = int(os.getenv('POKEAPI_CACHE_TTL', 3600))  # seconds
+
+# Async HTTP client shared by the upstream calls (utils/aio.py)
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', 100))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 30))  # seconds
+
+# Upstream scheduler (utils/upstream.py): per provider token bucket (calls/s, burst) and calls in flight
+UPSTREAM_LIMITS = {
+    'pokeapi': {
+        'rate': float(os.getenv('POKEAPI_RATE_LIMIT', 50)),
+        'burst': int(os.getenv('POKEAPI_BURST', 50)),
+        'concurrency': int(os.getenv('POKEAPI_CONCURRENCY', POKEAPI_POOL_SIZE)),
+    },
+    'leonardo': {
+        'rate': float(os.getenv('LEONARDO_RATE_LIMIT', 5)),
+        'burst': int(os.getenv('LEONARDO_BURST', 10)),
+        'concurrency': int(os.getenv('LEONARDO_CONCURRENCY', 10)),
+    },
+    'mistral': {
+        'rate': float(os.getenv('MISTRAL_RATE_LIMIT', 1)),
+        'burst': int(os.getenv('MISTRAL_BURST', 2)),
+        'concurrency': int(os.getenv('MISTRAL_CONCURRENCY', 4)),
+    },
+}
+UPSTREAM_MAX_RETRIES = int(os.getenv('UPSTREAM_MAX_RETRIES', 4))  # retries on 429, 5xx and transport errors
+UPSTREAM_BACKOFF_BASE = float(os.getenv('UPSTREAM_BACKOFF_BASE', 0.5))  # seconds, doubled per retry (full jitter)
+UPSTREAM_BACKOFF_MAX = float(os.getenv('UPSTREAM_BACKOFF_MAX', 30))  # seconds
+
+# Leonardo image generation (utils/generations.py): completion by webhook, or by the shared adaptive poller
+LEONARDO_API_BASE = os.getenv('LEONARDO_API_BASE', 'https://cloud.leonardo.ai/api/rest/v1')
+LEONARDO_WEBHOOK_SECRET = os.getenv('LEONARDO_WEBHOOK_SECRET', '')  # webhook callback API key, empty disables the webhook
+LEONARDO_MAX_WAIT = float(os.getenv('LEONARDO_MAX_WAIT', 300))  # seconds
+LEONARDO_POLL_INITIAL = float(os.getenv('LEONARDO_POLL_INITIAL', 3.0))  # first poll, before completion times are known
+LEONARDO_POLL_MIN_INTERVAL = float(os.getenv('LEONARDO_POLL_MIN_INTERVAL', 1.0))
+LEONARDO_POLL_MAX_INTERVAL = float(os.getenv('LEONARDO_POLL_MAX_INTERVAL', 10.0))
+
+# Species catalog (built offline by build_catalog.py, loaded at startup)
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+CATALOG_FILE = os.getenv('CATALOG_FILE', os.path.join(DATA_DIR, 'species_catalog.json'))
+CATALOG_VERSION = 1
 
 # Type effectiveness for Pokemon suggestion
 TYPE_EFFECTIVENESS = {
@@ -37,6 +96,64 @@ TYPE_EFFECTIVENESS = {
     'fairy': {'resists': ['fighting', 'bug', 'dark'], 'weak_to': ['poison', 'steel'], 'strong_against': ['fighting', 'dragon', 'dark']},
 }
 
+# Suggestion pipeline: type stage keeps the best SUGGEST_TYPE_LIMIT candidates
+SUGGEST_TYPE_LIMIT = int(os.getenv('SUGGEST_TYPE_LIMIT', 50))
+
+# Suggestion stat filter: candidates hydrated concurrently within a deadline budget
+SUGGEST_STAT_SAMPLE = int(os.getenv('SUGGEST_STAT_SAMPLE', 20))
+SUGGEST_HYDRATION_WORKERS = int(os.getenv('SUGGEST_HYDRATION_WORKERS', 8))
+SUGGEST_HYDRATION_BUDGET = float(os.getenv('SUGGEST_HYDRATION_BUDGET', 8.0))  # seconds
+
+# Batch suggestions (/api/suggest/batch): several bases scored against one shared candidate pool
+SUGGEST_BATCH_MAX_BASES = int(os.getenv('SUGGEST_BATCH_MAX_BASES', 12))
+SUGGEST_BATCH_TOP_K = int(os.getenv('SUGGEST_BATCH_TOP_K', 3))  # default suggestions per base
+SUGGEST_BATCH_MAX_K = int(os.getenv('SUGGEST_BATCH_MAX_K', 20))
+
+# Precomputed suggestion index (built offline by build_suggest_index.py)
+SUGGEST_INDEX_DIR = os.getenv('SUGGEST_INDEX_DIR', os.path.join(DATA_DIR, 'suggest_index'))
+SUGGEST_INDEX_TOP_K = int(os.getenv('SUGGEST_INDEX_TOP_K', 10))
+SUGGEST_INDEX_VERSION = 2
+
+# Background fusion jobs (persisted in SQLite, processed by a local worker pool)
+FUSION_JOBS_DB = os.getenv('FUSION_JOBS_DB', os.path.join(DATA_DIR, 'jobs.db'))
+FUSION_WORKERS = int(os.getenv('FUSION_WORKERS', 2))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1.0))  # seconds
+FUSION_ASYNC_JOBS = int(os.getenv('FUSION_ASYNC_JOBS', 100))  # async fusion jobs in flight per process
+JOB_DRAIN_TIMEOUT = float(os.getenv('JOB_DRAIN_TIMEOUT', 300))  # seconds a stopping worker waits for running jobs
+
+# Batch fusion (/api/fuse/batch): name and image generations go through a bounded, rate-limited pool
+FUSE_BATCH_MAX_PAIRS = int(os.getenv('FUSE_BATCH_MAX_PAIRS', 200))
+FUSE_BATCH_CONCURRENCY = int(os.getenv('FUSE_BATCH_CONCURRENCY', 8))  # generations in flight per batch
+FUSE_BATCH_RATE = float(os.getenv('FUSE_BATCH_RATE', 2.0))  # generations started per second per batch, 0 disables
+
+# Leonardo webhook callbacks, shared by the worker processes
+LEONARDO_GENERATIONS_DB = os.getenv('LEONARDO_GENERATIONS_DB', os.path.join(DATA_DIR, 'generations.db'))
+
+# Fusion images (utils/image_store.py): content-addressed originals plus derived thumbnail and WebP variants
+IMAGE_STORE_DIR = os.getenv('IMAGE_STORE_DIR', os.path.join(DATA_DIR, 'images'))
+IMAGE_THUMB_SIZE = int(os.getenv('IMAGE_THUMB_SIZE', 256))  # px, longest side
+IMAGE_WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', 80))
+
+# Pokedex sprite atlases (utils/sprite_atlas.py): one sheet of thumbnails per listing page
+ATLAS_DIR = os.getenv('ATLAS_DIR', os.path.join(IMAGE_STORE_DIR, 'atlases'))
+ATLAS_TILE_SIZE = int(os.getenv('ATLAS_TILE_SIZE', 128))  # px per sprite cell
+ATLAS_COLUMNS = int(os.getenv('ATLAS_COLUMNS', 10))
+ATLAS_CACHE_PAGES = int(os.getenv('ATLAS_CACHE_PAGES', 256))  # listing pages cached per process
+ATLAS_PAGE_TTL = float(os.getenv('ATLAS_PAGE_TTL', 5.0))  # seconds before a cached page is checked against the store
+
+# Fusion result cache (stage artifacts per parent pair)
+FUSION_CACHE_DB = os.getenv('FUSION_CACHE_DB', os.path.join(DATA_DIR, 'fusion_cache.db'))
+
+# Pokedex storage: 'sqlite' (indexed, default) or 'json' (legacy single file)
+POKEDEX_BACKEND = os.getenv('POKEDEX_BACKEND', 'sqlite')
+POKEDEX_DB_FILE = os.getenv('POKEDEX_DB_FILE', os.path.join(DATA_DIR, 'pokedex.db'))
+# Legacy JSON pokedex: migrated into SQLite once, then kept as an export
+POKEDEX_JSON_FILE = os.getenv('POKEDEX_JSON_FILE', os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'data', 'fused_pokemons.json'))
+POKEDEX_JSON_EXPORT = os.getenv('POKEDEX_JSON_EXPORT', 'true').lower() in ('1', 'true', 'yes')
+POKEDEX_EXPORT_DELAY = float(os.getenv('POKEDEX_EXPORT_DELAY', 2.0))  # seconds, debounces the export after writes
+POKEDEX_PAGE_SIZE = int(os.getenv('POKEDEX_PAGE_SIZE', 50))
+POKEDEX_MAX_PAGE_SIZE = int(os.getenv('POKEDEX_MAX_PAGE_SIZE', 500))
+
 # Stats normalization
 STATS_WEIGHTS = {
     'hp': 0.2,
@@ -0,0 +1,164 @@
+"""
+Fusion result cache, one artifact per (parent pair, stage).
+
+Each stage output (name, image, cry, stats_moves, types) is stored with the
+fingerprint of the code that produced it. An artifact is a hit while its
+fingerprint matches STAGE_VERSIONS, so bumping one stage version only
+regenerates that stage and the stages depending on it (DOWNSTREAM_STAGES):
+a stage fingerprint includes the fingerprints of the stages it uses, and a
+stage whose upstream artifact is missing or stale is not served either.
+The pipeline version is the hash of every stage fingerprint.
+"""
+import hashlib
+import json
+import threading
+import time
+from utils.config import FUSION_CACHE_DB, TYPE_EFFECTIVENESS
+from utils.logger import AgentLogger
+from utils.sqlite_db import SQLiteDatabase
+
+# Bump a stage version when its tool output changes for the same parents
+STAGE_VERSIONS = {
+    'name': 1,
+    'image': 1,
+    'cry': 1,
+    'stats_moves': 1,
+    'types': 1,
+}
+
+FUSION_STAGES = tuple(STAGE_VERSIONS)
+
+# Stages regenerated along with a stage (the image prompt uses the name)
+DOWNSTREAM_STAGES = {
+    'name': ('image',),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fusion_artifacts (
+    pair_key TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (pair_key, stage)
+);
+"""
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def upstream_stages(stage):
+    """Stages whose output a stage uses (inverse of DOWNSTREAM_STAGES)"""
+    return sorted(upstream for upstream, downstream in DOWNSTREAM_STAGES.items() if stage in downstream)
+
+
+def stage_fingerprint(stage):
+    """Version of a stage, including the config and the upstream stages its output depends on"""
+    inputs = {'stage': stage, 'version': STAGE_VERSIONS[stage]}
+    if stage == 'stats_moves':
+        inputs['types'] = TYPE_EFFECTIVENESS
+    upstream = upstream_stages(stage)
+    if upstream:
+        inputs['upstream'] = {name: stage_fingerprint(name) for name in upstream}
+    return _digest(inputs)
+
+
+def pipeline_version():
+    return _digest({stage: stage_fingerprint(stage) for stage in FUSION_STAGES})[:12]
+
+
+def normalize_id(pokemon_id):
+    """Pokemon id as used in fusion ids ('025' and 25 are '25', names lowercased)"""
+    value = str(pokemon_id).strip().lower()
+    return str(int(value)) if value.isdigit() else value
+
+
+def pair_key(pokemon1_id, pokemon2_id):
+    """Normalized ordered parent pair, also the fusion id ('025' is 25, but 25-4 and 4-25 differ)"""
+    return f"{normalize_id(pokemon1_id)}-{normalize_id(pokemon2_id)}"
+
+
+def stages_to_regenerate(stages):
+    """Requested stages plus the stages depending on them, raises ValueError on unknown stages"""
+    unknown = [stage for stage in stages if stage not in STAGE_VERSIONS]
+    if unknown:
+        raise ValueError(f"Unknown fusion stage(s) {', '.join(unknown)} (expected {', '.join(FUSION_STAGES)})")
+    result = set()
+    pending = list(stages)
+    while pending:
+        stage = pending.pop()
+        if stage not in result:
+            result.add(stage)
+            pending.extend(DOWNSTREAM_STAGES.get(stage, ()))
+    return result
+
+
+class FusionCache:
+    """SQLite store of fusion stage artifacts"""
+
+    def __init__(self, db_file=FUSION_CACHE_DB):
+        self.logger = AgentLogger("FusionCache")
+        self.db = SQLiteDatabase(db_file, SCHEMA)
+        self.fingerprints = {stage: stage_fingerprint(stage) for stage in FUSION_STAGES}
+
+    def load(self, key):
+        """
+        Up-to-date artifacts of a pair: {stage: value}. A stage is left out when
+        one of the stages it depends on has no up-to-date artifact (it is regenerated with them).
+        """
+        rows = self.db.connection().execute(
+            "SELECT stage, fingerprint, value FROM fusion_artifacts WHERE pair_key = ?", (key,)
+        ).fetchall()
+        fresh = {
+            row['stage']: json.loads(row['value'])
+            for row in rows
+            if self.fingerprints.get(row['stage']) == row['fingerprint']
+        }
+        stale = stages_to_regenerate([stage for stage in FUSION_STAGES if stage not in fresh])
+        return {stage: value for stage, value in fresh.items() if stage not in stale}
+
+    def store(self, key, artifacts):
+        """Save (replace) stage artifacts of a pair"""
+        if not artifacts:
+            return
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO fusion_artifacts (pair_key, stage, fingerprint, value, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, stage, self.fingerprints[stage], json.dumps(value), now) for stage, value in artifacts.items()]
+            )
+
+    def invalidate(self, key, stages=None):
+        """Drop artifacts of a pair (every stage by default)"""
+        with self.db.transaction() as conn:
+            if stages is None:
+                conn.execute("DELETE FROM fusion_artifacts WHERE pair_key = ?", (key,))
+            else:
+                conn.executemany(
+                    "DELETE FROM fusion_artifacts WHERE pair_key = ? AND stage = ?",
+                    [(key, stage) for stage in stages]
+                )
+
+    def stats(self):
+        row = self.db.connection().execute(
+            "SELECT COUNT(DISTINCT pair_key), COUNT(*) FROM fusion_artifacts"
+        ).fetchone()
+        return {"pairs": row[0], "artifacts": row[1], "pipeline_version": pipeline_version()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_fusion_cache():
+    """Process-wide fusion cache"""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FusionCache()
+    return _cache
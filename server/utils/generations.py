@@ -0,0 +1,281 @@
+"""
+Completion of Leonardo image generations.
+
+ImageFusionTool starts a generation, then awaits GenerationTracker.wait().
+The waiter is resolved by whichever comes first:
+- the webhook: Leonardo calls /api/webhooks/leonardo when a generation
+  completes. The callback is stored in a small SQLite table, because with
+  several worker processes it may reach another worker than the one
+  waiting. The receiving worker resolves its own waiters straight away.
+- the poller: one background task per process polls every outstanding
+  generation and picks up callbacks stored by other workers. Polls are
+  placed at percentiles (p25 .. p99) of recently observed completion
+  times, then back off exponentially. This replaces one 5 s sleep loop
+  per generation, which overshot completion by up to 5 s.
+
+The tracker lives on the utils.aio loop and is rebuilt after fork.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from utils import aio, upstream
+from utils.config import (
+    LEONARDO_API_BASE, LEONARDO_GENERATIONS_DB, LEONARDO_MAX_WAIT,
+    LEONARDO_POLL_INITIAL, LEONARDO_POLL_MIN_INTERVAL, LEONARDO_POLL_MAX_INTERVAL
+)
+from utils.logger import AgentLogger
+from utils.metrics import LEONARDO_COMPLETIONS, LEONARDO_POLLS
+from utils.sqlite_db import SQLiteDatabase
+from utils.tracing import span
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation_callbacks (
+    generation_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    image_url TEXT,
+    error TEXT,
+    received_at REAL NOT NULL
+);
+"""
+
+POLL_QUANTILES = (0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+HISTORY_SIZE = 200  # completion times kept for the percentiles
+STORE_CHECK_INTERVAL = 0.5  # seconds between checks of callbacks received by other workers
+
+
+def parse_callback(payload):
+    """
+    Leonardo webhook body -> (generation_id, status, image_url, error)
+    Accepts the webhook envelope ({"type", "data": {"object": {...}}}) and the
+    generations_by_pk shape returned by the status endpoint.
+    """
+    payload = payload or {}
+    generation = (payload.get('data') or {}).get('object') or payload.get('generations_by_pk') or payload
+    generation_id = generation.get('id') or generation.get('generationId')
+    if not generation_id:
+        raise ValueError("generation id missing")
+
+    status = generation.get('status')
+    if not status:
+        status = 'FAILED' if str(payload.get('type', '')).endswith('failed') else 'COMPLETE'
+    images = generation.get('images') or generation.get('generated_images') or []
+    image_url = images[0].get('url') if images else None
+    if status == 'COMPLETE' and not image_url:
+        raise ValueError("image url missing")
+    return str(generation_id), status, image_url, generation.get('error')
+
+
+class _Pending:
+    def __init__(self, generation_id, headers, future, started, next_poll):
+        self.generation_id = generation_id
+        self.headers = headers
+        self.future = future
+        self.started = started
+        self.next_poll = next_poll
+        self.last_pending = started  # last time the generation was seen pending
+        self.last_delay = LEONARDO_POLL_INITIAL
+        self.polls = 0
+        self.polling = False
+        self.context = contextvars.copy_context()  # request id and span of the waiter, for its polls
+
+
+class GenerationTracker:
+    """Outstanding Leonardo generations of this process, resolved by webhook or by the shared poller"""
+
+    def __init__(self, db_file=LEONARDO_GENERATIONS_DB, api_base=LEONARDO_API_BASE, max_wait=LEONARDO_MAX_WAIT):
+        self.logger = AgentLogger("GenerationTracker")
+        self.db = SQLiteDatabase(db_file, SCHEMA)
+        self.check_url = f"{api_base}/generations/{{}}"
+        self.max_wait = max_wait
+        self.durations = deque(maxlen=HISTORY_SIZE)  # seconds from start to completion (estimated when polled)
+
+        # Only touched on the aio loop
+        self._pending = {}
+        self._task = None
+        self._wakeup = None
+
+    async def wait(self, generation_id, headers):
+        """Image URL of a started generation, raises when it fails or after max_wait seconds"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        pending = _Pending(generation_id, headers, loop.create_future(), now, now + self._next_delay(0, None))
+        self._pending[generation_id] = pending
+        self._ensure_poller()
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(pending.future), self.max_wait)
+        except asyncio.TimeoutError:
+            raise Exception(f"Leonardo generation timeout after {self.max_wait:g}s") from None
+        finally:
+            self._pending.pop(generation_id, None)
+            LEONARDO_POLLS.observe(pending.polls)
+
+    def record_callback(self, generation_id, status, image_url=None, error=None):
+        """Webhook (any thread): store the result for every worker, resolve it here if this process waits on it"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO generation_callbacks (generation_id, status, image_url, error, received_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (generation_id, status, image_url, error, now)
+            )
+            conn.execute("DELETE FROM generation_callbacks WHERE received_at < ?", (now - 2 * self.max_wait,))
+        aio.get_loop().call_soon_threadsafe(self._resolve, generation_id, status, image_url, error, 'webhook')
+
+    def percentiles(self):
+        """Observed completion time percentiles (seconds)"""
+        history = sorted(self.durations)
+        if not history:
+            return {}
+        return {f"p{round(q * 100)}": round(history[int(q * (len(history) - 1))], 2) for q in POLL_QUANTILES}
+
+    def stats(self):
+        return {"pending": len(self._pending), "completions": len(self.durations), **self.percentiles()}
+
+    def _next_delay(self, age, previous):
+        """Seconds until the next poll of a generation started `age` seconds ago"""
+        history = sorted(self.durations)
+        for q in POLL_QUANTILES:
+            if not history:
+                break
+            target = history[int(q * (len(history) - 1))]
+            if target >= age + LEONARDO_POLL_MIN_INTERVAL:
+                return target - age
+        if previous is None:
+            return LEONARDO_POLL_INITIAL if not history else LEONARDO_POLL_MIN_INTERVAL
+        # Past the observed percentiles: exponential backoff
+        return min(max(previous * 1.5, LEONARDO_POLL_MIN_INTERVAL), LEONARDO_POLL_MAX_INTERVAL)
+
+    def _resolve(self, generation_id, status, image_url=None, error=None, source='poll'):
+        """Complete or fail the waiter of a generation (aio loop), False when nobody waits on it here"""
+        pending = self._pending.get(generation_id)
+        if pending is None or pending.future.done():
+            return False
+
+        now = asyncio.get_running_loop().time()
+        duration = now - pending.started
+        if source == 'poll':
+            # Completed somewhere since the previous poll: without the midpoint estimate the
+            # percentiles would only ever see the poll times and never move earlier
+            duration = (pending.last_pending + now) / 2 - pending.started
+        LEONARDO_COMPLETIONS.inc(source, status.lower())
+        if status == 'COMPLETE':
+            self.durations.append(duration)
+            pending.future.set_result(image_url)
+        else:
+            pending.future.set_exception(Exception(error or "Generation failed"))
+
+        self.logger.log_info("Leonardo generation resolved", {
+            "generation_id": generation_id,
+            "status": status,
+            "source": source,
+            "polls": pending.polls,
+            "duration_s": round(duration, 2)
+        })
+        return True
+
+    def _ensure_poller(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll_loop())
+        self._wakeup.set()
+
+    async def _poll_loop(self):
+        """One loop for every outstanding generation: due polls, callbacks received by other workers"""
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            self._wakeup.clear()
+            await asyncio.to_thread(self._resolve_stored, list(self._pending))
+
+            now = loop.time()
+            for pending in list(self._pending.values()):
+                if not pending.polling and not pending.future.done() and pending.next_poll <= now:
+                    pending.polling = True
+                    pending.context.run(loop.create_task, self._poll(pending))
+
+            upcoming = [p.next_poll for p in self._pending.values() if not p.polling]
+            timeout = min([STORE_CHECK_INTERVAL] + [max(when - loop.time(), 0) for when in upcoming])
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _resolve_stored(self, generation_ids):
+        """Callbacks stored by any worker for generations waited on here (worker thread)"""
+        if not generation_ids:
+            return
+        placeholders = ",".join("?" * len(generation_ids))
+        rows = self.db.connection().execute(
+            f"SELECT generation_id, status, image_url, error FROM generation_callbacks "
+            f"WHERE generation_id IN ({placeholders})",
+            generation_ids
+        ).fetchall()
+        for row in rows:
+            aio.get_loop().call_soon_threadsafe(
+                self._resolve, row['generation_id'], row['status'], row['image_url'], row['error'], 'webhook'
+            )
+
+    async def _poll(self, pending):
+        loop = asyncio.get_running_loop()
+        try:
+            pending.polls += 1
+            with span("leonardo.poll", 'http', generation_id=pending.generation_id):
+                response = await upstream.call('leonardo', 'poll', lambda: self._get(pending))
+            generation = response.json()["generations_by_pk"]
+            status = generation["status"]
+            if status == "COMPLETE":
+                self._resolve(pending.generation_id, status, generation["generated_images"][0]["url"])
+            elif status == "FAILED":
+                self._resolve(pending.generation_id, status, error=generation.get("error"))
+            else:
+                pending.last_pending = loop.time()
+                pending.last_delay = self._next_delay(loop.time() - pending.started, pending.last_delay)
+                pending.next_poll = loop.time() + pending.last_delay
+        except Exception as e:
+            self.logger.log_error("Leonardo poll failed", {
+                "generation_id": pending.generation_id,
+                "error": str(e),
+                "error_type": type(e).__name__
+            })
+            if not pending.future.done():
+                pending.future.set_exception(e)
+        finally:
+            pending.polling = False
+            self._wakeup.set()
+
+    async def _get(self, pending):
+        response = await aio.http_client().get(
+            self.check_url.format(pending.generation_id), headers=pending.headers, timeout=30
+        )
+        response.raise_for_status()
+        return response
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_generation_tracker():
+    """Process-wide generation tracker"""
+    global _tracker
+
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = GenerationTracker()
+    return _tracker
+
+
+def _reset_after_fork():
+    """Waiters and the poller task belong to the parent's event loop"""
+    global _tracker, _tracker_lock
+    _tracker = None
+    _tracker_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,190 @@
+"""
+Content-addressed store of fusion images.
+
+Images are named after the SHA-256 of their bytes (<root>/<ab>/<sha256>.png),
+so two fusions with the same generated name never overwrite each other and
+the same image is stored once. Files are written to a temporary file in the
+target directory, then renamed: readers see a complete file or none.
+
+Derived variants are built once, in a background thread, after the original
+is stored:
+- thumb: IMAGE_THUMB_SIZE px WebP, for the Pokedex grid
+- webp: full-size WebP
+They need Pillow; without it only originals are served.
+
+Content never changes for a name, so /api/images/<name> serves them with
+the hash as a strong ETag, `Cache-Control: immutable` and Range requests.
+"""
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.config import IMAGE_STORE_DIR, IMAGE_THUMB_SIZE, IMAGE_WEBP_QUALITY
+from utils.logger import AgentLogger
+from utils.metrics import IMAGE_VARIANTS
+
+try:
+    from PIL import Image
+except ImportError:  # variants disabled, originals still stored and served
+    Image = None
+
+ORIGINAL = 'original'
+
+# variant -> (file suffix, mimetype)
+VARIANTS = {
+    ORIGINAL: ('.png', 'image/png'),
+    'thumb': ('.thumb.webp', 'image/webp'),
+    'webp': ('.webp', 'image/webp'),
+}
+
+URL_PREFIX = '/api/images/'
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+_NAME = re.compile(r'^([0-9a-f]{64})(\.thumb\.webp|\.webp|\.png)$')
+
+
+def parse_name(name):
+    """'<sha256>.thumb.webp' -> (digest, variant), None for anything else"""
+    match = _NAME.match(name)
+    if not match:
+        return None
+    suffix = match.group(2)
+    variant = next(variant for variant, (known, _) in VARIANTS.items() if known == suffix)
+    return match.group(1), variant
+
+
+def write_atomic(path, data):
+    """Write bytes to a temporary file in the same directory, then rename it over path"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            os.fchmod(f.fileno(), 0o644)  # mkstemp creates 0600, a front proxy may serve the files
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def image_url(digest, variant=ORIGINAL):
+    return f"{URL_PREFIX}{digest}{VARIANTS[variant][0]}"
+
+
+class ImageStore:
+    """Fusion images on disk, keyed by content hash"""
+
+    def __init__(self, root=IMAGE_STORE_DIR):
+        self.logger = AgentLogger("ImageStore")
+        self.root = os.path.abspath(root)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-variants')
+        self._scheduled = set()  # digests with a derivation queued or running
+        self._lock = threading.Lock()
+        if Image is None:
+            self.logger.log_info("Pillow not installed, thumbnail and WebP variants disabled", {})
+
+    def path(self, digest, variant=ORIGINAL):
+        """File of an image variant, raises ValueError unless digest is a lowercase hex SHA-256"""
+        if not isinstance(digest, str) or not _DIGEST.match(digest):
+            raise ValueError(f"Invalid image digest {digest!r}")
+        return os.path.join(self.root, digest[:2], digest + VARIANTS[variant][0])
+
+    def exists(self, digest, variant=ORIGINAL):
+        """False for digests path() rejects"""
+        try:
+            return os.path.exists(self.path(digest, variant))
+        except ValueError:
+            return False
+
+    def put(self, data):
+        """Store PNG bytes (no-op when already stored), schedule their variants, returns the digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            write_atomic(path, data)
+            self.logger.log_debug("Image stored", {"digest": digest, "size_kb": len(data) / 1024})
+        self.schedule_variants(digest)
+        return digest
+
+    def urls(self, digest):
+        """URL of the original and of each variant that exists or will be derived"""
+        urls = {ORIGINAL: image_url(digest)}
+        if Image is not None:
+            urls.update({variant: image_url(digest, variant) for variant in VARIANTS if variant != ORIGINAL})
+        return urls
+
+    def schedule_variants(self, digest):
+        """Derive the missing variants of an image in the background, once"""
+        if Image is None:
+            return
+        with self._lock:
+            if digest in self._scheduled:
+                return
+            self._scheduled.add(digest)
+        self._executor.submit(self._derive, digest)
+
+    def _derive(self, digest):
+        try:
+            missing = [variant for variant in VARIANTS if variant != ORIGINAL and not self.exists(digest, variant)]
+            if not missing:
+                return
+            with Image.open(self.path(digest)) as source:
+                source.load()
+                for variant in missing:
+                    write_atomic(self.path(digest, variant), self._render(source, variant))
+                    IMAGE_VARIANTS.inc(variant, 'created')
+            self.logger.log_debug("Image variants derived", {"digest": digest, "variants": missing})
+        except Exception as e:
+            IMAGE_VARIANTS.inc('any', 'failed')
+            self.logger.log_error("Image variant derivation failed", {
+                "digest": digest,
+                "error": str(e),
+                "error_type": type(e).__name__
+            })
+        finally:
+            with self._lock:
+                self._scheduled.discard(digest)
+
+    def _render(self, source, variant):
+        transparent = 'A' in source.getbands() or 'transparency' in source.info
+        image = source.convert('RGBA' if transparent else 'RGB')
+        if variant == 'thumb':
+            image.thumbnail((IMAGE_THUMB_SIZE, IMAGE_THUMB_SIZE), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=IMAGE_WEBP_QUALITY, method=4)
+        return buffer.getvalue()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """Process-wide image store"""
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ImageStore()
+    return _store
+
+
+def _reset_after_fork():
+    """The variant thread does not survive fork"""
+    global _store, _store_lock
+    _store = None
+    _store_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,329 @@
+"""
+Persistent background job queue (SQLite) with a local worker pool.
+
+Jobs are rows of a SQLite table (WAL mode), so queued jobs survive restarts
+and several processes can share the same queue: a worker claims a job with an
+atomic UPDATE before running it. Jobs left 'running' by a dead process of
+the same host are put back in the queue when a queue of that host starts.
+
+Handlers may be coroutine functions: their jobs run on the utils.aio event
+loop instead of a worker thread, up to FUSION_ASYNC_JOBS at once, so a few
+worker threads keep many upstream-bound jobs in flight. Their row updates
+(progress, result) go through one writer thread, in order, so SQLite lock
+waits never block the event loop.
+"""
+import asyncio
+import contextvars
+import inspect
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from utils import aio
+from utils.config import FUSION_JOBS_DB, FUSION_WORKERS, FUSION_ASYNC_JOBS, JOB_POLL_INTERVAL
+from utils.logger import AgentLogger, current_request_id
+from utils.sqlite_db import SQLiteDatabase
+from utils.tracing import new_request_id, trace
+
+TERMINAL_STATUSES = ('complete', 'failed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    request_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, created_at);
+"""
+
+
+class JobQueue:
+    """Queue of background jobs processed by a pool of worker threads"""
+
+    def __init__(self, db_file=FUSION_JOBS_DB, workers=FUSION_WORKERS, poll_interval=JOB_POLL_INTERVAL,
+                 async_jobs=FUSION_ASYNC_JOBS):
+        self.logger = AgentLogger("JobQueue")
+        self.db = SQLiteDatabase(db_file, SCHEMA)
+        columns = {row['name'] for row in self.db.connection().execute("PRAGMA table_info(jobs)")}
+        if 'request_id' not in columns:
+            self.db.connection().execute("ALTER TABLE jobs ADD COLUMN request_id TEXT")
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.async_jobs = async_jobs
+        self.worker_id = None
+
+        self._handlers = {}
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._slots = threading.BoundedSemaphore(max(async_jobs, workers))  # one per job in flight
+        self._inflight = set()  # futures of async jobs
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-writer")  # row updates of async jobs
+        self._pid = None
+
+    def register(self, kind, handler):
+        """
+        handler(payload, progress) -> JSON-serializable result; progress(stage, fraction)
+        handler may be a coroutine function (run on the aio loop)
+        """
+        self._handlers[kind] = handler
+
+    def start(self):
+        """Recover orphaned jobs and start the worker threads (no-op when already started in this process)"""
+        if self._pid == os.getpid():
+            return
+        if self._pid is not None:
+            # Forked child: the parent's workers (and its locks) did not survive fork
+            self._wakeup = threading.Condition()
+            self._stopping = threading.Event()
+            self._threads = []
+            self._slots = threading.BoundedSemaphore(max(self.async_jobs, self.workers))
+            self._inflight = set()
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-writer")
+        with self._wakeup:
+            if self._pid == os.getpid():
+                return
+            self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+            self._recover_orphans()
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+        self.logger.log_info("Job queue started", {"workers": self.workers, "db_file": str(self.db.db_file)})
+
+    def shutdown(self, wait=True, timeout=None):
+        """Stop claiming new jobs; with wait, let in-flight jobs finish"""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for thread in self._threads:
+                thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            wait_futures(list(self._inflight), None if deadline is None else max(0.0, deadline - time.monotonic()))
+        self._threads = [t for t in self._threads if t.is_alive()]
+        still_running = len(self._threads) + len(self._inflight)
+        if not still_running:
+            self._pid = None
+        self.logger.log_info("Job queue stopped", {"still_running": still_running})
+
+    def submit(self, kind, payload, priority=0):
+        """Enqueue a job, returns its public view"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, priority, payload, created_at, updated_at, request_id) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, kind, priority, json.dumps(payload), now, now, current_request_id.get())
+            )
+
+        with self._wakeup:
+            self._wakeup.notify()
+
+        self.logger.log_info("Job queued", {"job_id": job_id, "kind": kind})
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Public view of a job, None if unknown"""
+        row = self.db.connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_view(row) if row else None
+
+    def iter_events(self, job_id, timeout=600, interval=0.5):
+        """Yield the job view each time its status/stage/progress changes, until it finishes"""
+        deadline = time.monotonic() + timeout
+        last = None
+        while time.monotonic() < deadline:
+            job = self.get(job_id)
+            if job is None:
+                return
+            state = (job['status'], job['stage'], job['progress'])
+            if state != last:
+                last = state
+                yield job
+            if job['status'] in TERMINAL_STATUSES:
+                return
+            time.sleep(interval)
+
+    def stats(self):
+        """Job counts per status"""
+        rows = self.db.connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _claim(self):
+        """Atomically move the next queued job to 'running' for this worker"""
+        with self.db.transaction(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, updated_at = ? WHERE id = ?",
+                (self.worker_id, now, now, row['id'])
+            )
+            return row
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue  # FUSION_ASYNC_JOBS already in flight
+
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                self.logger.log_error("Job claim failed", str(e))
+                row = None
+
+            if row is None:
+                self._slots.release()
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            if inspect.iscoroutinefunction(self._handlers[row['kind']]):
+                # Hand the job to the loop and go claim the next one
+                future = aio.submit(self._arun(row))
+                self._inflight.add(future)
+                future.add_done_callback(self._async_done)
+                continue
+
+            try:
+                self._run(row)
+            finally:
+                self._slots.release()
+
+    def _run(self, row):
+        # The job trace carries the id of the request that queued it
+        with self._trace(row):
+            progress = self._started(row)
+            try:
+                result = self._handlers[row['kind']](json.loads(row['payload']), progress)
+                self._completed(row['id'], result)
+            except Exception as e:
+                self._failed(row['id'], e)
+
+    async def _arun(self, row):
+        with self._trace(row):
+            progress = self._started(row, self._write)
+            try:
+                result = await self._handlers[row['kind']](json.loads(row['payload']), progress)
+                await asyncio.wrap_future(self._write(self._completed, row['id'], result))
+            except Exception as e:
+                await asyncio.wrap_future(self._write(self._failed, row['id'], e))
+
+    def _write(self, fn, *args, **kwargs):
+        """Run a row update on the writer thread (after the ones already submitted), returns its future"""
+        return self._writer.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def _async_done(self, future):
+        self._inflight.discard(future)
+        self._slots.release()
+
+    def _trace(self, row):
+        return trace(row['request_id'] or new_request_id(), f"job.{row['kind']}", 'job', job_id=row['id'])
+
+    def _started(self, row, write=None):
+        """
+        Log the start, returns the progress callback of the job.
+        With write (async jobs), updates are handed to it instead of waiting for SQLite.
+        """
+        job_id = row['id']
+        self.logger.log_info("Job started", {"job_id": job_id, "kind": row['kind']})
+
+        def report(future):
+            if future.exception():
+                self.logger.log_error("Job progress update failed", {"job_id": job_id, "error": str(future.exception())})
+
+        def progress(stage, fraction):
+            if write:
+                write(self._update, job_id, stage=stage, progress=fraction).add_done_callback(report)
+            else:
+                self._update(job_id, stage=stage, progress=fraction)
+        return progress
+
+    def _completed(self, job_id, result):
+        self._update(job_id, status='complete', progress=1.0, result=json.dumps(result), finished_at=time.time())
+        self.logger.log_success("Job completed", {"job_id": job_id})
+
+    def _failed(self, job_id, error):
+        self._update(job_id, status='failed', error=str(error), finished_at=time.time())
+        self.logger.log_error("Job failed", {"job_id": job_id, "error": str(error)})
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.db.transaction() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _recover_orphans(self):
+        """
+        Requeue jobs left 'running' by processes of this host that are gone.
+        Jobs of other hosts sharing the database are left alone (their liveness
+        cannot be checked from here), their own queues recover them on restart.
+        """
+        host = socket.gethostname()
+        with self.db.transaction(immediate=True) as conn:
+            rows = conn.execute("SELECT id, worker FROM jobs WHERE status = 'running'").fetchall()
+            requeued = 0
+            for row in rows:
+                worker_host, _, pid = (row['worker'] or '').rpartition(':')
+                if worker_host != host or not pid.isdigit():
+                    continue
+                # Jobs under our own pid predate this start (pid reused after a restart)
+                if int(pid) != os.getpid() and _pid_alive(int(pid)):
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, updated_at = ? WHERE id = ?",
+                    (time.time(), row['id'])
+                )
+                requeued += 1
+        if requeued:
+            self.logger.log_info("Orphaned jobs requeued", {"count": requeued})
+
+    def _to_view(self, row):
+        return {
+            'job_id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'stage': row['stage'],
+            'progress': row['progress'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'request_id': row['request_id'],
+        }
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
@@ -1,57 +1,386 @@
+"""
+Structured JSON logging for agents and tools.
+
+Log calls never touch the disk: AgentLogger checks the level first (disabled
+levels cost one comparison, and data may be a callable only evaluated when the
+level is enabled), then hands the record to a bounded queue, a dict data
+shallow-copied so later changes by the caller do not leak into it. A
+background writer thread serializes queued records, appends them to LOG_FILE
+in batches and echoes them to stdout when LOG_STDOUT is set. When the queue is full new
+records are dropped and counted instead of blocking the caller.
+
+The log file rotates by size (LOG_MAX_BYTES) and age (LOG_MAX_AGE_SECONDS),
+keeping LOG_BACKUP_COUNT segments, gzipped when LOG_COMPRESS is set. Each
+logger name gets exactly one pipeline handler per process, however many
+AgentLogger instances use it. Agent loggers live under their own "agents."
+namespace and do not propagate, so Flask's and libraries' loggers never reach
+the pipeline (and agent records do not reach theirs).
+
+Every log call, enabled level or not, also counts in the
+pokedex_log_records_total metric (per agent and level).
+"""
+import atexit
+import contextvars
+import gzip
 import json
 import logging
+import os
+import queue
+import sys
+import shutil
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
+from utils.config import (
+    LOG_LEVEL, LOG_FILE, LOG_STDOUT,
+    LOG_QUEUE_SIZE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL,
+    LOG_MAX_BYTES, LOG_MAX_AGE_SECONDS, LOG_BACKUP_COUNT, LOG_COMPRESS
+)
+from utils.metrics import LOG_RECORDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation is not coordinated between processes
+    fcntl = None
+
+# Request id of the current API request / job (set by utils.tracing)
+current_request_id = contextvars.ContextVar('request_id', default=None)
+
+# AgentLogger levels -> logging levels (SUCCESS is an INFO record)
+LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "SUCCESS": logging.INFO,
+    "ERROR": logging.ERROR,
+}
+
+
+class RotatingLogFile:
+    """
+    Append-only log file rotated by size and age: agents.log -> agents.log.1[.gz] -> ...
+    Rotation takes an flock on a sibling .lock file so processes sharing the file rotate it once.
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, max_age=LOG_MAX_AGE_SECONDS,
+                 backup_count=LOG_BACKUP_COUNT, compress=LOG_COMPRESS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self.compress = compress
+        self.lock_file = self.path.with_name(self.path.name + '.lock')
+        self.segment_start = self._first_timestamp()
+
+    def write(self, text):
+        if self._should_rotate(len(text)):
+            self._rotate()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(text)
+
+    def _should_rotate(self, incoming):
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            self.segment_start = time.time()
+            return False
+        if not size:
+            return False
+        if self.max_bytes and size + incoming > self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self.segment_start >= self.max_age
+
+    def _rotate(self):
+        with open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another process may have rotated while we waited for the lock
+                self.segment_start = self._first_timestamp()
+                if self._should_rotate(0):
+                    self._shift_backups()
+                    self.segment_start = time.time()
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _shift_backups(self):
+        suffix = '.gz' if self.compress else ''
+
+        def backup(index, ext=suffix):
+            return self.path.with_name(f"{self.path.name}.{index}{ext}")
+
+        if self.backup_count < 1:
+            self.path.unlink()
+            return
+
+        for ext in ('', '.gz'):
+            oldest = backup(self.backup_count, ext)
+            if oldest.exists():
+                oldest.unlink()
+        for index in range(self.backup_count - 1, 0, -1):
+            for ext in ('', '.gz'):
+                if backup(index, ext).exists():
+                    os.replace(backup(index, ext), backup(index + 1, ext))
+
+        os.replace(self.path, backup(1, ''))
+        if self.compress:
+            with open(backup(1, ''), 'rb') as src, gzip.open(backup(1, '.gz'), 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            backup(1, '').unlink()
+
+    def _first_timestamp(self):
+        """Start of the current segment: timestamp of its first record"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                first = f.readline()
+            return datetime.fromisoformat(json.loads(first)['timestamp']).timestamp()
+        except Exception:
+            return time.time()
+
+
+class LogPipeline:
+    """Bounded queue of log records drained by a background writer thread"""
+
+    def __init__(self, log_file=LOG_FILE, stdout=LOG_STDOUT, max_size=LOG_QUEUE_SIZE,
+                 batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL, serialize=None, echo=None):
+        self.output = RotatingLogFile(log_file)
+        self.serialize = serialize or _serialize
+        self.echo = echo or _echo
+        self.stdout = stdout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.queue = queue.Queue(max_size)
+        self.written = 0
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, record):
+        """Enqueue a record without blocking, False when it was dropped"""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self, timeout=5.0):
+        """Wait until records queued so far are written"""
+        if self._thread is None or self._pid != os.getpid():
+            return False
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    def _ensure_started(self):
+        # Also restarts the writer in a forked child, threads do not survive fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self.queue = queue.Queue(self.queue.maxsize)
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        markers = [item for item in batch if isinstance(item, threading.Event)]
+        records = [item for item in batch if not isinstance(item, threading.Event)]
+
+        if self.dropped != self._reported_dropped and self.serialize is _serialize:
+            records.append(self._dropped_record())
+
+        try:
+            # One record that cannot be serialized is reported and skipped, its neighbours are still written
+            lines = []
+            for record in records:
+                try:
+                    lines.append(self.serialize(record))
+                except Exception as e:
+                    print(f"✗ Log record skipped - ERROR: {e}", file=sys.stderr)
+            if lines:
+                self.output.write("\n".join(lines) + "\n")
+                self.written += len(lines)
+            if self.stdout and records:
+                echo = [line for line in (self._echo_line(record) for record in records) if line]
+                if echo:
+                    sys.stdout.write("\n".join(echo) + "\n")
+                    sys.stdout.flush()
+        except Exception as e:
+            print(f"✗ Log write failed - ERROR: {e}", file=sys.stderr)
+        finally:
+            for marker in markers:
+                marker.set()
+
+    def _echo_line(self, record):
+        try:
+            return self.echo(record)
+        except Exception:
+            return None
+
+    def _dropped_record(self):
+        dropped, self._reported_dropped = self.dropped, self.dropped
+        record = logging.LogRecord("AgentLogger", logging.ERROR, __file__, 0, "Log records dropped", None, None)
+        record.agent = "AgentLogger"
+        record.level_name = "ERROR"
+        record.data = {"error": f"log queue full, {dropped} records dropped so far"}
+        return record
+
+
+def _serialize(record):
+    """Same JSON line as the synchronous logger wrote, plus the request id when there is one"""
+    entry = {
+        "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+        "agent": getattr(record, 'agent', record.name),
+        "level": getattr(record, 'level_name', record.levelname),
+        "message": record.getMessage(),
+        "data": getattr(record, 'data', None)
+    }
+    if getattr(record, 'request_id', None):
+        entry["request_id"] = record.request_id
+    return json.dumps(entry, default=str)
+
+
+def _echo(record):
+    level = getattr(record, 'level_name', record.levelname)
+    data = getattr(record, 'data', None)
+    if level == "ERROR":
+        error = data.get('error') if isinstance(data, dict) else data
+        return f"✗ {record.getMessage()} - ERROR: {error}"
+    if level in ("INFO", "SUCCESS"):
+        return f"✓ {record.getMessage()} - {data}"
+    return None
+
+
+class _PipelineHandler(logging.Handler):
+    """Hands records to the pipeline as is (formatting happens on the writer thread)"""
+
+    agent_pipeline = True
+
+    def __init__(self, pipeline):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def emit(self, record):
+        self.pipeline.submit(record)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_log_pipeline():
+    """Process-wide log pipeline"""
+    global _pipeline
+
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = LogPipeline()
+                atexit.register(_pipeline.flush)
+    return _pipeline
+
+
+LOGGER_NAMESPACE = "agents"
+
+_attached = set()
+_attach_lock = threading.Lock()
+
+
+def attach_logger(name):
+    """
+    Logger "agents.<name>" with exactly one pipeline handler, whatever the number
+    of calls (process-wide registry). Kept apart from the application and library
+    loggers (Flask's app.logger is named after the module) and not propagated.
+    """
+    logger = logging.getLogger(f"{LOGGER_NAMESPACE}.{name}")
+    if name in _attached:
+        return logger
+
+    with _attach_lock:
+        if name not in _attached:
+            logger.setLevel(LOG_LEVEL)
+            logger.propagate = False
+            # Also drops handlers left by an earlier import of this module (reloads)
+            for handler in list(logger.handlers):
+                if getattr(handler, 'agent_pipeline', False):
+                    logger.removeHandler(handler)
+
+            handler = _PipelineHandler(get_log_pipeline())
+            handler.setLevel(LOG_LEVEL)
+            logger.addHandler(handler)
+            _attached.add(name)
+    return logger
+
 
 class AgentLogger:
     def __init__(self, agent_name):
         self.agent_name = agent_name
-        self.log_file = Path(__file__).parent.parent / "logs" / "agents.log"
-        self.log_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Setup logger
-        self.logger = logging.getLogger(agent_name)
-        self.logger.setLevel(logging.INFO)
-        
-        # File handler
-        handler = logging.FileHandler(self.log_file)
-        handler.setLevel(logging.INFO)
-        
-        # Formatter
-        formatter = logging.Formatter('%(message)s')
-        handler.setFormatter(formatter)
-        
-        self.logger.addHandler(handler)
-    
-    def _build_log(self, level, message, data):
-        """Build JSON log entry"""
-        return json.dumps({
-            "timestamp": datetime.now().isoformat(),
+        self.logger = attach_logger(agent_name)
+
+    def _log(self, level, message, data):
+        """Level-gated: data (a value or a callable returning it) is only built when the level is enabled"""
+        LOG_RECORDS.inc(self.agent_name, level)
+        if not self.logger.isEnabledFor(LEVELS[level]):
+            return
+        if callable(data):
+            data = data()
+        elif isinstance(data, dict):
+            # Serialized later by the writer thread: a caller mutating its dict after the call must not change the record
+            data = dict(data)
+        # makeRecord + handle skips the caller stack walk of Logger.log
+        record = self.logger.makeRecord(self.agent_name, LEVELS[level], "(agent)", 0, message, None, None, extra={
             "agent": self.agent_name,
-            "level": level,
-            "message": message,
-            "data": data
+            "level_name": level,
+            "data": data,
+            "request_id": current_request_id.get()
         })
-    
+        self.logger.handle(record)
+
     def log_info(self, message, data):
         """Log info level"""
-        log_entry = self._build_log("INFO", message, data)
-        self.logger.info(log_entry)
-        print(f"✓ {message} - {data}")
-    
+        self._log("INFO", message, data)
+
     def log_success(self, message, data):
         """Log success"""
-        log_entry = self._build_log("SUCCESS", message, data)
-        self.logger.info(log_entry)
-        print(f"✓ {message} - {data}")
-    
+        self._log("SUCCESS", message, data)
+
     def log_error(self, message, error):
         """Log error level"""
-        log_entry = self._build_log("ERROR", message, {"error": str(error)})
-        self.logger.error(log_entry)
-        print(f"✗ {message} - ERROR: {error}")
-    
+        self._log("ERROR", message, {"error": str(error)})
+
     def log_debug(self, message, data):
         """Log debug level"""
-        log_entry = self._build_log("DEBUG", message, data)
-        self.logger.debug(log_entry)
+        self._log("DEBUG", message, data)
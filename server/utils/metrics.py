@@ -0,0 +1,217 @@
+"""
+In-process metrics registry, exposed in Prometheus text format by /api/metrics.
+
+Counters and histograms are plain dicts keyed by label values behind one
+uncontended lock per metric (no I/O, no allocation beyond the label tuple),
+so request handlers, tools and AgentLogger can update them on the hot path.
+Values that already live elsewhere (cache counters, Pokedex size, queue
+depth) are read at scrape time through collector callbacks.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+POLL_BUCKETS = (1, 2, 3, 5, 8, 12, 20, 30, 45, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.type = "counter"
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labels, values), value) for values, value in items]
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, *label_values)
+
+    def samples(self):
+        with self._lock:
+            items = [(values, list(state)) for values, state in self._values.items()]
+        samples = []
+        for values, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state[:len(self.buckets)] + [0]):
+                cumulative += count
+                if bound == math.inf:
+                    cumulative = state[-1]
+                samples.append((f"{self.name}_bucket", _format_labels(self.labels, values, [("le", _format_value(bound))]), cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labels, values), state[-2]))
+            samples.append((f"{self.name}_count", _format_labels(self.labels, values), state[-1]))
+        return samples
+
+
+class Gauge:
+    """Value read at scrape time: fn() returns a number or {label values tuple: number}"""
+
+    def __init__(self, name, help_text, fn, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.type = "gauge"
+        self.fn = fn
+
+    def samples(self):
+        value = self.fn()
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, _format_labels(self.labels, values), v) for values, v in value.items()]
+        return [(self.name, "", value)]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric (replacing one with the same name, e.g. a collector registered again)"""
+        with self._lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, fn, labels=()):
+        return self.register(Gauge(name, help_text, fn, labels))
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                lines.append(f"# {metric.name} collection failed: {_escape(e)}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "pokedex_http_requests_total", "API requests by route, method and status", ("route", "method", "status"))
+HTTP_LATENCY = registry.histogram(
+    "pokedex_http_request_duration_seconds", "API request latency by route", ("route",))
+
+UPSTREAM_CALLS = registry.counter(
+    "pokedex_upstream_requests_total", "Outbound calls by provider and operation", ("provider", "operation"))
+UPSTREAM_ERRORS = registry.counter(
+    "pokedex_upstream_errors_total", "Failed outbound calls by provider and operation", ("provider", "operation"))
+UPSTREAM_LATENCY = registry.histogram(
+    "pokedex_upstream_request_duration_seconds", "Outbound call latency by provider", ("provider", "operation"))
+UPSTREAM_RETRIES = registry.counter(
+    "pokedex_upstream_retries_total", "Retried outbound calls by provider, operation and reason", ("provider", "operation", "reason"))
+UPSTREAM_QUEUE_WAIT = registry.histogram(
+    "pokedex_upstream_queue_seconds", "Time outbound calls waited for a rate limit token or slot", ("provider",))
+
+CACHE_REQUESTS = registry.counter(
+    "pokedex_cache_requests_total", "Cache lookups by cache and result (hit, miss)", ("cache", "result"))
+
+LEONARDO_POLLS = registry.histogram(
+    "pokedex_leonardo_poll_iterations", "Status polls per Leonardo generation", buckets=POLL_BUCKETS)
+LEONARDO_COMPLETIONS = registry.counter(
+    "pokedex_leonardo_generations_total", "Leonardo generations resolved by source (webhook, poll) and status", ("source", "status"))
+
+IMAGE_VARIANTS = registry.counter(
+    "pokedex_image_variants_total", "Derived fusion image variants by variant and outcome (created, failed)", ("variant", "outcome"))
+
+LOG_RECORDS = registry.counter(
+    "pokedex_log_records_total", "AgentLogger records by agent and level", ("agent", "level"))
+
+
+def _cache_hit_ratios():
+    ratios = {}
+    caches = {values[0] for values in CACHE_REQUESTS._values}
+    for cache in caches:
+        hits = CACHE_REQUESTS.value(cache, "hit")
+        total = hits + CACHE_REQUESTS.value(cache, "miss")
+        if total:
+            ratios[(cache,)] = hits / total
+    return ratios
+
+
+registry.gauge("pokedex_cache_hit_ratio", "Hit ratio per cache since start", _cache_hit_ratios, ("cache",))
+
+
+@contextmanager
+def observe_upstream(provider, operation):
+    """Count and time an outbound call (errors counted when the block raises)"""
+    UPSTREAM_CALLS.inc(provider, operation)
+    start = time.monotonic()
+    try:
+        yield
+    except BaseException:
+        UPSTREAM_ERRORS.inc(provider, operation)
+        raise
+    finally:
+        UPSTREAM_LATENCY.observe(time.monotonic() - start, provider, operation)
@@ -0,0 +1,69 @@
+import asyncio
+import inspect
+import time
+from utils.tracing import span
+
+
+class StageGraph:
+    """
+    Small dependency graph of pipeline stages
+    Each stage starts as soon as all its dependencies are done, receiving their
+    results as positional arguments (in declared order). Stages are coroutine
+    functions (awaited concurrently on the running loop) or plain callables
+    (short CPU work, run inline).
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, fn, deps=()):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = (fn, tuple(deps))
+        return self
+
+    async def run(self, on_stage_done=None):
+        """
+        Run every stage, returns (results, timings)
+        timings[name] = {"start_ms", "duration_ms"} relative to the graph start.
+        The first failing stage error is raised once running stages are cancelled.
+        """
+        started = time.monotonic()
+        results = {}
+        timings = {}
+        running = {}
+        pending = dict(self.stages)
+
+        async def timed(name, fn, deps):
+            stage_start = time.monotonic()
+            try:
+                with span(f"stage.{name}", 'stage'):
+                    result = fn(*(results[dep] for dep in deps))
+                    if inspect.isawaitable(result):
+                        result = await result
+                    return result
+            finally:
+                timings[name] = {
+                    "start_ms": round((stage_start - started) * 1000, 1),
+                    "duration_ms": round((time.monotonic() - stage_start) * 1000, 1)
+                }
+
+        try:
+            while pending or running:
+                for name, (fn, deps) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        del pending[name]
+                        running[asyncio.ensure_future(timed(name, fn, deps))] = name
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    results[name] = task.result()  # raises the stage error
+                    if on_stage_done:
+                        on_stage_done(name, len(results) / len(self.stages))
+        finally:
+            for task in running:
+                task.cancel()
+
+        return results, timings
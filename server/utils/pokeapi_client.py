@@ -0,0 +1,175 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import httpx
+from utils import aio, upstream
+from utils.catalog import build_species_entry
+from utils.config import POKEAPI_BASE, POKEAPI_POOL_SIZE, POKEAPI_CACHE_SIZE, POKEAPI_CACHE_TTL
+from utils.logger import AgentLogger
+from utils.metrics import CACHE_REQUESTS
+from utils.tracing import span
+
+
+class PokeApiClient:
+    """
+    Shared PokeAPI client
+    - Async keep-alive connection pool (httpx) on the utils.aio loop, sync methods wrap it
+    - LRU + TTL response cache keyed by URL
+    - Concurrent identical requests coalesced into a single upstream fetch
+    - Upstream fetches rate limited and retried by the utils.upstream scheduler
+    """
+
+    def __init__(self, base_url=POKEAPI_BASE, pool_size=POKEAPI_POOL_SIZE,
+                 cache_size=POKEAPI_CACHE_SIZE, cache_ttl=POKEAPI_CACHE_TTL):
+        self.logger = AgentLogger("PokeApiClient")
+        self.base_url = base_url
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+
+        # Used from the aio loop only
+        self.http = httpx.AsyncClient(limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size))
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # url -> (expires_at, payload)
+        self._inflight = {}  # url -> Future shared by coalesced callers
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def get_json(self, url, timeout=10):
+        """GET a JSON payload through the cache. Returned payloads are shared: do not mutate."""
+        with self._lock:
+            payload = self._cached(url)
+        if payload is not None:
+            return payload
+        return aio.run(self.aget_json(url, timeout))
+
+    async def aget_json(self, url, timeout=10):
+        """Async get_json"""
+        with self._lock:
+            payload = self._cached(url)
+            if payload is not None:
+                return payload
+
+            pending = self._inflight.get(url)
+            if pending is not None:
+                self.coalesced += 1
+                CACHE_REQUESTS.inc('pokeapi', 'hit')
+                is_leader = False
+            else:
+                pending = Future()
+                self._inflight[url] = pending
+                self.misses += 1
+                CACHE_REQUESTS.inc('pokeapi', 'miss')
+                is_leader = True
+
+        if not is_leader:
+            # shield: a waiter timing out must not cancel the leader's shared future
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(pending)), timeout)
+
+        async def send():
+            response = await self.http.get(url, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            # Rate limited and retried by the pokeapi scheduler
+            with span("pokeapi.get", 'http', url=url):
+                payload = await upstream.call('pokeapi', 'get', send)
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                self._inflight.pop(url, None)
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            self._cache[url] = (time.monotonic() + self.cache_ttl, payload)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self._inflight.pop(url, None)
+
+        pending.set_result(payload)
+        return payload
+
+    def _cached(self, url):
+        """Fresh cached payload or None (call with the lock held)"""
+        cached = self._cache.get(url)
+        if cached is None:
+            return None
+        if cached[0] <= time.monotonic():
+            del self._cache[url]
+            return None
+        self._cache.move_to_end(url)
+        self.hits += 1
+        CACHE_REQUESTS.inc('pokeapi', 'hit')
+        return cached[1]
+
+    def list_pokemon(self, limit, offset=0, timeout=10):
+        """List pokemon references ({name, url})"""
+        return self.get_json(f"{self.base_url}/pokemon?limit={limit}&offset={offset}", timeout=timeout)['results']
+
+    def fetch_pokemon(self, pokemon_id, timeout=10):
+        """Fetch pokemon + species and build a catalog-shaped entry (French name when available)"""
+        return aio.run(self.afetch_pokemon(pokemon_id, timeout))
+
+    async def afetch_pokemon(self, pokemon_id, timeout=10):
+        """Async fetch_pokemon"""
+        data = await self.aget_json(f"{self.base_url}/pokemon/{pokemon_id}", timeout=timeout)
+
+        try:
+            species_data = await self.aget_json(data['species']['url'], timeout=timeout)
+        except Exception as e:
+            self.logger.log_debug("Could not fetch French name", {"error": str(e)})
+            species_data = None
+
+        return build_species_entry(data, species_data)
+
+    def stats(self):
+        """Cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "size": len(self._cache),
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._cache.clear()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_pokeapi_client():
+    """Process-wide PokeApiClient shared by agents and tools"""
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PokeApiClient()
+    return _client
+
+
+def _reset_after_fork():
+    """A forked worker builds its own client: pooled sockets and in-flight futures belong to the parent"""
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
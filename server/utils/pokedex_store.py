@@ -0,0 +1,527 @@
+"""
+Pokedex storage backends.
+
+SqlitePokedexStore (default) keeps one row per fusion in a WAL-mode SQLite
+file, indexed on the fusion id and both parent ids, so inserts and lookups
+do not depend on the collection size and concurrent writers never lose
+entries. On first start it imports the legacy fused_pokemons.json, then
+keeps that file only as an export (the frontend pages through
+/api/pokedex), rewritten in the background (debounced) after writes.
+
+JsonPokedexStore is the legacy single-file layout, every write rewrites the
+whole file.
+
+Listings are filtered and sorted by a PokedexQuery and paginated with opaque
+keyset cursors (last sort value + fusion id), so a page costs the same at
+any depth.
+"""
+import atexit
+import base64
+import binascii
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from utils.config import (
+    POKEDEX_BACKEND, POKEDEX_DB_FILE, POKEDEX_JSON_FILE,
+    POKEDEX_JSON_EXPORT, POKEDEX_EXPORT_DELAY
+)
+from utils.logger import AgentLogger
+from utils.sqlite_db import SQLiteDatabase
+
+try:
+    import fcntl
+except ImportError:  # Windows: exports are not serialized between processes
+    fcntl = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fusions (
+    id TEXT PRIMARY KEY,
+    parent1_id INTEGER,
+    parent2_id INTEGER,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    stat_total INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_fusions_parent1 ON fusions (parent1_id);
+CREATE INDEX IF NOT EXISTS idx_fusions_parent2 ON fusions (parent2_id);
+CREATE TABLE IF NOT EXISTS fusion_types (
+    type TEXT NOT NULL,
+    fusion_id TEXT NOT NULL,
+    PRIMARY KEY (type, fusion_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Sort indexes (created after the columns are upgraded on older databases)
+SORT_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_fusions_created ON fusions (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_fusions_name ON fusions (name, id);
+CREATE INDEX IF NOT EXISTS idx_fusions_stat_total ON fusions (stat_total, id);
+CREATE INDEX IF NOT EXISTS idx_fusion_types_fusion ON fusion_types (fusion_id);
+"""
+
+# Sort key -> fusions column (ties broken by fusion id)
+SORT_COLUMNS = {
+    'created': 'created_at',
+    'id': 'id',
+    'name': 'name',
+    'stat_total': 'stat_total',
+}
+
+EXPORT_CHUNK = 500  # rows per keyset page when streaming the whole pokedex
+
+
+def parent_ids(fusion_id):
+    """'25-4' -> (25, 4), None for parts that are not ids"""
+    first, _, second = str(fusion_id).partition('-')
+    return (
+        int(first) if first.isdigit() else None,
+        int(second) if second.isdigit() else None
+    )
+
+
+def stat_total(entry):
+    """Sum of the entry base stats"""
+    return int(sum(v for v in (entry.get('stats') or {}).values() if isinstance(v, (int, float))))
+
+
+def entry_types(entry):
+    return sorted({str(t).lower() for t in entry.get('types') or []})
+
+
+def write_json_export(path, entries):
+    """
+    Stream entries to path as the legacy {id: entry} JSON (indent=2), atomically.
+    Every process writes its own temporary file, and exports are serialized by an
+    flock on a sibling .lock file so the last export to finish reflects the latest entries.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + '.lock'), 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+            try:
+                count = 0
+                with os.fdopen(fd, 'w') as f:
+                    os.fchmod(f.fileno(), 0o644)  # mkstemp creates 0600, the export is read by other users
+                    f.write('{')
+                    for entry in entries:
+                        body = json.dumps(entry, indent=2).replace('\n', '\n  ')
+                        f.write(f"{',' if count else ''}\n  {json.dumps(entry['id'])}: {body}")
+                        count += 1
+                    f.write('\n}' if count else '}')
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return count
+
+
+class PokedexQuery:
+    """Filters and sort order of a pokedex listing, raises ValueError on invalid values"""
+
+    def __init__(self, types=None, parent_id=None, min_stat_total=None, max_stat_total=None,
+                 sort='created', order='asc'):
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort '{sort}' (expected one of {', '.join(SORT_COLUMNS)})")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Unknown order '{order}' (expected 'asc' or 'desc')")
+        self.types = sorted({t.lower() for t in types or [] if t})
+        self.parent_id = None if parent_id is None else int(parent_id)
+        self.min_stat_total = None if min_stat_total is None else int(min_stat_total)
+        self.max_stat_total = None if max_stat_total is None else int(max_stat_total)
+        self.sort = sort
+        self.order = order
+
+    def matches(self, entry):
+        """Python side of the filters (JSON backend)"""
+        if self.types and not set(self.types) <= set(entry_types(entry)):
+            return False
+        if self.parent_id is not None and self.parent_id not in parent_ids(entry['id']):
+            return False
+        total = stat_total(entry)
+        if self.min_stat_total is not None and total < self.min_stat_total:
+            return False
+        if self.max_stat_total is not None and total > self.max_stat_total:
+            return False
+        return True
+
+    def sort_value(self, entry, created_at=None):
+        if self.sort == 'created':
+            return created_at
+        if self.sort == 'stat_total':
+            return stat_total(entry)
+        return str(entry.get(self.sort) or '')
+
+    def encode_cursor(self, value, fusion_id):
+        raw = json.dumps([self.sort, self.order, value, fusion_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Cursor -> (sort value, fusion id), it must come from the same sort and order"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            sort, order, value, fusion_id = json.loads(raw)
+        except (binascii.Error, ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+        if (sort, order) != (self.sort, self.order):
+            raise ValueError("Cursor was issued for another sort order")
+        return value, fusion_id
+
+
+class PokedexStore(ABC):
+    """Storage backend interface, entries are the dicts built by AddPokedexEntry"""
+
+    @abstractmethod
+    def upsert(self, entry):
+        """Insert or replace the entry with the same id"""
+
+    def upsert_many(self, entries):
+        """upsert of several entries, one write where the backend allows it"""
+        for entry in entries:
+            self.upsert(entry)
+
+    @abstractmethod
+    def get(self, fusion_id):
+        """Entry by fusion id, None if unknown"""
+
+    @abstractmethod
+    def iter_entries(self, query=None):
+        """Every entry matching query (insertion order by default), streamed"""
+
+    @abstractmethod
+    def page(self, query=None, limit=50, cursor=None):
+        """One page of entries matching query: {'items', 'next_cursor'}"""
+
+    @abstractmethod
+    def count(self):
+        """Number of entries"""
+
+    def flush(self):
+        """Write anything pending (exports), no-op by default"""
+
+
+class JsonPokedexStore(PokedexStore):
+    """Legacy backend: the whole pokedex in one JSON file"""
+
+    def __init__(self, json_file=POKEDEX_JSON_FILE):
+        self.logger = AgentLogger("JsonPokedexStore")
+        self.json_file = Path(json_file)
+        self.json_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def upsert(self, entry):
+        self.upsert_many([entry])
+
+    def upsert_many(self, entries):
+        with self._lock:
+            pokemons = self._load()
+            for entry in entries:
+                pokemons[entry['id']] = entry
+            write_json_export(self.json_file, pokemons.values())
+            self.logger.log_debug("DB saved", {"entries": len(pokemons)})
+
+    def get(self, fusion_id):
+        return self._load().get(fusion_id)
+
+    def iter_entries(self, query=None):
+        return iter(self._sorted(query or PokedexQuery()))
+
+    def page(self, query=None, limit=50, cursor=None):
+        query = query or PokedexQuery()
+        keyed = self._sorted(query, with_keys=True)
+        if cursor:
+            after = tuple(query.decode_cursor(cursor))
+            if query.order == 'asc':
+                keyed = [item for item in keyed if item[0] > after]
+            else:
+                keyed = [item for item in keyed if item[0] < after]
+
+        items = keyed[:limit]
+        next_cursor = None
+        if len(keyed) > limit:
+            next_cursor = query.encode_cursor(*items[-1][0])
+        return {'items': [entry for _, entry in items], 'next_cursor': next_cursor}
+
+    def count(self):
+        return len(self._load())
+
+    def _sorted(self, query, with_keys=False):
+        """Matching entries sorted by (sort value, id), file position stands for creation time"""
+        keyed = [
+            ((query.sort_value(entry, position), entry['id']), entry)
+            for position, entry in enumerate(self._load().values())
+            if query.matches(entry)
+        ]
+        keyed.sort(key=lambda item: item[0], reverse=query.order == 'desc')
+        return keyed if with_keys else [entry for _, entry in keyed]
+
+    def _load(self):
+        try:
+            if self.json_file.exists():
+                with open(self.json_file, 'r') as f:
+                    return json.load(f)
+            return {}
+        except Exception as e:
+            self.logger.log_error("Load DB failed", str(e))
+            return {}
+
+
+class SqlitePokedexStore(PokedexStore):
+    """Indexed backend: one SQLite row per fusion, optional JSON export"""
+
+    def __init__(self, db_file=POKEDEX_DB_FILE, json_file=POKEDEX_JSON_FILE,
+                 json_export=POKEDEX_JSON_EXPORT, export_delay=POKEDEX_EXPORT_DELAY):
+        self.logger = AgentLogger("SqlitePokedexStore")
+        self.db = SQLiteDatabase(db_file, SCHEMA)
+        self.json_file = Path(json_file) if json_file else None
+        self.json_export = json_export and self.json_file is not None
+        self.export_delay = export_delay
+
+        self._export_lock = threading.Lock()
+        self._export_timer = None
+
+        self._upgrade_schema()
+        self._migrate_json()
+
+    def upsert(self, entry):
+        self.upsert_many([entry])
+
+    def upsert_many(self, entries):
+        """Upsert several entries in one transaction"""
+        with self.db.transaction(immediate=True) as conn:
+            self._write(conn, entries, time.time())
+        self._schedule_export()
+
+    def get(self, fusion_id):
+        row = self.db.connection().execute("SELECT data FROM fusions WHERE id = ?", (fusion_id,)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def iter_entries(self, query=None):
+        """Streams matching entries page by page, keeping read transactions short"""
+        if query is None:
+            # Upserts keep the rowid, so this is the legacy dict order
+            last = 0
+            while True:
+                rows = self.db.connection().execute(
+                    "SELECT rowid, data FROM fusions WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, EXPORT_CHUNK)
+                ).fetchall()
+                for row in rows:
+                    yield json.loads(row['data'])
+                if len(rows) < EXPORT_CHUNK:
+                    return
+                last = rows[-1]['rowid']
+
+        cursor = None
+        while True:
+            result = self.page(query, EXPORT_CHUNK, cursor)
+            yield from result['items']
+            cursor = result['next_cursor']
+            if cursor is None:
+                return
+
+    def page(self, query=None, limit=50, cursor=None):
+        query = query or PokedexQuery()
+        column = SORT_COLUMNS[query.sort]
+        direction = 'ASC' if query.order == 'asc' else 'DESC'
+        where, params = self._filters(query)
+
+        if cursor:
+            value, fusion_id = query.decode_cursor(cursor)
+            op = '>' if query.order == 'asc' else '<'
+            where.append(f"({column} {op} ? OR ({column} = ? AND id {op} ?))")
+            params += [value, value, fusion_id]
+
+        rows = self.db.connection().execute(
+            f"SELECT id, data, {column} AS sort_value FROM fusions "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+            f"ORDER BY {column} {direction}, id {direction} LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = query.encode_cursor(rows[-1]['sort_value'], rows[-1]['id'])
+        return {'items': [json.loads(row['data']) for row in rows], 'next_cursor': next_cursor}
+
+    def count(self):
+        return self.db.connection().execute("SELECT COUNT(*) FROM fusions").fetchone()[0]
+
+    def by_parent(self, pokemon_id):
+        """Entries having pokemon_id as one of their parents"""
+        return list(self.iter_entries(PokedexQuery(parent_id=pokemon_id)))
+
+    def export_json(self, path=None):
+        """Rewrite the JSON export now, returns the number of entries written"""
+        path = path or self.json_file
+        with self._export_lock:
+            self._export_timer = None
+        count = write_json_export(path, self.iter_entries())
+        self.logger.log_debug("JSON export written", {"entries": count, "file": str(path)})
+        return count
+
+    def flush(self):
+        with self._export_lock:
+            timer, self._export_timer = self._export_timer, None
+        if timer is not None:
+            timer.cancel()
+            self._export()
+
+    def _filters(self, query):
+        where, params = [], []
+        for type_name in query.types:
+            where.append("id IN (SELECT fusion_id FROM fusion_types WHERE type = ?)")
+            params.append(type_name)
+        if query.parent_id is not None:
+            where.append("(parent1_id = ? OR parent2_id = ?)")
+            params += [query.parent_id, query.parent_id]
+        if query.min_stat_total is not None:
+            where.append("stat_total >= ?")
+            params.append(query.min_stat_total)
+        if query.max_stat_total is not None:
+            where.append("stat_total <= ?")
+            params.append(query.max_stat_total)
+        return where, params
+
+    def _write(self, conn, entries, now, replace=True):
+        """Upsert entries and their type rows (replace=False keeps existing entries)"""
+        entries = list(entries)
+        conflict = (
+            "ON CONFLICT(id) DO UPDATE SET data = excluded.data, name = excluded.name, "
+            "stat_total = excluded.stat_total, updated_at = excluded.updated_at"
+            if replace else "ON CONFLICT(id) DO NOTHING"
+        )
+        written = []
+        for entry in entries:
+            cursor = conn.execute(
+                "INSERT INTO fusions (id, parent1_id, parent2_id, data, created_at, updated_at, name, stat_total) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?) {conflict}",
+                (entry['id'], *parent_ids(entry['id']), json.dumps(entry), now, now,
+                 str(entry.get('name') or ''), stat_total(entry))
+            )
+            if cursor.rowcount:
+                written.append(entry)
+
+        conn.executemany("DELETE FROM fusion_types WHERE fusion_id = ?", [(e['id'],) for e in written])
+        conn.executemany(
+            "INSERT INTO fusion_types (type, fusion_id) VALUES (?, ?)",
+            [(type_name, e['id']) for e in written for type_name in entry_types(e)]
+        )
+
+    def _upgrade_schema(self):
+        """Databases created before listings had filters: add and backfill the filter columns"""
+        with self.db.transaction(immediate=True) as conn:
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(fusions)")}
+            if 'stat_total' not in columns:
+                conn.execute("ALTER TABLE fusions ADD COLUMN name TEXT NOT NULL DEFAULT ''")
+                conn.execute("ALTER TABLE fusions ADD COLUMN stat_total INTEGER NOT NULL DEFAULT 0")
+                rows = conn.execute("SELECT id, data FROM fusions").fetchall()
+                for row in rows:
+                    entry = json.loads(row['data'])
+                    conn.execute(
+                        "UPDATE fusions SET name = ?, stat_total = ? WHERE id = ?",
+                        (str(entry.get('name') or ''), stat_total(entry), row['id'])
+                    )
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO fusion_types (type, fusion_id) VALUES (?, ?)",
+                        [(type_name, row['id']) for type_name in entry_types(entry)]
+                    )
+                self.logger.log_info("Pokedex schema upgraded", {"entries": len(rows)})
+        self.db.connection().executescript(SORT_INDEXES)
+
+    def _schedule_export(self):
+        """Debounce: one export export_delay seconds after the first pending write"""
+        if not self.json_export:
+            return
+        with self._export_lock:
+            if self._export_timer is not None:
+                return
+            self._export_timer = threading.Timer(self.export_delay, self._export)
+            self._export_timer.daemon = True
+            self._export_timer.start()
+
+    def _export(self):
+        try:
+            self.export_json()
+        except Exception as e:
+            self.logger.log_error("JSON export failed", str(e))
+
+    def _migrate_json(self):
+        """One-time import of the legacy JSON file (entries already in SQLite win)"""
+        conn = self.db.connection()
+        if conn.execute("SELECT 1 FROM store_meta WHERE key = 'json_migrated'").fetchone():
+            return
+
+        entries = {}
+        if self.json_file and self.json_file.exists():
+            try:
+                with open(self.json_file, 'r') as f:
+                    entries = json.load(f)
+            except Exception as e:
+                self.logger.log_error("Legacy pokedex JSON unreadable, migration skipped", str(e))
+                return
+
+        with self.db.transaction(immediate=True) as conn:
+            if conn.execute("SELECT 1 FROM store_meta WHERE key = 'json_migrated'").fetchone():
+                return
+            self._write(conn, entries.values(), time.time(), replace=False)
+            conn.execute(
+                "INSERT INTO store_meta (key, value) VALUES ('json_migrated', ?)",
+                (str(self.json_file),)
+            )
+
+        self.logger.log_success("Legacy pokedex JSON migrated", {"entries": len(entries)})
+
+
+def create_pokedex_store(backend=POKEDEX_BACKEND):
+    if backend == 'sqlite':
+        return SqlitePokedexStore()
+    if backend == 'json':
+        return JsonPokedexStore()
+    raise ValueError(f"Unknown POKEDEX_BACKEND '{backend}' (expected 'sqlite' or 'json')")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_pokedex_store():
+    """Process-wide pokedex store for POKEDEX_BACKEND"""
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_pokedex_store()
+                atexit.register(_store.flush)
+    return _store
+
+
+def _reset_after_fork():
+    """A forked worker opens its own store (the export timer and locks belong to the parent)"""
+    global _store, _store_lock
+    _store = None
+    _store_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,265 @@
+"""
+Sprite atlases of Pokedex pages: the thumbnails of one /api/pokedex page
+packed into a single WebP sheet, with a JSON map of each fusion's tile.
+
+Atlas files are named after a hash of their content (fusion ids, image
+digests and drawn variants of the page, tile size, layout), so every worker process shares
+them and a page whose images did not change keeps its atlas.
+
+Pages are cached per process by (query, limit, cursor). Listings use keyset
+cursors, so a new fusion only changes the pages whose key range it falls in:
+AddPokedexEntry calls invalidate() after each write and only those pages
+are dropped. Writes made by other workers are picked up by revalidating a
+cached page (one indexed page query) after ATLAS_PAGE_TTL seconds.
+
+Building an atlas needs Pillow; without it pages are served without atlas.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from utils.config import (
+    ATLAS_CACHE_PAGES, ATLAS_COLUMNS, ATLAS_DIR, ATLAS_PAGE_TTL, ATLAS_TILE_SIZE, IMAGE_WEBP_QUALITY
+)
+from utils.image_store import Image, get_image_store, write_atomic
+from utils.logger import AgentLogger
+from utils.metrics import CACHE_REQUESTS
+from utils.pokedex_store import PokedexQuery, get_pokedex_store
+
+ATLAS_VERSION = 1  # bump when the layout or encoding changes
+
+URL_PREFIX = '/api/pokedex/atlas/'
+
+STATIC_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'static'))
+
+
+def atlas_url(key):
+    return f"{URL_PREFIX}{key}.webp"
+
+
+def _query_key(query):
+    return (tuple(query.types), query.parent_id, query.min_stat_total, query.max_stat_total,
+            query.sort, query.order)
+
+
+class _Page:
+    """A cached listing page, its key range and its atlas manifest"""
+
+    def __init__(self, query, cursor, limit, result, content_key, manifest):
+        self.query = query
+        self.lower = query.decode_cursor(cursor) if cursor else None  # (sort value, id) the page starts after
+        self.full = result['next_cursor'] is not None
+        self.upper = query.decode_cursor(result['next_cursor']) if self.full else None  # last item of a full page
+        self.ids = {item['id'] for item in result['items']}
+        self.result = result
+        self.content_key = content_key
+        self.manifest = manifest
+        self.checked_at = time.monotonic()
+
+    def affected_by(self, entry):
+        """True when writing entry can change this page"""
+        if entry['id'] in self.ids:
+            return True
+        if not self.query.matches(entry):
+            return False
+        if self.query.sort == 'created':
+            # A new fusion is the most recent one: last page in ascending order, first page in descending order
+            return not self.full if self.query.order == 'asc' else self.lower is None
+        key = (self.query.sort_value(entry), entry['id'])
+        try:
+            if self.query.order == 'asc':
+                return (self.lower is None or key > tuple(self.lower)) and (not self.full or key <= tuple(self.upper))
+            return (self.lower is None or key < tuple(self.lower)) and (not self.full or key >= tuple(self.upper))
+        except TypeError:
+            return True  # incomparable sort values: drop rather than keep a stale page
+
+
+class SpriteAtlasCache:
+    """Pokedex pages with the sprite atlas of their thumbnails"""
+
+    def __init__(self, atlas_dir=ATLAS_DIR, tile=ATLAS_TILE_SIZE, columns=ATLAS_COLUMNS,
+                 max_pages=ATLAS_CACHE_PAGES, ttl=ATLAS_PAGE_TTL):
+        self.logger = AgentLogger("SpriteAtlas")
+        self.atlas_dir = os.path.abspath(atlas_dir)
+        self.tile = tile
+        self.columns = columns
+        self.max_pages = max_pages
+        self.ttl = ttl
+
+        self._pages = OrderedDict()  # (query key, limit, cursor) -> _Page, least recently used first
+        self._lock = threading.Lock()
+        self._build_locks = {}  # content key -> [lock, users], one build per atlas at a time
+
+    def path(self, key):
+        return os.path.join(self.atlas_dir, f"{key}.webp")
+
+    def page(self, query=None, limit=50, cursor=None):
+        """One pokedex page: {'items', 'next_cursor', 'atlas'} (atlas None when it cannot be built)"""
+        query = query or PokedexQuery()
+        cache_key = (_query_key(query), limit, cursor)
+
+        with self._lock:
+            cached = self._pages.get(cache_key)
+            if cached is not None:
+                self._pages.move_to_end(cache_key)
+        if cached is not None and time.monotonic() - cached.checked_at < self.ttl:
+            CACHE_REQUESTS.inc('atlas', 'hit')
+            return self._view(cached)
+
+        result = get_pokedex_store().page(query, limit, cursor)
+        sources = [(item['id'], self._source(item)) for item in result['items']]
+        content_key = self._content_key(sources)
+        if cached is not None and cached.content_key == content_key:
+            # Revalidated: same images, the atlas still holds
+            CACHE_REQUESTS.inc('atlas', 'hit')
+            manifest = cached.manifest
+        else:
+            CACHE_REQUESTS.inc('atlas', 'miss')
+            manifest = self._atlas(content_key, sources)
+
+        page = _Page(query, cursor, limit, result, content_key, manifest)
+        with self._lock:
+            self._pages[cache_key] = page
+            self._pages.move_to_end(cache_key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return self._view(page)
+
+    def invalidate(self, entries):
+        """Drop the cached pages a write of these entries can change"""
+        with self._lock:
+            stale = [key for key, page in self._pages.items() if any(page.affected_by(e) for e in entries)]
+            for key in stale:
+                del self._pages[key]
+        if stale:
+            self.logger.log_debug("Atlas pages invalidated", {"pages": len(stale), "entries": len(entries)})
+
+    def _view(self, page):
+        return {**page.result, 'atlas': page.manifest}
+
+    def _source(self, entry):
+        """(identity, file) of the image drawn for an entry, None when it has no local image"""
+        image = entry.get('image')
+        if not isinstance(image, dict):
+            return None
+        store = get_image_store()
+        digest = image.get('sha256')
+        if digest and store.exists(digest):
+            variant = 'thumb' if store.exists(digest, 'thumb') else 'original'
+            # The variant is part of the identity: an atlas drawn from originals is rebuilt once thumbs exist
+            return f"{digest}.{variant}", store.path(digest, variant)
+        local_path = image.get('local_path') or ''
+        if local_path.startswith('/static/'):
+            # Images saved before the content-addressed store
+            path = os.path.realpath(os.path.join(STATIC_DIR, local_path[len('/static/'):]))
+            if os.path.commonpath([path, STATIC_DIR]) != STATIC_DIR:
+                return None  # '..' or a symlink leading out of the static directory
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            return f"{local_path}:{stat.st_size}:{int(stat.st_mtime)}", path
+        return None
+
+    def _content_key(self, sources):
+        identity = [ATLAS_VERSION, self.tile, self.columns, [(fusion_id, source and source[0]) for fusion_id, source in sources]]
+        return hashlib.sha256(json.dumps(identity).encode('utf-8')).hexdigest()
+
+    def _atlas(self, key, sources):
+        """Manifest of the atlas with this content key, built on first use"""
+        drawn = [(fusion_id, source[1]) for fusion_id, source in sources if source]
+        if Image is None or not drawn:
+            return None
+
+        manifest_file = os.path.join(self.atlas_dir, f"{key}.json")
+        with self._lock:
+            build = self._build_locks.setdefault(key, [threading.Lock(), 0])
+            build[1] += 1
+        try:
+            with build[0]:
+                if os.path.exists(manifest_file) and os.path.exists(self.path(key)):
+                    with open(manifest_file) as f:
+                        return json.load(f)
+                manifest = self._build(key, drawn)
+                write_atomic(manifest_file, json.dumps(manifest).encode('utf-8'))
+                return manifest
+        except Exception as e:
+            self.logger.log_error("Atlas build failed", {
+                "key": key,
+                "error": str(e),
+                "error_type": type(e).__name__
+            })
+            return None
+        finally:
+            # Dropped by its last user only, so threads still waiting keep sharing it
+            with self._lock:
+                build[1] -= 1
+                if not build[1]:
+                    del self._build_locks[key]
+
+    def _build(self, key, drawn):
+        """Pack thumbnails row by row in tile x tile cells, each centered in its cell"""
+        start = time.monotonic()
+        columns = min(self.columns, len(drawn))
+        rows = -(-len(drawn) // columns)
+        sheet = Image.new('RGBA', (columns * self.tile, rows * self.tile), (0, 0, 0, 0))
+
+        sprites = {}
+        for index, (fusion_id, path) in enumerate(drawn):
+            try:
+                with Image.open(path) as source:
+                    thumb = source.convert('RGBA')
+            except OSError as e:
+                self.logger.log_error("Atlas sprite skipped", {"fusion_id": fusion_id, "error": str(e)})
+                continue
+            thumb.thumbnail((self.tile, self.tile), Image.LANCZOS)
+            x = (index % columns) * self.tile + (self.tile - thumb.width) // 2
+            y = (index // columns) * self.tile + (self.tile - thumb.height) // 2
+            sheet.paste(thumb, (x, y), thumb)
+            sprites[fusion_id] = {"x": x, "y": y, "w": thumb.width, "h": thumb.height}
+
+        buffer = io.BytesIO()
+        sheet.save(buffer, 'WEBP', quality=IMAGE_WEBP_QUALITY, method=4)
+        write_atomic(self.path(key), buffer.getvalue())
+
+        self.logger.log_info("Atlas built", {
+            "key": key,
+            "sprites": len(sprites),
+            "size_kb": round(len(buffer.getvalue()) / 1024, 1),
+            "duration_ms": round((time.monotonic() - start) * 1000, 1)
+        })
+        return {
+            "url": atlas_url(key),
+            "width": sheet.width,
+            "height": sheet.height,
+            "tile": self.tile,
+            "sprites": sprites
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_atlas_cache():
+    """Process-wide atlas page cache"""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SpriteAtlasCache()
+    return _cache
+
+
+def _reset_after_fork():
+    global _cache, _cache_lock
+    _cache = None
+    _cache_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,131 @@
+"""
+Stat-space nearest-neighbour index over the species catalog.
+
+Normalized stats (base stat / 255) are pre-scaled by sqrt(STATS_WEIGHTS) and
+kept in a float32 (N, 6) array, so the weighted euclidean distance of
+StatFilterTop3Tool becomes a plain L2 distance. Queries are brute-force and
+vectorized over the whole catalog, with an optional boolean mask (for example
+"type-compatible with the base"). The best float32 hits are re-scored in
+float64 with the exact StatFilterTop3Tool formula before the final ranking.
+"""
+import threading
+import numpy as np
+from utils.catalog import get_catalog
+from utils.config import STATS_WEIGHTS
+
+# Same key order as StatFilterTop3Tool._normalize_stats (distance is summed in this order)
+STAT_ORDER = ['hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed']
+
+QUERY_CHUNK = 256  # bases per distance matrix in query_many
+
+
+def normalized_stats(stats_list):
+    """List of stat dicts -> (N, 6) float64 stats divided by 255, in STAT_ORDER"""
+    return np.array(
+        [[stats[key] for key in STAT_ORDER] for stats in stats_list],
+        dtype=np.float64
+    ).reshape(len(stats_list), len(STAT_ORDER)) / 255.0
+
+
+def stat_scores(base_norm, candidate_norm):
+    """
+    1 / (1 + weighted euclidean distance), broadcasting base (..., 6) against candidates (..., 6)
+    Summed key by key like StatFilterTop3Tool._euclidean_distance, so scores match bit for bit.
+    """
+    distance = np.zeros(np.broadcast_shapes(base_norm.shape, candidate_norm.shape)[:-1])
+    for j, key in enumerate(STAT_ORDER):
+        weight = STATS_WEIGHTS.get(key, 0.1)
+        distance += weight * ((base_norm[..., j] - candidate_norm[..., j]) ** 2)
+    return 1.0 / (1.0 + np.sqrt(distance))
+
+
+class StatVectorIndex:
+    """Weighted k-NN over catalog stat vectors"""
+
+    def __init__(self, species):
+        self.ids = np.array([s['id'] for s in species], dtype=np.int32)
+        self.positions = {int(species_id): i for i, species_id in enumerate(self.ids)}
+        self.stats_norm = normalized_stats([s['stats'] for s in species])
+
+        self.scale = np.sqrt([STATS_WEIGHTS.get(key, 0.1) for key in STAT_ORDER])
+        self.vectors = (self.stats_norm * self.scale).astype(np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mask_for_ids(self, ids):
+        """Boolean mask (N,) selecting the given species ids"""
+        mask = np.zeros(len(self.ids), dtype=bool)
+        positions = [self.positions[i] for i in ids if i in self.positions]
+        mask[positions] = True
+        return mask
+
+    def query(self, base_stats, k, mask=None):
+        """k nearest species to a stat dict: list of (catalog position, score), best first"""
+        mask = None if mask is None else mask[None, :]
+        positions, scores = self.query_many(normalized_stats([base_stats]), k, mask)
+        return [(int(p), float(s)) for p, s in zip(positions[0], scores[0]) if p >= 0]
+
+    def query_many(self, base_norm, k, mask=None):
+        """
+        k nearest species for each normalized base (B, 6)
+        Returns positions (B, k) (-1 padded) and scores (B, k) (nan padded).
+        Ties are broken by catalog order.
+        """
+        count = len(base_norm)
+        positions = np.full((count, k), -1, dtype=np.int64)
+        scores = np.full((count, k), np.nan)
+        if not len(self.ids) or not k:
+            return positions, scores
+
+        # float32 preselection with some headroom, then exact float64 ranking
+        preselect = min(len(self.ids), 4 * k + 16)
+
+        for start in range(0, count, QUERY_CHUNK):
+            rows = slice(start, min(start + QUERY_CHUNK, count))
+            queries = (base_norm[rows] * self.scale).astype(np.float32)
+
+            distances = np.zeros((len(queries), len(self.ids)), dtype=np.float32)
+            for j in range(len(STAT_ORDER)):
+                diff = self.vectors[:, j][None, :] - queries[:, j][:, None]
+                distances += diff * diff
+
+            valid = np.ones_like(distances, dtype=bool) if mask is None else mask[rows]
+            distances[~valid] = np.inf
+
+            if preselect < len(self.ids):
+                nearest = np.argpartition(distances, preselect - 1, axis=1)[:, :preselect]
+            else:
+                nearest = np.broadcast_to(np.arange(len(self.ids)), distances.shape)
+
+            exact = stat_scores(base_norm[rows][:, None, :], self.stats_norm[nearest])
+            exact = np.where(np.take_along_axis(valid, nearest, axis=1), exact, -np.inf)
+
+            order = np.lexsort((nearest, -exact), axis=-1)[:, :k]
+            top_positions = np.take_along_axis(nearest, order, axis=1)
+            top_scores = np.take_along_axis(exact, order, axis=1)
+            found = np.isfinite(top_scores)
+
+            width = order.shape[1]
+            positions[rows, :width] = np.where(found, top_positions, -1)
+            scores[rows, :width] = np.where(found, top_scores, np.nan)
+
+        return positions, scores
+
+
+_stat_index = None
+_stat_index_lock = threading.Lock()
+
+
+def get_stat_index():
+    """Process-wide stat index over the catalog, None without a catalog"""
+    global _stat_index
+
+    if _stat_index is None:
+        catalog = get_catalog()
+        if not catalog:
+            return None
+        with _stat_index_lock:
+            if _stat_index is None:
+                _stat_index = StatVectorIndex(catalog.all())
+    return _stat_index
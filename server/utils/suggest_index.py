@@ -0,0 +1,301 @@
+"""
+Precomputed suggestion index: top-K suggestions for every species of the catalog.
+
+Rows are computed with the same two stages as the live suggestion flow
+(type compatibility mask, then weighted stat k-NN over the compatible
+candidates) and stored as memory-mapped .npy arrays next to a meta.json:
+
+    base_ids.npy       (N,)   species id of each row
+    candidate_ids.npy  (N, K) suggested ids, best first (-1 padded)
+    scores.npy         (N, K) stat compatibility scores
+    cutoff_scores.npy  (N,)   K-th score (-inf when fewer than K suggestions)
+    fallback.npy       (N,)   True when no candidate was type-compatible (all candidates ranked)
+
+Rebuilds are incremental: a catalog change only recomputes the rows it can
+affect. STATS_WEIGHTS or type table changes rebuild every row.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+import numpy as np
+from utils.catalog import get_catalog
+from utils.config import (
+    TYPE_EFFECTIVENESS, STATS_WEIGHTS,
+    SUGGEST_INDEX_DIR, SUGGEST_INDEX_TOP_K, SUGGEST_INDEX_VERSION
+)
+from utils.logger import AgentLogger
+from utils.stat_index import StatVectorIndex, stat_scores
+from utils.type_matrix import encode_types, score_compatibility_matrix
+
+ARRAYS = ['base_ids', 'candidate_ids', 'scores', 'cutoff_scores', 'fallback']
+
+BUILD_CHUNK = 256  # bases scored per matrix call
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def pipeline_fingerprint():
+    """Everything the ranking depends on besides the catalog itself"""
+    return _digest({
+        'types': TYPE_EFFECTIVENESS,
+        'weights': STATS_WEIGHTS
+    })
+
+
+def species_hash(species):
+    """Hash of the fields that affect ranking"""
+    return _digest([species['types'], species['stats']])
+
+
+class SuggestIndex:
+    """Loaded (memory-mapped) suggestion index"""
+
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self._rows = {int(base_id): row for row, base_id in enumerate(self.base_ids)}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def is_fresh(self, catalog):
+        """True when built from this catalog with the current weights and type table"""
+        return (
+            self.meta.get('version') == SUGGEST_INDEX_VERSION
+            and self.meta.get('catalog_built_at') == catalog.built_at
+            and self.meta.get('pipeline_fingerprint') == pipeline_fingerprint()
+        )
+
+    def lookup(self, pokemon_id, catalog, top_k=3):
+        """Top-k suggestions shaped like StatFilterTop3Tool.filter_top_3 output, None when not indexed"""
+        species = catalog.get(pokemon_id)
+        if species is None or species['id'] not in self._rows:
+            return None
+
+        row = self._rows[species['id']]
+        results = []
+        for candidate_id, score in zip(self.candidate_ids[row][:top_k], self.scores[row][:top_k]):
+            if candidate_id < 0:
+                break
+            candidate = catalog.get(int(candidate_id))
+            results.append({
+                'id': int(candidate['id']),
+                'name': str(candidate['name']),
+                'types': list(candidate['types']),
+                'compatibility_score': float(score)
+            })
+        return results
+
+    @classmethod
+    def load(cls, index_dir=SUGGEST_INDEX_DIR):
+        index_dir = Path(index_dir)
+        with open(index_dir / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(index_dir / f'{name}.npy', mmap_mode='r') for name in ARRAYS}
+        return cls(arrays, meta)
+
+
+class SuggestIndexBuilder:
+    """Offline builder for the suggestion index"""
+
+    def __init__(self, catalog, top_k=SUGGEST_INDEX_TOP_K):
+        self.logger = AgentLogger("SuggestIndexBuilder")
+        self.catalog = catalog
+        self.top_k = top_k
+
+        self.species = catalog.all()
+        self.stat_index = StatVectorIndex(self.species)
+        self.ids = self.stat_index.ids
+        self.positions = self.stat_index.positions
+        self.encoded = encode_types([s['types'] for s in self.species])
+
+    def build(self, index_dir=SUGGEST_INDEX_DIR, full=False):
+        """Build or incrementally refresh the index in index_dir, returns a summary"""
+        previous = None
+        if not full and (Path(index_dir) / 'meta.json').exists():
+            try:
+                previous = SuggestIndex.load(index_dir)
+            except Exception as e:
+                self.logger.log_info("Previous suggestion index unreadable, full rebuild", {"error": str(e)})
+
+        hashes = {str(s['id']): species_hash(s) for s in self.species}
+
+        if (
+            previous is None
+            or previous.meta.get('version') != SUGGEST_INDEX_VERSION
+            or previous.meta.get('pipeline_fingerprint') != pipeline_fingerprint()
+            or previous.meta.get('top_k') != self.top_k
+        ):
+            arrays = self._compute_rows(np.arange(len(self.species)))
+            summary = {"mode": "full", "rows": len(self.species)}
+        else:
+            arrays, summary = self._refresh(previous, hashes)
+
+        if summary['rows'] or previous is None or previous.meta.get('catalog_built_at') != self.catalog.built_at:
+            self._save(index_dir, arrays, hashes)
+
+        self.logger.log_success("Suggestion index built", summary)
+        return summary
+
+    def _refresh(self, previous, hashes):
+        """Incremental rebuild against a previous index built with the same pipeline"""
+        old_hashes = previous.meta.get('species_hashes', {})
+        changed = {int(i) for i, h in hashes.items() if old_hashes.get(i) != h}
+        removed = {int(i) for i in old_hashes if i not in hashes}
+
+        old_rows = {int(base_id): row for row, base_id in enumerate(previous.base_ids)}
+        arrays = self._empty(len(self.species))
+        recompute = []
+
+        if changed:
+            # Type and stat scores of every base against the changed candidates only
+            changed_positions = np.array(sorted(self.positions[i] for i in changed))
+            changed_ids = self.ids[changed_positions]
+            changed_type_scores = score_compatibility_matrix(self.encoded, self.encoded[changed_positions])
+            changed_stat_scores = stat_scores(
+                self.stat_index.stats_norm[:, None, :],
+                self.stat_index.stats_norm[changed_positions][None, :, :]
+            )
+
+        for position, base_id in enumerate(self.ids):
+            base_id = int(base_id)
+            row = old_rows.get(base_id)
+            if row is None or base_id in changed:
+                recompute.append(position)
+                continue
+
+            suggested = set(int(i) for i in previous.candidate_ids[row] if i >= 0)
+            if suggested & (changed | removed):
+                recompute.append(position)
+                continue
+
+            if changed:
+                others = changed_ids != base_id
+                compatible = changed_type_scores[position] > 0
+                if previous.fallback[row]:
+                    # A first type-compatible candidate switches the row out of fallback mode
+                    enters = others & (compatible | (changed_stat_scores[position] >= previous.cutoff_scores[row]))
+                else:
+                    enters = others & compatible & (changed_stat_scores[position] >= previous.cutoff_scores[row])
+                if enters.any():
+                    recompute.append(position)
+                    continue
+
+            for name in ARRAYS:
+                arrays[name][position] = getattr(previous, name)[row]
+
+        if recompute:
+            computed = self._compute_rows(np.array(recompute))
+            for name in ARRAYS:
+                arrays[name][recompute] = computed[name]
+
+        return arrays, {
+            "mode": "incremental",
+            "rows": len(recompute),
+            "changed_species": len(changed),
+            "removed_species": len(removed)
+        }
+
+    def _compute_rows(self, positions):
+        """Type mask + stat k-NN for the given base positions"""
+        arrays = self._empty(len(positions))
+        arrays['base_ids'][:] = self.ids[positions]
+
+        for start in range(0, len(positions), BUILD_CHUNK):
+            chunk = np.arange(start, min(start + BUILD_CHUNK, len(positions)))
+            bases = positions[chunk]
+            own = (np.arange(len(bases)), bases)
+
+            # Type stage: positive score = compatible, every other species when none is
+            mask = score_compatibility_matrix(self.encoded[bases], self.encoded) > 0
+            mask[own] = False
+            fallback = ~mask.any(axis=1)
+            mask[fallback] = True
+            mask[own] = False
+
+            # Stat stage
+            top_positions, top_scores = self.stat_index.query_many(
+                self.stat_index.stats_norm[bases], self.top_k, mask
+            )
+
+            arrays['candidate_ids'][chunk] = np.where(top_positions >= 0, self.ids[top_positions], -1)
+            arrays['scores'][chunk] = top_scores
+            arrays['cutoff_scores'][chunk] = np.where(np.isnan(top_scores[:, -1]), -np.inf, top_scores[:, -1])
+            arrays['fallback'][chunk] = fallback
+
+        return arrays
+
+    def _empty(self, rows):
+        return {
+            'base_ids': np.zeros(rows, dtype=np.int32),
+            'candidate_ids': np.full((rows, self.top_k), -1, dtype=np.int32),
+            'scores': np.full((rows, self.top_k), np.nan, dtype=np.float64),
+            'cutoff_scores': np.full(rows, -np.inf, dtype=np.float64),
+            'fallback': np.zeros(rows, dtype=bool),
+        }
+
+    def _save(self, index_dir, arrays, hashes):
+        """Write to a sibling folder then swap it in"""
+        index_dir = Path(index_dir)
+        tmp_dir = index_dir.with_name(index_dir.name + '.tmp')
+        old_dir = index_dir.with_name(index_dir.name + '.old')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        for name in ARRAYS:
+            np.save(tmp_dir / f'{name}.npy', np.asarray(arrays[name]))
+
+        with open(tmp_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': SUGGEST_INDEX_VERSION,
+                'top_k': self.top_k,
+                'catalog_built_at': self.catalog.built_at,
+                'pipeline_fingerprint': pipeline_fingerprint(),
+                'species_hashes': hashes
+            }, f)
+
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if index_dir.exists():
+            os.replace(index_dir, old_dir)
+        os.replace(tmp_dir, index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_suggest_index():
+    """Process-wide suggestion index, None when missing or stale for the loaded catalog"""
+    global _index, _index_loaded
+
+    if _index_loaded:
+        return _index
+
+    with _index_lock:
+        if not _index_loaded:
+            logger = AgentLogger("SuggestIndex")
+            catalog = get_catalog()
+            try:
+                if catalog and (Path(SUGGEST_INDEX_DIR) / 'meta.json').exists():
+                    index = SuggestIndex.load(SUGGEST_INDEX_DIR)
+                    if index.is_fresh(catalog):
+                        _index = index
+                        logger.log_success("Suggestion index loaded", {"rows": len(index)})
+                    else:
+                        logger.log_info("Suggestion index is stale, rebuild it", {
+                            "index_dir": SUGGEST_INDEX_DIR
+                        })
+            except Exception as e:
+                logger.log_error("Suggestion index load failed", str(e))
+                _index = None
+            _index_loaded = True
+
+    return _index
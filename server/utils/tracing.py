@@ -0,0 +1,202 @@
+"""
+Lightweight request tracing.
+
+A trace is every span recorded for one API request (or background job),
+identified by its request id. Spans time a block with time.monotonic() and
+nest through a context variable, so they work across the orchestrator,
+agents, tools and outbound HTTP/LLM calls without passing anything around.
+Work submitted to thread pools keeps the trace when submitted through
+wrap() / submit(); asyncio tasks (utils.aio) keep it on their own.
+
+Finished spans go to an in-process ring buffer (TRACE_BUFFER_SIZE spans,
+served by /api/debug/traces with per-span-name percentiles) and, when
+TRACE_EXPORT_FILE is set, to a JSON lines file written by a background
+LogPipeline.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import math
+import re
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from utils.config import TRACING_ENABLED, TRACE_BUFFER_SIZE, TRACE_EXPORT_FILE
+from utils.logger import LogPipeline, current_request_id
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+_REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class Span:
+    """One timed operation of a trace"""
+
+    __slots__ = ('name', 'kind', 'trace_id', 'span_id', 'parent_id', 'start_time', '_start', 'duration_ms', 'attributes', 'error')
+
+    def __init__(self, name, kind, trace_id, parent_id, attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self._start = time.monotonic()
+        self.duration_ms = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class TraceRecorder:
+    """Ring buffer of finished spans, optionally exported as JSON lines"""
+
+    def __init__(self, size=TRACE_BUFFER_SIZE, export_file=TRACE_EXPORT_FILE):
+        self.spans = deque(maxlen=size)
+        self.exporter = None
+        if export_file:
+            self.exporter = LogPipeline(
+                export_file, stdout=False,
+                serialize=lambda span: json.dumps(span.to_dict(), default=str)
+            )
+
+    def record(self, span):
+        self.spans.append(span)  # deque.append is atomic
+        if self.exporter:
+            self.exporter.submit(span)
+
+    def traces(self, limit=20, request_id=None):
+        """Latest traces, spans grouped by request id (oldest span first)"""
+        grouped = {}
+        for span in list(self.spans):
+            if span.trace_id is None or (request_id and span.trace_id != request_id):
+                continue
+            grouped.setdefault(span.trace_id, []).append(span.to_dict())
+        trace_ids = list(grouped)[-limit:]
+        return [
+            {"request_id": trace_id, "spans": sorted(grouped[trace_id], key=lambda s: s["start_time"])}
+            for trace_id in reversed(trace_ids)
+        ]
+
+    def summary(self):
+        """Per span name: count, errors, p50 / p95 / max duration (ms) over the buffer"""
+        durations = {}
+        errors = {}
+        for span in list(self.spans):
+            durations.setdefault(span.name, []).append(span.duration_ms)
+            if span.error:
+                errors[span.name] = errors.get(span.name, 0) + 1
+
+        summary = {}
+        for name, values in sorted(durations.items()):
+            values.sort()
+            summary[name] = {
+                "count": len(values),
+                "errors": errors.get(name, 0),
+                "p50_ms": _percentile(values, 0.50),
+                "p95_ms": _percentile(values, 0.95),
+                "max_ms": values[-1],
+            }
+        return summary
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile"""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+recorder = TraceRecorder()
+
+
+def new_request_id(incoming=None):
+    """Client supplied X-Request-ID when it looks sane, a fresh id otherwise"""
+    if incoming and _REQUEST_ID_PATTERN.match(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def span(name, kind='internal', **attributes):
+    """Time a block as a child of the current span"""
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name, kind,
+        parent.trace_id if parent else current_request_id.get(),
+        parent.span_id if parent else None,
+        attributes
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration_ms = round((time.monotonic() - current._start) * 1000, 3)
+        _current_span.reset(token)
+        recorder.record(current)
+
+
+@contextmanager
+def trace(request_id, name, kind='request', **attributes):
+    """Root span of a request or job: sets the request id for the spans and logs inside"""
+    token = current_request_id.set(request_id)
+    span_token = _current_span.set(None)
+    try:
+        with span(name, kind, **attributes) as root:
+            yield root
+    finally:
+        _current_span.reset(span_token)
+        current_request_id.reset(token)
+
+
+def traced(name=None, kind='internal'):
+    """Decorator: run the function (or coroutine function) inside a span, named after its qualname by default"""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, kind):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def wrap(fn):
+    """Bind fn to the current context (request id, parent span) for another thread"""
+    context = contextvars.copy_context()
+    return functools.partial(context.run, fn)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit keeping the current trace"""
+    return executor.submit(wrap(fn), *args, **kwargs)
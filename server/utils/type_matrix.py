@@ -0,0 +1,131 @@
+"""
+Type effectiveness compiled into NumPy matrices and per-type bitmasks.
+
+TYPE_EFFECTIVENESS (dict of lists) is compiled once at import time:
+- PokemonType: IntEnum giving each type its row/column index
+- RESISTS / WEAK_TO / STRONG_AGAINST: 18x18 0/1 matrices, [i, j] = 1 when type j is in the list of type i
+- *_MASKS: the same rows as int bitmasks (bit j set when type j is listed)
+
+Scores match SuggestionTypesTool._score_compatibility and
+FusionStatsMovesTool._calculate_type_synergy (type_synergy_batch included) exactly (tests/test_type_matrix.py).
+Types unknown to TYPE_EFFECTIVENESS are ignored.
+"""
+from enum import IntEnum
+import numpy as np
+from utils.config import TYPE_EFFECTIVENESS
+
+TYPE_NAMES = list(TYPE_EFFECTIVENESS)
+TYPE_INDEX = {name: i for i, name in enumerate(TYPE_NAMES)}
+N_TYPES = len(TYPE_NAMES)
+
+PokemonType = IntEnum('PokemonType', {name.upper(): i for i, name in enumerate(TYPE_NAMES)})
+
+
+def _compile(relation):
+    matrix = np.zeros((N_TYPES, N_TYPES), dtype=np.int32)
+    for name, entry in TYPE_EFFECTIVENESS.items():
+        for other in entry[relation]:
+            if other in TYPE_INDEX:
+                matrix[TYPE_INDEX[name], TYPE_INDEX[other]] = 1
+    matrix.setflags(write=False)
+    return matrix
+
+
+def _masks(matrix):
+    return tuple(sum(1 << j for j in range(N_TYPES) if row[j]) for row in matrix)
+
+
+RESISTS = _compile('resists')
+WEAK_TO = _compile('weak_to')
+STRONG_AGAINST = _compile('strong_against')
+
+RESISTS_MASKS = _masks(RESISTS)
+WEAK_TO_MASKS = _masks(WEAK_TO)
+STRONG_AGAINST_MASKS = _masks(STRONG_AGAINST)
+
+
+def type_indices(types):
+    """Type names -> indices (unknown types dropped, duplicates kept)"""
+    return [TYPE_INDEX[t] for t in types if t in TYPE_INDEX]
+
+
+def types_mask(types):
+    """Type names -> bitmask"""
+    mask = 0
+    for i in type_indices(types):
+        mask |= 1 << i
+    return mask
+
+
+def encode_types(types_list):
+    """List of type lists -> (N, 18) int32 count matrix"""
+    encoded = np.zeros((len(types_list), N_TYPES), dtype=np.int32)
+    for row, types in enumerate(types_list):
+        for i in type_indices(types):
+            encoded[row, i] += 1
+    return encoded
+
+
+def score_compatibility_matrix(base_encoded, candidate_encoded):
+    """
+    Type compatibility of every base against every candidate, shape (B, N)
+    - +2 per (base weakness, candidate type) where the candidate type is strong against the weakness
+    - +1 per candidate type the base is strong against
+    - -0.5 per base type shared with the candidate
+    """
+    base_present = (base_encoded > 0).astype(np.int32)
+    candidate_present = (candidate_encoded > 0).astype(np.int32)
+
+    weaknesses = (base_present @ WEAK_TO > 0).astype(np.int32)
+    strong_against = (base_present @ STRONG_AGAINST > 0).astype(np.int32)
+    covers = weaknesses @ STRONG_AGAINST  # (B, 18): weaknesses each candidate type is strong against
+
+    coverage = covers @ candidate_encoded.T
+    strength = strong_against @ candidate_encoded.T
+    shared = base_encoded @ candidate_present.T
+
+    return 2.0 * coverage + 1.0 * strength - 0.5 * shared
+
+
+def score_compatibility_batch(base_types, candidate_encoded):
+    """Type compatibility of one base against every candidate, shape (N,)"""
+    return score_compatibility_matrix(encode_types([base_types]), candidate_encoded)[0]
+
+
+def type_synergy(types1, types2):
+    """
+    Fusion synergy bonus
+    - -2% per shared type
+    - +5% per (type1, type2) pair where type2 is strong against a weakness of type1
+    - capped at 15%
+    """
+    synergy = 0.0
+
+    overlap = len(set(types1) & set(types2))
+    if overlap > 0:
+        synergy -= 0.02 * overlap
+
+    indices2 = type_indices(types2)
+    for i in type_indices(types1):
+        weak_mask = WEAK_TO_MASKS[i]
+        for j in indices2:
+            if weak_mask & STRONG_AGAINST_MASKS[j]:
+                synergy += 0.05
+
+    return min(synergy, 0.15)
+
+
+# [i, j] = 1 when type j is strong against a weakness of type i
+COVERS = ((WEAK_TO @ STRONG_AGAINST.T) > 0).astype(np.int32)
+
+
+def type_synergy_batch(types1_list, types2_list):
+    """type_synergy of every (types1, types2) pair at once, shape (N,)"""
+    overlap = np.array([len(set(a) & set(b)) for a, b in zip(types1_list, types2_list)], dtype=np.float64)
+    coverage = np.einsum('ni,ij,nj->n', encode_types(types1_list), COVERS, encode_types(types2_list))
+    synergy = np.where(overlap > 0, -0.02 * overlap, 0.0)
+    # Same accumulation order as the scalar version, so the float results are identical
+    for count in range(1, int(coverage.max(initial=0)) + 1):
+        synergy = np.where(coverage >= count, synergy + 0.05, synergy)
+    return np.minimum(synergy, 0.15)
+
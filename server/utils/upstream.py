@@ -0,0 +1,243 @@
+"""
+Per-provider scheduler for outbound calls (PokeAPI, Leonardo, Mistral).
+
+Every upstream call goes through the scheduler of its provider:
+- token bucket: at most `rate` calls per second, bursts up to `burst`
+- concurrency cap: at most `concurrency` calls in flight
+- one priority queue per provider: when calls wait for a token or a slot,
+  interactive calls (/api/fuse, /api/suggest) are let through before batch
+  calls (/api/fuse/batch), first come first served within a priority
+- retries: 429, 5xx and transport errors are retried up to `max_retries`
+  times with exponential backoff and full jitter. A 429 pauses the whole
+  provider for its Retry-After (or the backoff delay without one), so
+  waiting callers stop hammering a rate-limited API.
+
+Limits come from UPSTREAM_LIMITS in utils.config. Schedulers live on the
+utils.aio loop and are rebuilt after fork, like the loop itself.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+import httpx
+from utils.config import UPSTREAM_LIMITS, UPSTREAM_MAX_RETRIES, UPSTREAM_BACKOFF_BASE, UPSTREAM_BACKOFF_MAX
+from utils.logger import AgentLogger
+from utils.metrics import UPSTREAM_QUEUE_WAIT, UPSTREAM_RETRIES, observe_upstream
+
+INTERACTIVE = 0
+BATCH = 10
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+current_priority = ContextVar('upstream_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    """Upstream calls made in this block (and the tasks it starts) use this priority, lower goes first"""
+    token = current_priority.set(level)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def retry_after_seconds(response):
+    """Retry-After header of a response in seconds (delta or HTTP date), None when absent or invalid"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderScheduler:
+    """Token bucket + concurrency cap + priority queue + retries for one provider (aio loop only)"""
+
+    def __init__(self, provider, rate, burst, concurrency, max_retries=UPSTREAM_MAX_RETRIES,
+                 backoff_base=UPSTREAM_BACKOFF_BASE, backoff_max=UPSTREAM_BACKOFF_MAX):
+        self.logger = AgentLogger("UpstreamScheduler")
+        self.provider = provider
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.concurrency = max(concurrency, 1)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.tokens = float(self.burst)
+        self.running = 0
+        self.paused_until = 0.0
+        self._updated = None
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._timer = None
+
+    async def call(self, operation, send):
+        """
+        await send() within a slot, retrying retryable failures
+        send must raise for error statuses (httpx raise_for_status) for them to be retried
+        """
+        for attempt in itertools.count():
+            async with self.slot():
+                try:
+                    with observe_upstream(self.provider, operation):
+                        return await send()
+                except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                    response = getattr(e, 'response', None) if isinstance(e, httpx.HTTPStatusError) else None
+                    if response is not None and response.status_code not in RETRY_STATUSES:
+                        raise
+                    if attempt >= self.max_retries:
+                        raise
+                    error = e
+
+            delay = self._retry_delay(attempt, response)
+            reason = str(response.status_code) if response is not None else type(error).__name__
+            UPSTREAM_RETRIES.inc(self.provider, operation, reason)
+            self.logger.log_info("Upstream call retried", {
+                "provider": self.provider,
+                "operation": operation,
+                "attempt": attempt + 1,
+                "reason": reason,
+                "delay_s": round(delay, 2)
+            })
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one token and one concurrency slot for the duration of the block"""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, level=None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        level = current_priority.get() if level is None else level
+        heapq.heappush(self._waiters, (level, next(self._seq), future))
+        start = loop.time()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # granted just before the cancellation
+            raise
+        UPSTREAM_QUEUE_WAIT.observe(loop.time() - start, self.provider)
+
+    def release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def pause(self, seconds):
+        """No call starts for `seconds` (Retry-After)"""
+        loop = asyncio.get_running_loop()
+        self.paused_until = max(self.paused_until, loop.time() + seconds)
+        self._dispatch()
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "queued": sum(not future.done() for _, _, future in self._waiters),
+            "tokens": round(self.tokens, 2) if math.isfinite(self.tokens) else None
+        }
+
+    def _retry_delay(self, attempt, response):
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if response is None or response.status_code != 429:
+            return backoff
+        retry_after = retry_after_seconds(response)
+        delay = backoff if retry_after is None else retry_after
+        self.pause(delay)
+        return delay
+
+    def _refill(self, now):
+        if self.rate <= 0:
+            self.tokens = math.inf
+        elif self._updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _dispatch(self):
+        """Grant waiting calls in priority order while a slot and a token are available"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._refill(now)
+        while self._waiters and self.running < self.concurrency:
+            _, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)  # cancelled while queued
+                continue
+            wait = self.paused_until - now
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) / self.rate)
+            if wait > 0:
+                self._wake_in(loop, wait)
+                return
+            heapq.heappop(self._waiters)
+            self.tokens -= 1
+            self.running += 1
+            future.set_result(None)
+
+    def _wake_in(self, loop, delay):
+        when = loop.time() + delay
+        if self._timer is not None and not self._timer.cancelled() and self._timer.when() <= when:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._wake)
+
+    def _wake(self):
+        self._timer = None
+        self._dispatch()
+
+
+_schedulers = {}
+_lock = threading.Lock()
+
+
+def get_scheduler(provider):
+    """Scheduler of a provider of UPSTREAM_LIMITS, created on first use"""
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        with _lock:
+            scheduler = _schedulers.get(provider)
+            if scheduler is None:
+                scheduler = _schedulers[provider] = ProviderScheduler(provider, **UPSTREAM_LIMITS[provider])
+    return scheduler
+
+
+async def call(provider, operation, send):
+    """Run send() through the scheduler of provider (see ProviderScheduler.call)"""
+    return await get_scheduler(provider).call(operation, send)
+
+
+def stats():
+    """Running, queued calls and tokens left per provider"""
+    return {provider: scheduler.stats() for provider, scheduler in list(_schedulers.items())}
+
+
+def _reset_after_fork():
+    """Queued futures and timers belong to the parent's event loop"""
+    global _schedulers, _lock
+    _schedulers = {}
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
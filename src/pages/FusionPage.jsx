@@ -143,6 +143,42 @@ function FusionPage() {
     setShowSummary(true);
   };
 
+  const waitForFusionJob = (job) =>
+    new Promise((resolve, reject) => {
+      const events = new EventSource(`http://localhost:8081${job.events_url}`);
+
+      events.addEventListener('complete', (event) => {
+        events.close();
+        resolve(JSON.parse(event.data).result);
+      });
+
+      events.addEventListener('failed', (event) => {
+        events.close();
+        reject(new Error(JSON.parse(event.data).error || 'Erreur lors de la fusion'));
+      });
+
+      events.onerror = () => {
+        events.close();
+        // Flux interrompu : on interroge le statut du job à intervalle régulier
+        const poll = setInterval(async () => {
+          try {
+            const statusResponse = await fetch(`http://localhost:8081${job.status_url}`);
+            const status = await statusResponse.json();
+            if (status.status === 'complete') {
+              clearInterval(poll);
+              resolve(status.result);
+            } else if (status.status === 'failed' || !statusResponse.ok) {
+              clearInterval(poll);
+              reject(new Error(status.error || 'Erreur lors de la fusion'));
+            }
+          } catch (err) {
+            clearInterval(poll);
+            reject(err);
+          }
+        }, 2000);
+      };
+    });
+
   const handleFuse = async () => {
     if (!selectedBaseId || !selectedId) {
       setError('Sélectionnez un Pokémon de base et un Pokémon suggéré.');
@@ -167,7 +203,9 @@ function FusionPage() {
         throw new Error(data.error || 'Erreur lors de la fusion');
       }
 
-      const data = await response.json();
+      // Fusion déjà générée : résultat immédiat, sinon on attend la fin du job
+      const job = await response.json();
+      const data = job.status === 'complete' ? job.result : await waitForFusionJob(job);
       setFusionResult(data);
     } catch (err) {
       setError(err.message || 'Erreur inconnue');
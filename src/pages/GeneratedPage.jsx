@@ -1,8 +1,9 @@
 import { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import fusedPokemons from '../data/fused_pokemons.json';
 import './GeneratedPage.css';
 
+const PAGE_SIZE = 100;
+
 function GeneratedPage() {
   const navigate = useNavigate();
   const [pokemons, setPokemons] = useState([]);
@@ -10,16 +11,42 @@ function GeneratedPage() {
   const [error, setError] = useState('');
 
   useEffect(() => {
-    setLoading(true);
-    setError('');
-    try {
-      const entries = Object.values(fusedPokemons || {});
-      setPokemons(entries);
-    } catch (err) {
-      setError(err.message || 'Erreur inconnue');
-    } finally {
-      setLoading(false);
-    }
+    let cancelled = false;
+
+    // One page at a time: each page shows up as soon as it arrives
+    const loadPages = async () => {
+      setLoading(true);
+      setError('');
+      setPokemons([]);
+      try {
+        let cursor = null;
+        do {
+          const params = new URLSearchParams({ limit: PAGE_SIZE });
+          if (cursor) params.set('cursor', cursor);
+          const response = await fetch(`http://localhost:8081/api/pokedex?${params}`);
+
+          if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            throw new Error(data.error || 'Erreur lors du chargement du Pokédex');
+          }
+
+          const data = await response.json();
+          if (cancelled) return;
+          setPokemons((previous) => [...previous, ...(data.items || [])]);
+          setLoading(false);
+          cursor = data.next_cursor;
+        } while (cursor);
+      } catch (err) {
+        if (!cancelled) setError(err.message || 'Erreur inconnue');
+      } finally {
+        if (!cancelled) setLoading(false);
+      }
+    };
+
+    loadPages();
+    return () => {
+      cancelled = true;
+    };
   }, []);
 
   return (
@@ -32,10 +59,10 @@ function GeneratedPage() {
       {loading && <div className="generated-loading">Chargement...</div>}
       {error && <div className="generated-error">{error}</div>}
 
-      {!loading && !error && (
+      {!loading && (
         <div className="pokemon-grid">
           {pokemons.map((pokemon) => {
-            const imagePath = pokemon.image?.local_path || pokemon.image?.url || pokemon.image;
+            const imagePath = pokemon.image?.thumbnail_path || pokemon.image?.local_path || pokemon.image?.url || pokemon.image;
             const imageUrl = imagePath ? `http://localhost:8081${imagePath}` : null;
 
             return (
@@ -51,7 +78,7 @@ function GeneratedPage() {
                   <div className="pokemon-id">#{pokemon.id}</div>
                   <div className="pokemon-image-container">
                     {imageUrl ? (
-                      <img src={imageUrl} alt={pokemon.name} className="pokemon-image" />
+                      <img src={imageUrl} alt={pokemon.name} className="pokemon-image" loading="lazy" />
                     ) : (
                       <div className="pokemon-image-placeholder">?</div>
                     )}